@@ -0,0 +1,266 @@
+"""
+Offline bulk processing of a directory (or manifest) of images.
+
+Walks the input, processes every image with app.pipeline.process_image
+on a pool of worker processes (one warm colorization net per worker) and
+writes the variants to an output tree that mirrors the input layout:
+    <out>/<relative dir>/<stem>_colorize1_natural.jpg ...
+
+Every finished image is appended to <out>/.bulk_checkpoint.jsonl, so an
+interrupted run picks up where it stopped when started again with the
+same output directory. Throughput (images/s, MP/s) is printed as it goes.
+
+Usage (from the repo root):
+    python -m app.bulk scans/ colorized/
+    python -m app.bulk --manifest batch.txt colorized/ --mode both --workers 8
+"""
+
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+import argparse
+import json
+import os
+import sys
+import time
+
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".webp", ".tif", ".tiff", ".bmp")
+
+CHECKPOINT_NAME = ".bulk_checkpoint.jsonl"
+
+# Jobs submitted ahead per worker (enough to keep workers busy without
+# queueing the whole archive in memory)
+JOBS_AHEAD_PER_WORKER = 2
+
+
+def find_images(root: Path) -> list[tuple[Path, Path]]:
+    """(source, path relative to root) for image files under root, sorted."""
+    root = root.resolve()
+    return sorted(
+        (path, path.relative_to(root))
+        for path in root.rglob("*")
+        if path.suffix.lower() in IMAGE_EXTENSIONS and path.is_file()
+    )
+
+
+def read_manifest(manifest: Path) -> list[tuple[Path, Path]]:
+    """
+    (source, relative output path) per manifest line: one image path per
+    line, relative to the manifest's directory unless absolute. Files
+    outside that directory go to the top of the output tree. Blank lines
+    and lines starting with # are skipped.
+    """
+    root = manifest.resolve().parent
+    items = []
+    for line in manifest.read_text(encoding="utf-8").splitlines():
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        source = (root / line).resolve()
+        rel = source.relative_to(root) if source.is_relative_to(root) else Path(source.name)
+        items.append((source, rel))
+    return items
+
+
+def output_stems(paths: list[Path]) -> dict[Path, str]:
+    """
+    Output stem per relative path: the file stem, or stem_ext where two
+    inputs in one directory share a stem (scan.png and scan.tif).
+    """
+    seen = {}
+    for rel in paths:
+        seen.setdefault((rel.parent, rel.stem), []).append(rel)
+    return {
+        rel: rel.stem if len(group) == 1 else f"{rel.stem}_{rel.suffix.lstrip('.').lower()}"
+        for group in seen.values()
+        for rel in group
+    }
+
+
+# =============================================================================
+# Checkpoint
+# =============================================================================
+def load_checkpoint(path: Path) -> set[str]:
+    """Relative paths already processed successfully by an earlier run."""
+    done = set()
+    if not path.exists():
+        return done
+    with path.open(encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # Torn last line of a crashed run
+                continue
+            if "error" not in entry:
+                done.add(entry["path"])
+    return done
+
+
+# =============================================================================
+# Workers
+# =============================================================================
+def _init_worker(workers: int):
+    from app.inference_backends import configure_threads
+    from app.model_registry import warm_up
+
+    configure_threads(processes=workers)
+    warm_up()
+
+
+def _process(source: str, output_dir: str, stem: str, mode: str, encoding: dict) -> tuple[list[str], float]:
+    """Processes one image; returns (variant paths, megapixels)."""
+    from app.image_io import read_image
+    from app.pipeline import process_image
+
+    img = read_image(source)
+    output = Path(output_dir)
+    output.mkdir(parents=True, exist_ok=True)
+    result = process_image(img, output, mode, stem=stem, **encoding)
+    return [str(p) for p in result.variants], img.shape[0] * img.shape[1] / 1e6
+
+
+# =============================================================================
+# Runner
+# =============================================================================
+class Throughput:
+    def __init__(self, total: int):
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.megapixels = 0.0
+        self.start = time.perf_counter()
+
+    def add(self, megapixels: float | None):
+        if megapixels is None:
+            self.failed += 1
+        else:
+            self.done += 1
+            self.megapixels += megapixels
+
+    def line(self) -> str:
+        elapsed = max(time.perf_counter() - self.start, 1e-9)
+        return (
+            f"{self.done + self.failed}/{self.total} images "
+            f"({self.failed} failed) in {elapsed:.0f}s: "
+            f"{self.done / elapsed:.2f} images/s, {self.megapixels / elapsed:.2f} MP/s"
+        )
+
+
+def run(
+    items: list[tuple[Path, Path]],
+    output_root: Path,
+    mode: str = "colorize",
+    workers: int = os.cpu_count() or 1,
+    encoding: dict | None = None,
+    report_every: float = 10.0,
+) -> Throughput:
+    """
+    Processes (source, relative path) items into output_root, skipping
+    paths listed in the checkpoint. Returns the throughput of this run.
+    """
+    output_root.mkdir(parents=True, exist_ok=True)
+    checkpoint_path = output_root / CHECKPOINT_NAME
+    done = load_checkpoint(checkpoint_path)
+    todo = [(source, rel) for source, rel in items if rel.as_posix() not in done]
+    stems = output_stems([rel for _, rel in items])
+    print(f"{len(items)} images, {len(items) - len(todo)} already done, {workers} workers", flush=True)
+
+    stats = Throughput(len(todo))
+    if not todo:
+        return stats
+
+    encoding = encoding or {}
+    pending = iter(todo)
+    in_flight = {}
+    last_report = time.perf_counter()
+
+    with (
+        checkpoint_path.open("a", encoding="utf-8") as checkpoint,
+        ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(workers,)) as pool,
+    ):
+        if checkpoint.tell() and not checkpoint_path.read_bytes().endswith(b"\n"):
+            # Start after a torn last line instead of appending to it
+            checkpoint.write("\n")
+
+        def submit_next() -> bool:
+            item = next(pending, None)
+            if item is None:
+                return False
+            source, rel = item
+            future = pool.submit(_process, str(source), str(output_root / rel.parent), stems[rel], mode, encoding)
+            in_flight[future] = rel
+            return True
+
+        for _ in range(workers * JOBS_AHEAD_PER_WORKER):
+            if not submit_next():
+                break
+
+        try:
+            while in_flight:
+                finished, _ = wait(in_flight, timeout=report_every, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    rel = in_flight.pop(future)
+                    entry = {"path": rel.as_posix()}
+                    try:
+                        variants, megapixels = future.result()
+                    except Exception as e:
+                        entry["error"] = str(e) or type(e).__name__
+                        print(f"failed: {rel}: {entry['error']}", file=sys.stderr, flush=True)
+                        stats.add(None)
+                    else:
+                        entry["variants"] = [Path(v).relative_to(output_root).as_posix() for v in variants]
+                        stats.add(megapixels)
+                    # Outputs are on disk before their checkpoint line, so a
+                    # crash at worst redoes the images that were in flight
+                    checkpoint.write(json.dumps(entry) + "\n")
+                    checkpoint.flush()
+                    submit_next()
+
+                if time.perf_counter() - last_report >= report_every:
+                    print(stats.line(), flush=True)
+                    last_report = time.perf_counter()
+        except KeyboardInterrupt:
+            pool.shutdown(wait=False, cancel_futures=True)
+            print(f"interrupted; rerun to resume. {stats.line()}", flush=True)
+            raise SystemExit(130)
+
+    print(f"done. {stats.line()}", flush=True)
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", nargs="?", type=Path, help="directory of images (walked recursively)")
+    parser.add_argument("output", type=Path, help="output directory (holds the checkpoint)")
+    parser.add_argument("--manifest", type=Path, help="file listing one image path per line, instead of input")
+    parser.add_argument("--mode", choices=["enhance", "colorize", "both"], default="colorize")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="worker processes")
+    parser.add_argument("--format", dest="output_format", default="jpg", help="jpg | pjpg | webp | avif")
+    parser.add_argument("--quality", default="default", help="output_writer quality preset")
+    parser.add_argument("--report-every", type=float, default=10.0, help="seconds between progress lines")
+    args = parser.parse_args()
+
+    if (args.input is None) == (args.manifest is None):
+        parser.error("give either an input directory or --manifest")
+
+    items = read_manifest(args.manifest) if args.manifest is not None else find_images(args.input)
+
+    from app.output_writer import OutputWriter
+
+    try:
+        writer = OutputWriter(args.output_format, args.quality)
+    except ValueError as e:
+        parser.error(str(e))
+
+    run(
+        items,
+        args.output.resolve(),
+        mode=args.mode,
+        workers=max(1, args.workers),
+        encoding={"output_format": writer.format, "quality": writer.quality},
+        report_every=args.report_every,
+    )
+
+
+if __name__ == "__main__":
+    main()
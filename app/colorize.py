@@ -1,114 +1,247 @@
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, NamedTuple
+import math
+import os
 import cv2
 import numpy as np
 
-# Local paths (models will be stored here, ignored by git)
-MODELS_DIR = Path(__file__).resolve().parent.parent / "models" / "colorization"
-
-PROTO_PATH = MODELS_DIR / "colorization_deploy_v2.prototxt"
-MODEL_PATH = MODELS_DIR / "colorization_release_v2.caffemodel"
-PTS_PATH = MODELS_DIR / "pts_in_hull.npy"
-
-
-def _apply_saturation_bgr(img_bgr: np.ndarray, saturation: float) -> np.ndarray:
+from app import metrics
+from app.model_registry import NET_INPUT_SIZE
+from app.model_registry import MODELS_DIR, PROTO_PATH, MODEL_PATH, PTS_PATH  # noqa: F401 (re-exported)
+from app.inference_batcher import infer_ab
+from app.image_io import ImageSource, read_image
+from app.output_writer import OutputWriter
+from app.postprocess import render_chroma
+
+# Chroma post-processing (blur, saturation, bilateral filter) runs at no
+# more than this many megapixels; larger images get their final ab
+# upsampled onto the full-resolution L channel.
+COLORIZE_WORKING_MP = float(os.getenv("COLORIZE_WORKING_MP", "2.0"))
+
+# Estimated peak memory allowed for one colorization. Above it variants are
+# rendered one at a time, and if that still does not fit the image is
+# rejected with ImageTooLarge.
+COLORIZE_MAX_MEMORY_MB = float(os.getenv("COLORIZE_MAX_MEMORY_MB", "2048"))
+
+# Rough peak bytes per pixel. The full-resolution path keeps several
+# float32 LAB/BGR frames alive (plus more per variant being rendered);
+# the reduced path only holds uint8 frames at full resolution.
+_FULL_BASE_BPP = 40
+_FULL_VARIANT_BPP = 60
+_REDUCED_BASE_BPP = 7
+_REDUCED_VARIANT_BPP = 8
+
+
+class ImageTooLarge(ValueError):
+    """Raised when an image cannot be colorized within the memory ceiling."""
+
+
+class ColorizeSpec(NamedTuple):
+    """One colorized output derived from a shared ab prediction."""
+    output_path: Path
+    blend: float = 0.85
+    saturation: float = 1.0
+    edge_smooth: bool = True
+
+
+def _plan_resolution(
+    height: int,
+    width: int,
+    n_variants: int,
+    parallel: bool,
+) -> tuple[tuple[int, int] | None, bool]:
     """
-    Adjust saturation in HSV space.
-    saturation=1.0 means no change.
-    """
-    if abs(saturation - 1.0) < 1e-6:
-        return img_bgr
-
-    hsv = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2HSV).astype("float32")
-    hsv[:, :, 1] *= float(saturation)
-    hsv[:, :, 1] = np.clip(hsv[:, :, 1], 0, 255)
-    out = cv2.cvtColor(hsv.astype("uint8"), cv2.COLOR_HSV2BGR)
-    return out
-
-
-def colorize_image(
-    input_path: Path,
-    output_path: Path,
-    *,
-    blend: float = 0.85,
-    saturation: float = 1.0,
-    edge_smooth: bool = True,
-) -> Path:
-    """
-    Colorizes an image using OpenCV DNN (Zhang colorization model).
-
-    Upgrades added:
-    - blend: Controls strength of predicted colors (lower reduces color bleeding)
-    - saturation: Creates different-looking variants (soft/natural/vivid)
-    - edge_smooth: Edge-preserving smoothing (bilateral filter) to reduce bleeding
+    Picks how to colorize an image of this size.
 
-    Requires 3 files in /models/colorization:
-      - colorization_deploy_v2.prototxt
-      - colorization_release_v2.caffemodel
-      - pts_in_hull.npy
+    Returns (working_size, parallel): working_size is None for the
+    full-resolution path, otherwise the (w, h) chroma is processed at.
     """
-    if not (PROTO_PATH.exists() and MODEL_PATH.exists() and PTS_PATH.exists()):
-        raise FileNotFoundError(
-            "Colorization model files not found in /models/colorization. "
-            "Make sure prototxt, caffemodel, pts_in_hull.npy exist in that folder."
+    pixels = height * width
+    budget = COLORIZE_MAX_MEMORY_MB * 1024 * 1024
+    concurrency = [n_variants, 1] if parallel and n_variants > 1 else [1]
+
+    scale = min(1.0, math.sqrt(COLORIZE_WORKING_MP * 1e6 / pixels))
+    if scale >= 1.0:
+        for k in concurrency:
+            if pixels * (_FULL_BASE_BPP + _FULL_VARIANT_BPP * k) <= budget:
+                return None, k > 1
+        raise ImageTooLarge("Image is too large to colorize within the memory limit.")
+
+    working_size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    working_pixels = working_size[0] * working_size[1]
+    for k in concurrency:
+        estimate = (
+            pixels * (_REDUCED_BASE_BPP + _REDUCED_VARIANT_BPP * k)
+            + working_pixels * (_FULL_BASE_BPP + _FULL_VARIANT_BPP * k)
         )
+        if estimate <= budget:
+            return working_size, k > 1
 
-    # Clamp blend to safe range
-    blend = float(np.clip(blend, 0.0, 1.0))
-    saturation = float(max(0.0, saturation))
+    raise ImageTooLarge("Image is too large to colorize within the memory limit.")
 
-    net = cv2.dnn.readNetFromCaffe(str(PROTO_PATH), str(MODEL_PATH))
-    pts = np.load(str(PTS_PATH))
 
-    # Add cluster centers as 1x1 convolution kernel to the model
-    class8_ab = net.getLayerId("class8_ab")
-    conv8_313_rh = net.getLayerId("conv8_313_rh")
-    pts = pts.transpose().reshape(2, 313, 1, 1)
+def _upsample_chroma(bgr_small: np.ndarray, L_full: np.ndarray) -> np.ndarray:
+    """
+    Takes the final chroma of a working-resolution render and puts it on the
+    full-resolution (uint8 LAB) L channel, so fine luminance detail is kept
+    while only 2 uint8 channels are ever upsampled.
+    """
+    lab_small = cv2.cvtColor(bgr_small, cv2.COLOR_BGR2LAB)
+    height, width = L_full.shape[:2]
+    ab_full = cv2.resize(lab_small[:, :, 1:], (width, height), interpolation=cv2.INTER_LINEAR)
+    lab_full = cv2.merge((L_full, ab_full))
+    return cv2.cvtColor(lab_full, cv2.COLOR_LAB2BGR)
 
-    net.getLayer(class8_ab).blobs = [pts.astype("float32")]
-    net.getLayer(conv8_313_rh).blobs = [np.full([1, 313], 2.606, dtype="float32")]
 
-    img_bgr_u8 = cv2.imread(str(input_path))
-    if img_bgr_u8 is None:
-        raise ValueError("Invalid image file.")
+def _predict_ab(img_bgr_u8: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Runs the DNN once and returns (L, ab) at full resolution.
 
+    ab is already chroma-smoothed but not yet scaled by blend. The Gaussian
+    blur is linear, so blur(ab * blend) == blend * blur(ab) and the blur can
+    be shared by every variant.
+    """
     # Convert to LAB
     img_bgr = img_bgr_u8.astype("float32") / 255.0
     img_lab = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2LAB)
 
     # L channel
     L = img_lab[:, :, 0]
-    L_resized = cv2.resize(L, (224, 224))
+    L_resized = cv2.resize(L, (NET_INPUT_SIZE, NET_INPUT_SIZE))
     L_resized -= 50  # Mean-centering
 
-    # Predict ab
-    net.setInput(cv2.dnn.blobFromImage(L_resized))
-    ab = net.forward()[0, :, :, :].transpose((1, 2, 0))
+    # Predict ab (pooled net, micro-batched across concurrent requests if enabled)
+    ab = infer_ab(L_resized)
     ab = cv2.resize(ab, (img_bgr.shape[1], img_bgr.shape[0]))
 
-    # ✅ Upgrade A: Reduce bleeding by blending predicted chroma
-    # Lower blend = more conservative colors, less bleeding
-    ab = ab * blend
-
     # ✅ Upgrade B (optional): Smooth ONLY chroma (ab), not luminance
     # This helps stabilize weird chroma blobs.
     # Keeping it light to avoid washing details.
     ab = cv2.GaussianBlur(ab, (0, 0), 1.0)
 
-    # Combine original L with predicted ab
-    colorized_lab = np.concatenate((L[:, :, np.newaxis], ab), axis=2)
-    colorized_bgr = cv2.cvtColor(colorized_lab, cv2.COLOR_LAB2BGR)
+    return L, ab
 
-    # Convert back to uint8
-    colorized_bgr = np.clip(colorized_bgr, 0, 1)
-    colorized_bgr = (255 * colorized_bgr).astype("uint8")
 
+def _render_variant(
+    L: np.ndarray,
+    ab: np.ndarray,
+    *,
+    blend: float,
+    saturation: float,
+    edge_smooth: bool,
+) -> np.ndarray:
+    """Applies the per-variant post-processing to a shared (L, ab) prediction."""
+    # Clamp blend to safe range
+    blend = float(np.clip(blend, 0.0, 1.0))
+    saturation = float(max(0.0, saturation))
+
+    # ✅ Upgrade A: Reduce bleeding by blending predicted chroma
+    # Lower blend = more conservative colors, less bleeding
     # ✅ Upgrade C: Adjust saturation to generate real variants
-    colorized_bgr = _apply_saturation_bgr(colorized_bgr, saturation)
+    # Both scale chroma, so they are one ab scale in LAB, combined with the
+    # original L and converted to uint8 BGR in a single fused pass
+    colorized_bgr = render_chroma(L, ab, blend * saturation)
 
     # ✅ Upgrade D: Edge-preserving smoothing after colorization
     # Helps reduce color spill across boundaries without destroying edges
     if edge_smooth:
         colorized_bgr = cv2.bilateralFilter(colorized_bgr, d=7, sigmaColor=50, sigmaSpace=50)
 
-    cv2.imwrite(str(output_path), colorized_bgr)
-    return output_path
\ No newline at end of file
+    return colorized_bgr
+
+
+def colorize_image(
+    input_path: Path,
+    output_path: Path,
+    *,
+    blend: float = 0.85,
+    saturation: float = 1.0,
+    edge_smooth: bool = True,
+) -> Path:
+    """
+    Colorizes an image using OpenCV DNN (Zhang colorization model).
+
+    Upgrades added:
+    - blend: Controls strength of predicted colors (lower reduces color bleeding)
+    - saturation: Creates different-looking variants (soft/natural/vivid)
+    - edge_smooth: Edge-preserving smoothing (bilateral filter) to reduce bleeding
+
+    The net itself comes from the process-wide pool in model_registry,
+    which raises FileNotFoundError if any of the 3 model files is missing.
+
+    Requires 3 files in /models/colorization:
+      - colorization_deploy_v2.prototxt
+      - colorization_release_v2.caffemodel
+      - pts_in_hull.npy
+    """
+    spec = ColorizeSpec(output_path, blend, saturation, edge_smooth)
+    writer = OutputWriter.for_path(output_path)
+    return colorize_variants(input_path, [spec], parallel=False, writer=writer)[0]
+
+
+def colorize_variants(
+    source: ImageSource,
+    specs: list[ColorizeSpec],
+    *,
+    parallel: bool = True,
+    progress: Callable[[str], None] | None = None,
+    writer: OutputWriter | None = None,
+) -> list[Path]:
+    """
+    Colorizes an image into several variants with a single forward pass.
+
+    source may be a path, encoded bytes or a decoded BGR array. The image
+    is decoded and ab is predicted once; only blend, saturation
+    and edge smoothing (all post-forward steps) differ per spec. With
+    parallel=True the variants are rendered on a thread pool (OpenCV
+    releases the GIL). Returns output paths in the order of specs.
+
+    Images above COLORIZE_WORKING_MP are post-processed at a reduced
+    working resolution and only their final chroma is upsampled; images
+    that would exceed COLORIZE_MAX_MEMORY_MB raise ImageTooLarge.
+
+    progress, if given, is called with "infer", "post-process" and
+    "encode" as each stage starts. writer encodes the outputs (JPEG by
+    default); each spec's output_path is written as given.
+    """
+    report = progress or (lambda stage: None)
+    writer = writer or OutputWriter()
+
+    img_bgr_u8 = read_image(source)
+    height, width = img_bgr_u8.shape[:2]
+    working_size, parallel = _plan_resolution(height, width, len(specs), parallel)
+
+    report("infer")
+    if working_size is None:
+        L_full = None
+        L, ab = _predict_ab(img_bgr_u8)
+    else:
+        L_full = cv2.extractChannel(cv2.cvtColor(img_bgr_u8, cv2.COLOR_BGR2LAB), 0)
+        small = cv2.resize(img_bgr_u8, working_size, interpolation=cv2.INTER_AREA)
+        del img_bgr_u8
+        L, ab = _predict_ab(small)
+
+    def render(spec: ColorizeSpec) -> np.ndarray:
+        out = _render_variant(
+            L,
+            ab,
+            blend=spec.blend,
+            saturation=spec.saturation,
+            edge_smooth=spec.edge_smooth,
+        )
+        if L_full is not None:
+            out = _upsample_chroma(out, L_full)
+        return out
+
+    report("post-process")
+    with metrics.stage("post-process"):
+        if parallel and len(specs) > 1:
+            with ThreadPoolExecutor(max_workers=len(specs)) as pool:
+                futures = [pool.submit(metrics.bind(render), spec) for spec in specs]
+                images = [future.result() for future in futures]
+        else:
+            images = [render(spec) for spec in specs]
+
+    report("encode")
+    return writer.write_all([(spec.output_path, img) for spec, img in zip(specs, images)])
@@ -1,58 +1,41 @@
-from pathlib import Path
-import json
-from collections import defaultdict, Counter
-import statistics
-import matplotlib.pyplot as plt
+from datetime import datetime, timedelta
 import io
 
-import matplotlib
-matplotlib.use("Agg")
-
-REVIEWS_FILE = Path("Reviews") / "reviews.jsonl"
+from app.review_store import get_review_store
+from app.render_cache import pyplot
 
 NEGATIVE_THRESHOLD = 45      # score below this is concerning
 LOW_POLARITY = -0.15         # negative sentiment
 HIGH_VARIANCE = 200          # disagreement threshold
 
 
-def _load_reviews():
-    if not REVIEWS_FILE.exists():
-        return []
-    with open(REVIEWS_FILE, "r", encoding="utf-8") as f:
-        return [json.loads(l) for l in f if l.strip()]
-
-
-def analyze_reviews():
+def analyze_reviews(window_days: float | None = None):
     """
     Core analytics function.
     Returns per-variant deep analysis for developer use.
+
+    Built from the review store's running per-label aggregates, so the
+    cost does not grow with the number of reviews. With window_days, only
+    reviews from the last window_days days count; those stats come from a
+    vectorized scan of the columnar review history.
     """
-    reviews = _load_reviews()
-    if not reviews:
+    store = get_review_store()
+    if window_days is None:
+        aggregates = store.aggregates(top_keywords=6)
+    else:
+        since = datetime.utcnow() - timedelta(days=window_days)
+        aggregates = store.window_aggregates(since=since, top_keywords=6)
+    if not aggregates:
         return {}
 
-    grouped = defaultdict(list)
-
-    for r in reviews:
-        grouped[r["label"]].append(r)
-
     analysis = {}
 
-    for label, items in grouped.items():
-        scores = [i["score"] for i in items]
-        polarities = [i["sentiment"]["polarity"] for i in items]
-        subjectivities = [i["sentiment"]["subjectivity"] for i in items]
-
-        keywords = []
-        for i in items:
-            keywords.extend(i["sentiment"]["keywords"])
-
-        keyword_counts = Counter(keywords)
-
-        avg_score = sum(scores) / len(scores)
-        variance = statistics.variance(scores) if len(scores) > 1 else 0
-        avg_polarity = sum(polarities) / len(polarities)
-        avg_subjectivity = sum(subjectivities) / len(subjectivities)
+    for label, stats in aggregates.items():
+        avg_score = stats["avg_score"]
+        variance = stats["variance"]
+        avg_polarity = stats["avg_polarity"]
+        avg_subjectivity = stats["avg_subjectivity"]
+        top_keywords = stats["top_keywords"]
 
         notes = []
 
@@ -65,9 +48,9 @@ def analyze_reviews():
         if variance > HIGH_VARIANCE:
             notes.append("High disagreement between users")
 
-        if keyword_counts:
+        if top_keywords:
             common_negative = [
-                k for k, c in keyword_counts.most_common(5)
+                k for k, c in top_keywords[:5]
                 if k in ("yellow", "oversaturated", "bleeding", "artifact", "unnatural")
             ]
             if common_negative:
@@ -76,12 +59,12 @@ def analyze_reviews():
                 )
 
         analysis[label] = {
-            "reviews": len(items),
+            "reviews": stats["reviews"],
             "avg_score": round(avg_score, 2),
             "variance": round(variance, 2),
             "avg_polarity": round(avg_polarity, 3),
             "avg_subjectivity": round(avg_subjectivity, 3),
-            "top_keywords": keyword_counts.most_common(6),
+            "top_keywords": top_keywords,
             "notes": notes
         }
 
@@ -96,6 +79,7 @@ def generate_dev_report_png() -> bytes:
     if not data:
         raise RuntimeError("No review data available")
 
+    plt = pyplot()
     fig_height = 2 + len(data) * 2.4
     fig, ax = plt.subplots(figsize=(10, fig_height))
     ax.axis("off")
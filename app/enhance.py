@@ -1,46 +1,142 @@
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+import os
 import cv2
+import numpy as np
 
+from app import metrics
+from app.image_io import ImageSource, read_image
+from app.output_writer import OutputWriter
+from app.postprocess import contrast, warm
+
+# Denoise used by variant 1:
+#   nlm            - full-resolution non-local means (best quality, slowest)
+#   nlm_downscaled - non-local means at half resolution, upscaled back
+#   bilateral      - edge-preserving bilateral filter
+#   guided         - self-guided filter (box filters, O(1) per pixel)
+DENOISE_STRATEGIES = ("nlm", "nlm_downscaled", "bilateral", "guided")
+DENOISE_STRATEGY = os.getenv("ENHANCE_DENOISE", "nlm")
+
+VARIANT_NAMES = ["enhance1_denoise", "enhance2_clahe", "enhance3_sharp_warm"]
 
-def enhance_variants(input_path: Path, output_dir: Path) -> list[Path]:
-    """
-    Generates 3 enhancement variants:
-    1) Denoise + mild contrast
-    2) CLAHE contrast enhancement
-    3) Sharpen (unsharp mask) + slight warm tone
-    """
-    img = cv2.imread(str(input_path))
-    if img is None:
-        raise ValueError("Failed to read image.")
 
-    variants = []
+def _guided_filter(img: np.ndarray, radius: int = 4, eps: float = 0.01) -> np.ndarray:
+    """Self-guided filter (He et al.), per channel, using box filters."""
+    if hasattr(cv2, "ximgproc"):
+        return cv2.ximgproc.guidedFilter(img, img, radius, eps * 255 * 255)
 
+    I = img.astype("float32") / 255.0
+    ksize = (2 * radius + 1, 2 * radius + 1)
+    mean_I = cv2.boxFilter(I, -1, ksize)
+    var_I = cv2.boxFilter(I * I, -1, ksize) - mean_I * mean_I
+    a = var_I / (var_I + eps)
+    b = mean_I - a * mean_I
+    out = cv2.boxFilter(a, -1, ksize) * I + cv2.boxFilter(b, -1, ksize)
+    return np.clip(out * 255.0, 0, 255).astype("uint8")
+
+
+def denoise(img: np.ndarray, strategy: str | None = None) -> np.ndarray:
+    strategy = strategy or DENOISE_STRATEGY
+    if strategy not in DENOISE_STRATEGIES:
+        raise ValueError(f"Unknown denoise strategy: {strategy}")
+
+    if strategy == "nlm_downscaled" and min(img.shape[:2]) >= 256:
+        height, width = img.shape[:2]
+        small = cv2.resize(img, (width // 2, height // 2), interpolation=cv2.INTER_AREA)
+        small = cv2.fastNlMeansDenoisingColored(small, None, 7, 7, 7, 21)
+        return cv2.resize(small, (width, height), interpolation=cv2.INTER_LINEAR)
+
+    if strategy == "bilateral":
+        return cv2.bilateralFilter(img, d=9, sigmaColor=40, sigmaSpace=5)
+
+    if strategy == "guided":
+        return _guided_filter(img)
+
+    return cv2.fastNlMeansDenoisingColored(img, None, 7, 7, 7, 21)
+
+
+def _denoise_variant(img: np.ndarray, strategy: str | None) -> np.ndarray:
     # Variant 1: Denoise + mild contrast
-    denoised = cv2.fastNlMeansDenoisingColored(img, None, 7, 7, 7, 21)
-    mild = cv2.convertScaleAbs(denoised, alpha=1.15, beta=5)
-    out1 = output_dir / f"{input_path.stem}_enhance1_denoise.jpg"
-    cv2.imwrite(str(out1), mild)
-    variants.append(out1)
+    with metrics.stage("denoise"):
+        denoised = denoise(img, strategy)
+        # denoise() returns a new array, so the contrast can overwrite it
+        return contrast(denoised, 1.15, 5, inplace=True)
+
 
+def _clahe_variant(img: np.ndarray) -> np.ndarray:
     # Variant 2: CLAHE on L channel (better local contrast)
-    lab = cv2.cvtColor(img, cv2.COLOR_BGR2LAB)
-    l, a, b = cv2.split(lab)
-    clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-    l2 = clahe.apply(l)
-    lab2 = cv2.merge((l2, a, b))
-    clahe_img = cv2.cvtColor(lab2, cv2.COLOR_LAB2BGR)
-    out2 = output_dir / f"{input_path.stem}_enhance2_clahe.jpg"
-    cv2.imwrite(str(out2), clahe_img)
-    variants.append(out2)
+    with metrics.stage("clahe"):
+        lab = cv2.cvtColor(img, cv2.COLOR_BGR2LAB)
+        l, a, b = cv2.split(lab)
+        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+        l2 = clahe.apply(l)
+        lab2 = cv2.merge((l2, a, b))
+        return cv2.cvtColor(lab2, cv2.COLOR_LAB2BGR)
 
+
+def _sharp_warm_variant(img: np.ndarray) -> np.ndarray:
     # Variant 3: Unsharp mask + warm tone
-    blur = cv2.GaussianBlur(img, (0, 0), 2)
-    sharp = cv2.addWeighted(img, 1.5, blur, -0.5, 0)
+    with metrics.stage("sharp_warm"):
+        blur = cv2.GaussianBlur(img, (0, 0), 2)
+        sharp = cv2.addWeighted(img, 1.5, blur, -0.5, 0)
+        return warm(sharp, 15, inplace=True)  # add red slightly
+
+
+def enhance_images(
+    img: np.ndarray,
+    which: list[int] | None = None,
+    *,
+    denoise_strategy: str | None = None,
+    parallel: bool = True,
+) -> list[np.ndarray]:
+    """
+    Computes enhancement variants of a decoded BGR image (see
+    enhance_variants) without writing anything.
+
+    which selects variants by index (default: all 3), so callers that only
+    need the denoised image do not pay for the others. With parallel=True
+    the variants run concurrently on threads (OpenCV releases the GIL).
+    """
+    makers = [
+        lambda: _denoise_variant(img, denoise_strategy),
+        lambda: _clahe_variant(img),
+        lambda: _sharp_warm_variant(img),
+    ]
+    selected = [makers[i] for i in (which if which is not None else range(len(makers)))]
+
+    if parallel and len(selected) > 1:
+        # bind: stage timings on the pool threads count towards this image
+        with ThreadPoolExecutor(max_workers=len(selected)) as pool:
+            return list(pool.map(lambda make: make(), [metrics.bind(make) for make in selected]))
+
+    return [make() for make in selected]
+
 
-    warm = sharp.copy()
-    warm[:, :, 2] = cv2.add(warm[:, :, 2], 15)  # add red slightly
-    out3 = output_dir / f"{input_path.stem}_enhance3_sharp_warm.jpg"
-    cv2.imwrite(str(out3), warm)
-    variants.append(out3)
+def enhance_variants(
+    source: ImageSource,
+    output_dir: Path,
+    stem: str | None = None,
+    writer: OutputWriter | None = None,
+) -> list[Path]:
+    """
+    Generates 3 enhancement variants:
+    1) Denoise + mild contrast
+    2) CLAHE contrast enhancement
+    3) Sharpen (unsharp mask) + slight warm tone
+
+    source may be a path, encoded bytes or a decoded array; stem (required
+    unless source is a path) names the output files. writer picks the
+    output format (JPEG by default) and encodes the variants in parallel.
+    """
+    try:
+        img = read_image(source)
+    except ValueError:
+        raise ValueError("Failed to read image.")
+    stem = stem or Path(source).stem
+    writer = writer or OutputWriter()
 
-    return variants
\ No newline at end of file
+    items = [
+        (writer.path(output_dir, f"{stem}_{name}"), variant)
+        for name, variant in zip(VARIANT_NAMES, enhance_images(img))
+    ]
+    return writer.write_all(items)
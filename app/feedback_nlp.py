@@ -1,31 +1,201 @@
-from textblob import TextBlob
-import nltk
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize
+from concurrent.futures import Future
+from functools import lru_cache
+import logging
+import os
+import queue
+import threading
 
-STOP_WORDS = set(stopwords.words("english"))
+logger = logging.getLogger(__name__)
 
-def analyze_feedback(text: str) -> dict:
-    if not text.strip():
-        return {
-            "polarity": 0.0,
-            "subjectivity": 0.0,
-            "keywords": []
-        }
+# Distinct normalised comments whose analysis is kept in memory.
+NLP_CACHE_SIZE = max(0, int(os.getenv("NLP_CACHE_SIZE", "4096")))
+
+# Max comments the background scorer analyses per batch.
+NLP_BATCH_SIZE = max(1, int(os.getenv("NLP_BATCH_SIZE", "64")))
+
+# NLTK / TextBlob are imported and the stopword list is loaded on first use,
+# not at import time.
+_models = None
+_models_lock = threading.Lock()
+
+
+def _load_models():
+    global _models
+    if _models is None:
+        with _models_lock:
+            if _models is None:
+                from textblob import TextBlob
+                from nltk.corpus import stopwords
+                from nltk.tokenize import word_tokenize
+
+                _models = (TextBlob, word_tokenize, frozenset(stopwords.words("english")))
+    return _models
+
+
+_warm = threading.Event()
+
+
+def is_warm() -> bool:
+    return _warm.is_set()
+
+
+def warm_up() -> bool:
+    """Loads the NLP models and analyses one comment; False if that fails."""
+    try:
+        analyze_feedback("warm up")
+    except Exception as e:
+        # Typically missing NLTK data (stopwords / punkt)
+        logger.warning("NLP warm-up failed: %s", e)
+        return False
+    _warm.set()
+    return True
+
+
+def normalize(text: str) -> str:
+    """Cache key for a comment: lowercase, whitespace collapsed."""
+    return " ".join(text.lower().split())
+
+
+@lru_cache(maxsize=NLP_CACHE_SIZE)
+def _analyze_normalized(text: str) -> tuple[float, float, tuple[str, ...]]:
+    TextBlob, word_tokenize, stop_words = _load_models()
 
     blob = TextBlob(text)
 
     polarity = blob.sentiment.polarity
     subjectivity = blob.sentiment.subjectivity
 
-    tokens = word_tokenize(text.lower())
-    keywords = [
+    tokens = word_tokenize(text)
+    keywords = tuple(
         t for t in tokens
-        if t.isalpha() and t not in STOP_WORDS
-    ]
+        if t.isalpha() and t not in stop_words
+    )
+
+    return polarity, subjectivity, keywords
+
+
+def analyze_feedback(text: str) -> dict:
+    text = normalize(text)
+    if not text:
+        return {
+            "polarity": 0.0,
+            "subjectivity": 0.0,
+            "keywords": []
+        }
+
+    polarity, subjectivity, keywords = _analyze_normalized(text)
 
     return {
         "polarity": polarity,
         "subjectivity": subjectivity,
-        "keywords": keywords
+        "keywords": list(keywords)
     }
+
+
+def analyze_feedback_many(texts: list[str]) -> list[dict]:
+    """analyze_feedback for a batch; each distinct comment is analysed once."""
+    analyzed = {}
+    results = []
+    for text in texts:
+        key = normalize(text)
+        if key not in analyzed:
+            analyzed[key] = analyze_feedback(key)
+        result = analyzed[key]
+        results.append(dict(result, keywords=list(result["keywords"])))
+    return results
+
+
+def cache_stats() -> dict:
+    info = _analyze_normalized.cache_info()
+    return {
+        "entries": info.currsize,
+        "max_entries": info.maxsize,
+        "hits": info.hits,
+        "misses": info.misses,
+    }
+
+
+# =============================================================================
+# Background scoring
+# =============================================================================
+class FeedbackScorer:
+    """
+    Scores comments on a background thread so request handlers do not wait
+    for NLP. score() returns a Future for the analyze_feedback() result;
+    comments queued together are analysed as one analyze_feedback_many
+    batch.
+    """
+
+    def __init__(self, batch_size: int = NLP_BATCH_SIZE):
+        self.batch_size = batch_size
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run,
+                    name="feedback-scorer",
+                    daemon=True,
+                )
+                self._thread.start()
+
+    def score(self, text: str) -> Future:
+        future = Future()
+        self._ensure_started()
+        self._queue.put((text, future))
+        return future
+
+    def _collect(self) -> tuple[list, bool]:
+        item = self._queue.get()
+        if item is None:
+            return [], True
+
+        batch = [item]
+        while len(batch) < self.batch_size:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self):
+        while True:
+            batch, stop = self._collect()
+            if batch:
+                try:
+                    results = analyze_feedback_many([text for text, _ in batch])
+                except Exception:
+                    # Isolate the comment(s) that fail
+                    for text, future in batch:
+                        try:
+                            future.set_result(analyze_feedback(text))
+                        except Exception as e:
+                            future.set_exception(e)
+                else:
+                    for (_, future), result in zip(batch, results):
+                        future.set_result(result)
+            if stop:
+                return
+
+    def close(self):
+        """Scores everything still queued, then stops the thread."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+
+_scorer = FeedbackScorer()
+
+
+def get_feedback_scorer() -> FeedbackScorer:
+    return _scorer
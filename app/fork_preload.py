@@ -0,0 +1,17 @@
+"""
+Preloaded by the job pool's fork server with COLORIZE_SHARED_WEIGHTS=fork
+(see app.jobs): loads and warms one colorization net when the server
+starts, so every worker forked from it shares the weights copy-on-write.
+
+The warm-up forward pass matters: OpenCV repacks convolution weights when
+a net first runs, and doing that before the forks keeps the packed copy
+shared too. It runs on one thread so the server stays single-threaded
+and safe to fork; workers set their own thread count on start.
+"""
+
+import cv2
+
+from app.model_registry import warm_up
+
+cv2.setNumThreads(1)
+warm_up()
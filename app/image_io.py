@@ -0,0 +1,32 @@
+from pathlib import Path
+import cv2
+import numpy as np
+
+# Anything process_image and the variant generators accept as an image:
+# a file on disk, encoded bytes straight from an upload, or a decoded
+# BGR uint8 array.
+ImageSource = Path | bytes | np.ndarray
+
+
+def decode_image(data: bytes) -> np.ndarray:
+    """Decodes an encoded image (png/jpg/webp...) from memory to BGR uint8."""
+    img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if img is None:
+        raise ValueError("Invalid image file.")
+    return img
+
+
+def read_image(source: ImageSource) -> np.ndarray:
+    """
+    Returns a BGR uint8 array for any ImageSource. Arrays are returned
+    as-is (not copied), so callers must not modify them in place.
+    """
+    if isinstance(source, np.ndarray):
+        return source
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return decode_image(source)
+
+    img = cv2.imread(str(source))
+    if img is None:
+        raise ValueError("Invalid image file.")
+    return img
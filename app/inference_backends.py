@@ -0,0 +1,341 @@
+"""
+Inference backends for the Zhang colorization net.
+
+Every backend takes the same input as the Caffe net (N x 1 x 224 x 224
+mean-centered L, float32) and returns its ab prediction (N x 2 x 56 x 56):
+
+- opencv: the Caffe model through OpenCV DNN, with an explicit DNN
+  backend / target. fp16 loads a half-precision copy of the weights (and
+  uses the CPU FP16 target where the build supports it); int8 quantizes
+  the net with OpenCV's post-training quantization when it is loaded.
+- onnx: ONNX Runtime on the CPU, from a locally exported ONNX model with
+  the same input and output (onnxruntime is optional). fp16 / int8 use
+  the converted copies written by --prepare.
+
+With COLORIZE_SHARED_WEIGHTS=mmap the onnx backend loads a "shared" copy
+of the model whose weights live in a separate page-aligned file. ORT maps
+that file instead of reading it (and pre-packing is off, so the mapping is
+used as is), so every worker process shares one copy of the weights in the
+page cache. OpenCV DNN copies weights into its own blobs on load, so the
+opencv backend shares them with COLORIZE_SHARED_WEIGHTS=fork instead (see
+app.jobs).
+
+Threads per process are set explicitly (cv2.setNumThreads, ORT intra-op
+threads) so a pool of worker processes does not oversubscribe the cores.
+
+Preparing reduced-precision weights (from the repo root):
+    python -m app.inference_backends --prepare fp16
+    python -m app.inference_backends --prepare int8 --backend onnx
+    python -m app.inference_backends --prepare shared --backend onnx --precision int8
+"""
+
+from pathlib import Path
+import argparse
+import os
+import threading
+
+import cv2
+import numpy as np
+
+from app.model_registry import MODELS_DIR, MODEL_PATH, NET_INPUT_SIZE, load_colorization_net
+
+BACKENDS = ("opencv", "onnx")
+PRECISIONS = ("fp32", "fp16", "int8")
+
+# Inference backend and weight precision.
+COLORIZE_BACKEND = os.getenv("COLORIZE_BACKEND", "opencv").lower()
+COLORIZE_PRECISION = os.getenv("COLORIZE_PRECISION", "fp32").lower()
+
+# How job worker processes get the colorization weights:
+#   off  - every worker loads its own copy
+#   fork - a single-threaded fork server loads one net and forks the
+#          workers from it, so they share its weights copy-on-write
+#          (opencv backend, POSIX, see app.fork_preload)
+#   mmap - workers run from a prepared weights file that the OS page cache
+#          shares between all processes (onnx backend, see --prepare shared)
+SHARED_WEIGHTS_MODES = ("off", "fork", "mmap")
+COLORIZE_SHARED_WEIGHTS = os.getenv("COLORIZE_SHARED_WEIGHTS", "off").lower()
+
+# Inference (and OpenCV) threads per process. 0 = CPU count divided by the
+# number of worker processes.
+COLORIZE_THREADS = max(0, int(os.getenv("COLORIZE_THREADS", "0")))
+
+# OpenCV DNN backend / target (names of cv2.dnn.DNN_BACKEND_* / DNN_TARGET_*).
+COLORIZE_DNN_BACKEND = os.getenv("COLORIZE_DNN_BACKEND", "opencv").upper()
+COLORIZE_DNN_TARGET = os.getenv("COLORIZE_DNN_TARGET", "cpu").upper()
+
+# Half-precision copy of the Caffe weights (see --prepare fp16)
+FP16_MODEL_PATH = MODELS_DIR / "colorization_release_v2_fp16.caffemodel"
+
+# Locally exported ONNX model and its converted copies
+ONNX_PATH = Path(os.getenv("COLORIZE_ONNX_PATH", str(MODELS_DIR / "colorization.onnx")))
+ONNX_PRECISION_PATHS = {
+    "fp32": ONNX_PATH,
+    "fp16": ONNX_PATH.with_suffix(".fp16.onnx"),
+    "int8": ONNX_PATH.with_suffix(".int8.onnx"),
+}
+
+# Offsets of weights in a shared weights file are aligned to this (a
+# multiple of the page size on every platform, so each tensor maps cleanly)
+SHARED_ALIGNMENT = 64 * 1024
+# Smaller initializers (shapes, biases) stay inline in the shared model:
+# ORT reads small constant inputs during graph optimization
+SHARED_MIN_BYTES = 1024
+
+# Inputs used to calibrate OpenCV int8 quantization
+CALIBRATION_SAMPLES = 8
+
+
+# =============================================================================
+# Threads
+# =============================================================================
+_threads = None
+_threads_lock = threading.Lock()
+
+
+def configure_threads(processes: int = 1, threads: int = COLORIZE_THREADS) -> int:
+    """
+    Sets the inference / OpenCV thread count of this process: threads, or
+    (when 0) an even share of the CPUs between processes. Returns it.
+    """
+    global _threads
+    with _threads_lock:
+        if threads <= 0:
+            threads = max(1, (os.cpu_count() or 1) // max(1, processes))
+        cv2.setNumThreads(threads)
+        _threads = threads
+    return threads
+
+
+def inference_threads() -> int:
+    """Thread count set by configure_threads (configuring 1 process if unset)."""
+    if _threads is None:
+        return configure_threads()
+    return _threads
+
+
+# =============================================================================
+# Backends
+# =============================================================================
+def _calibration_blob() -> np.ndarray:
+    """A batch of mean-centered L inputs: gradients with increasing noise."""
+    rng = np.random.default_rng(0)
+    ramp = np.linspace(0, 100, NET_INPUT_SIZE, dtype="float32")
+    images = []
+    for i in range(CALIBRATION_SAMPLES):
+        L = np.add.outer(ramp, ramp) / 2 if i % 2 else np.tile(ramp, (NET_INPUT_SIZE, 1))
+        L = np.clip(L + rng.normal(0, 5 * i, L.shape), 0, 100).astype("float32")
+        images.append(L - 50)
+    return cv2.dnn.blobFromImages(images)
+
+
+def _dnn_constant(kind: str, name: str) -> int:
+    """cv2.dnn.DNN_<kind>_<name>, or ValueError listing the names this build has."""
+    prefix = f"DNN_{kind}_"
+    value = getattr(cv2.dnn, prefix + name.upper(), None)
+    if not isinstance(value, int):
+        valid = sorted(n[len(prefix):].lower() for n in dir(cv2.dnn) if n.startswith(prefix))
+        raise ValueError(f"Unknown COLORIZE_DNN_{kind} {name.lower()!r}; expected one of {', '.join(valid)}")
+    return value
+
+
+class OpenCVBackend:
+    """The Caffe net on OpenCV DNN."""
+
+    name = "opencv"
+
+    def __init__(
+        self,
+        precision: str = COLORIZE_PRECISION,
+        dnn_backend: str = COLORIZE_DNN_BACKEND,
+        dnn_target: str = COLORIZE_DNN_TARGET,
+    ):
+        self.precision = precision
+        backend_id = _dnn_constant("BACKEND", dnn_backend)
+        target_id = _dnn_constant("TARGET", dnn_target)
+        inference_threads()
+
+        if precision == "fp16":
+            if not FP16_MODEL_PATH.exists():
+                raise FileNotFoundError(
+                    f"{FP16_MODEL_PATH.name} not found; run "
+                    "`python -m app.inference_backends --prepare fp16` first."
+                )
+            net = load_colorization_net(model_path=FP16_MODEL_PATH)
+            if dnn_target == "CPU" and hasattr(cv2.dnn, "DNN_TARGET_CPU_FP16"):
+                dnn_target = "CPU_FP16"
+                target_id = cv2.dnn.DNN_TARGET_CPU_FP16
+        else:
+            net = load_colorization_net()
+
+        if precision == "int8":
+            # quantize() returns a new net: configure that one, not the source
+            net = net.quantize([_calibration_blob()], cv2.CV_32F, cv2.CV_32F)
+
+        net.setPreferableBackend(backend_id)
+        net.setPreferableTarget(target_id)
+        self.target = dnn_target
+        self._net = net
+
+    def forward(self, blob: np.ndarray) -> np.ndarray:
+        self._net.setInput(blob)
+        return self._net.forward()
+
+
+class OnnxBackend:
+    """An exported copy of the net on ONNX Runtime's CPU provider."""
+
+    name = "onnx"
+
+    def __init__(self, precision: str = COLORIZE_PRECISION):
+        try:
+            import onnxruntime as ort
+        except ImportError:
+            raise RuntimeError("COLORIZE_BACKEND=onnx needs onnxruntime (pip install onnxruntime)") from None
+
+        path = ONNX_PRECISION_PATHS[precision]
+        if not path.exists():
+            hint = "export the model" if precision == "fp32" else f"run `--prepare {precision} --backend onnx`"
+            raise FileNotFoundError(f"{path} not found; {hint} first.")
+        shared = COLORIZE_SHARED_WEIGHTS == "mmap"
+        if shared:
+            path = shared_model_path(precision)
+            if not path.exists():
+                raise FileNotFoundError(
+                    f"{path} not found; run `--prepare shared --backend onnx --precision {precision}` first."
+                )
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = inference_threads()
+        options.inter_op_num_threads = 1
+        options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if shared:
+            # Pre-packing copies the weights into private buffers; run from the mapping
+            options.add_session_config_entry("session.disable_prepacking", "1")
+
+        self.precision = precision
+        self._session = ort.InferenceSession(str(path), options, providers=["CPUExecutionProvider"])
+        model_input = self._session.get_inputs()[0]
+        self._input = model_input.name
+        self._dtype = np.float16 if model_input.type == "tensor(float16)" else np.float32
+
+    def forward(self, blob: np.ndarray) -> np.ndarray:
+        out = self._session.run(None, {self._input: blob.astype(self._dtype, copy=False)})[0]
+        return out.astype(np.float32, copy=False)
+
+
+def shared_weights_mode() -> str:
+    """COLORIZE_SHARED_WEIGHTS, validated."""
+    if COLORIZE_SHARED_WEIGHTS not in SHARED_WEIGHTS_MODES:
+        raise ValueError(
+            f"Unknown COLORIZE_SHARED_WEIGHTS {COLORIZE_SHARED_WEIGHTS!r}; "
+            f"expected one of {', '.join(SHARED_WEIGHTS_MODES)}"
+        )
+    return COLORIZE_SHARED_WEIGHTS
+
+
+def create_backend(name: str = COLORIZE_BACKEND, precision: str = COLORIZE_PRECISION):
+    """A freshly loaded inference backend (expensive: use the net pool)."""
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown COLORIZE_PRECISION {precision!r}; expected one of {', '.join(PRECISIONS)}")
+    shared = shared_weights_mode()
+    if name == "opencv":
+        if shared == "mmap":
+            raise ValueError(
+                "COLORIZE_SHARED_WEIGHTS=mmap needs COLORIZE_BACKEND=onnx "
+                "(OpenCV DNN copies the weights it loads; use fork)"
+            )
+        return OpenCVBackend(precision)
+    if name == "onnx":
+        return OnnxBackend(precision)
+    raise ValueError(f"Unknown COLORIZE_BACKEND {name!r}; expected one of {', '.join(BACKENDS)}")
+
+
+# =============================================================================
+# Preparing reduced-precision weights
+# =============================================================================
+def prepare(precision: str, backend: str = "opencv") -> Path:
+    """Writes the fp16 / int8 weights that backend loads for precision."""
+    if backend == "opencv":
+        if precision != "fp16":
+            raise SystemExit("OpenCV int8 is quantized at load time; only fp16 needs preparing.")
+        cv2.dnn.shrinkCaffeModel(str(MODEL_PATH), str(FP16_MODEL_PATH))
+        return FP16_MODEL_PATH
+
+    dest = ONNX_PRECISION_PATHS[precision]
+    if precision == "int8":
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        quantize_dynamic(str(ONNX_PATH), str(dest), weight_type=QuantType.QInt8)
+    elif precision == "fp16":
+        import onnx
+        from onnxconverter_common import float16
+
+        onnx.save(float16.convert_float_to_float16(onnx.load(str(ONNX_PATH))), str(dest))
+    else:
+        raise SystemExit("fp32 is the exported model itself.")
+    return dest
+
+
+def shared_model_path(precision: str) -> Path:
+    """The COLORIZE_SHARED_WEIGHTS=mmap copy of the ONNX model for precision."""
+    return ONNX_PRECISION_PATHS[precision].with_suffix(".shared.onnx")
+
+
+def prepare_shared(precision: str) -> Path:
+    """
+    Writes shared_model_path(precision): the ONNX model with its weights
+    moved to a .weights file next to it, each at a SHARED_ALIGNMENT offset.
+    """
+    import onnx
+    from onnx import external_data_helper, numpy_helper
+
+    source = ONNX_PRECISION_PATHS[precision]
+    if not source.exists():
+        raise SystemExit(f"{source} not found; prepare {precision} first.")
+    dest = shared_model_path(precision)
+    weights_path = dest.with_suffix(".weights")
+
+    model = onnx.load(str(source))
+    offset = 0
+    with weights_path.open("wb") as weights:
+        for tensor in model.graph.initializer:
+            array = numpy_helper.to_array(tensor)
+            if array.nbytes < SHARED_MIN_BYTES:
+                continue
+            offset = -(-offset // SHARED_ALIGNMENT) * SHARED_ALIGNMENT
+            weights.seek(offset)
+            weights.write(array.tobytes())
+            # from_array stores raw_data, which set_external_data moves out
+            tensor.CopyFrom(numpy_helper.from_array(array, tensor.name))
+            external_data_helper.set_external_data(tensor, weights_path.name, offset, array.nbytes)
+            tensor.ClearField("raw_data")
+            offset += array.nbytes
+    onnx.save(model, str(dest))
+    return dest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--prepare", choices=["fp16", "int8", "shared"], required=True)
+    parser.add_argument("--backend", choices=BACKENDS, default="opencv")
+    parser.add_argument(
+        "--precision", choices=PRECISIONS, default=COLORIZE_PRECISION, help="model to share (--prepare shared)"
+    )
+    args = parser.parse_args()
+
+    if args.prepare == "shared":
+        if args.backend != "onnx":
+            raise SystemExit("Only the onnx backend loads shared weights; opencv uses COLORIZE_SHARED_WEIGHTS=fork.")
+        path = prepare_shared(args.precision)
+        weights = path.with_suffix(".weights")
+        print(f"wrote {path} and {weights} ({weights.stat().st_size / 1e6:.1f} MB)")
+        return
+
+    path = prepare(args.prepare, args.backend)
+    print(f"wrote {path} ({path.stat().st_size / 1e6:.1f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+from concurrent.futures import Future
+import os
+import queue
+import threading
+import time
+
+import cv2
+import numpy as np
+
+from app import metrics
+from app.model_registry import colorization_net
+
+# Max number of L inputs combined into one net.forward() call.
+# 1 disables batching: every caller runs its own forward pass. Batches only
+# form within one process, so this needs concurrent colorizations there:
+# JOB_WORKERS=0 (jobs on threads). A job worker process runs one job at a
+# time and never has a second input to batch with.
+MAX_BATCH_SIZE = max(1, int(os.getenv("COLORIZE_BATCH_SIZE", "1")))
+
+# How long the first request of a batch waits for others to join it.
+MAX_WAIT_MS = max(0.0, float(os.getenv("COLORIZE_BATCH_WAIT_MS", "10")))
+
+
+def _forward(L_batch: list[np.ndarray]) -> np.ndarray:
+    """Runs one N-batch forward pass; returns N x 2 x H x W ab predictions."""
+    with colorization_net() as net:
+        return net.forward(cv2.dnn.blobFromImages(L_batch))
+
+
+class InferenceBatcher:
+    """
+    Micro-batching scheduler for the colorization net (per process).
+
+    Callers submit a mean-centered 224x224 L channel and block until their
+    ab slice is ready. A single background thread collects inputs for up to
+    max_wait_ms (or until max_batch_size is reached) and runs them through
+    the net as one batch, which keeps CPU conv layers much busier than
+    several 1-image forward passes.
+    """
+
+    def __init__(self, max_batch_size: int = MAX_BATCH_SIZE, max_wait_ms: float = MAX_WAIT_MS):
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run,
+                    name="colorize-batcher",
+                    daemon=True,
+                )
+                self._thread.start()
+
+    def predict(self, L_resized: np.ndarray) -> np.ndarray:
+        """Returns the ab prediction (H x W x 2) for a single L input."""
+        future = Future()
+        self._ensure_started()
+        self._queue.put((L_resized, future))
+        return future.result()
+
+    def _collect(self) -> list[tuple[np.ndarray, Future]]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            try:
+                out = _forward([L for L, _ in batch])
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            for i, (_, future) in enumerate(batch):
+                future.set_result(out[i].transpose((1, 2, 0)))
+
+
+_batcher = None
+_batcher_lock = threading.Lock()
+
+
+def get_batcher() -> InferenceBatcher:
+    global _batcher
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                _batcher = InferenceBatcher()
+    return _batcher
+
+
+def infer_ab(L_resized: np.ndarray) -> np.ndarray:
+    """
+    Predicts ab (H x W x 2, at net output resolution) for one mean-centered
+    L input, going through the micro-batcher when COLORIZE_BATCH_SIZE > 1.
+    """
+    with metrics.stage("forward"):
+        if MAX_BATCH_SIZE > 1:
+            return get_batcher().predict(L_resized)
+        return _forward([L_resized])[0].transpose((1, 2, 0))
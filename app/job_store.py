@@ -0,0 +1,98 @@
+from datetime import datetime
+import asyncio
+import os
+import threading
+import time
+import uuid
+
+# Seconds a finished job stays queryable before it is dropped.
+JOB_TTL_S = float(os.getenv("JOB_TTL_S", "3600"))
+
+FINISHED = ("done", "error")
+
+
+class JobStore:
+    """
+    In-memory registry of asynchronous image jobs.
+
+    Each job is a plain dict (id, status, stage, mode, original, variants,
+    encode stats, error, timestamps). Updates may come from any thread;
+    subscribers get every new snapshot on an asyncio.Queue bound to their
+    own event loop.
+    Finished jobs expire JOB_TTL_S seconds after their last update.
+    """
+
+    def __init__(self, ttl: float = JOB_TTL_S):
+        self.ttl = ttl
+        self._jobs = {}
+        self._expires = {}
+        self._subscribers = {}
+        self._lock = threading.Lock()
+
+    def _purge(self):
+        now = time.monotonic()
+        for job_id in [j for j, t in self._expires.items() if t <= now]:
+            self._jobs.pop(job_id, None)
+            self._expires.pop(job_id, None)
+            self._subscribers.pop(job_id, None)
+
+    def create(self, mode: str, original: str) -> dict:
+        now = datetime.utcnow().isoformat()
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": "queued",
+            "stage": None,
+            "mode": mode,
+            "original": original,
+            "variants": [],
+            "encode": None,
+            "error": None,
+            "created_at": now,
+            "updated_at": now,
+        }
+        with self._lock:
+            self._purge()
+            self._jobs[job["id"]] = job
+        return dict(job)
+
+    def get(self, job_id: str) -> dict | None:
+        with self._lock:
+            self._purge()
+            job = self._jobs.get(job_id)
+            return dict(job) if job else None
+
+    def update(self, job_id: str, **fields) -> dict | None:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            # Late progress events must not reopen a finished job
+            if job is None or job["status"] in FINISHED:
+                return None
+
+            job.update(fields, updated_at=datetime.utcnow().isoformat())
+            if job["status"] in FINISHED:
+                self._expires[job_id] = time.monotonic() + self.ttl
+
+            snapshot = dict(job)
+            subscribers = list(self._subscribers.get(job_id, ()))
+
+        for loop, q in subscribers:
+            loop.call_soon_threadsafe(q.put_nowait, snapshot)
+        return snapshot
+
+    def subscribe(self, job_id: str) -> asyncio.Queue:
+        q = asyncio.Queue()
+        with self._lock:
+            self._subscribers.setdefault(job_id, []).append((asyncio.get_running_loop(), q))
+        return q
+
+    def unsubscribe(self, job_id: str, q: asyncio.Queue):
+        with self._lock:
+            subs = self._subscribers.get(job_id, [])
+            self._subscribers[job_id] = [(l, s) for l, s in subs if s is not q]
+
+
+_store = JobStore()
+
+
+def get_job_store() -> JobStore:
+    return _store
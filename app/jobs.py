@@ -0,0 +1,341 @@
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+import asyncio
+import logging
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import uuid
+
+from app import metrics
+
+logger = logging.getLogger(__name__)
+
+_DEFAULT_WORKERS = min(4, os.cpu_count() or 1)
+
+# Worker processes for image jobs. 0 runs jobs on threads inside the API
+# process instead (useful for debugging and single-file EXE builds).
+JOB_WORKERS = max(0, int(os.getenv("JOB_WORKERS", str(_DEFAULT_WORKERS))))
+
+# Jobs allowed to wait for a free worker before new ones are rejected (429).
+JOB_QUEUE_DEPTH = max(0, int(os.getenv("JOB_QUEUE_DEPTH", "8")))
+
+# Seconds a caller waits for a job before giving up (504).
+JOB_TIMEOUT_S = float(os.getenv("JOB_TIMEOUT_S", "120"))
+
+# Retry-After hint (seconds) sent with 429 responses.
+JOB_RETRY_AFTER_S = int(os.getenv("JOB_RETRY_AFTER_S", "5"))
+
+
+class QueueFull(Exception):
+    """Raised when the executor already holds its maximum number of jobs."""
+
+    def __init__(self, retry_after: int = JOB_RETRY_AFTER_S):
+        super().__init__("Job queue is full")
+        self.retry_after = retry_after
+
+
+class JobTimeout(Exception):
+    """Raised when a job does not finish within its timeout."""
+
+
+# Queue carrying (token, stage) progress events from jobs back to the API
+# process. Set in the parent for thread mode and by _init_worker in each
+# worker process.
+_progress_queue = None
+
+# Progress token under which worker processes report (pid, warm) once
+# their start-up warm-up has finished.
+WORKER_READY = "worker-ready"
+
+# Progress token under which jobs report how long they waited for a worker
+# (seconds), when metrics are enabled.
+QUEUE_WAIT = "queue-wait"
+
+
+def _init_worker(progress_queue, workers: int):
+    global _progress_queue
+    _progress_queue = progress_queue
+
+    # Split the cores between workers instead of every worker's OpenCV /
+    # inference thread pool using all of them
+    from app.inference_backends import configure_threads
+
+    configure_threads(processes=workers)
+
+    # Each worker process loads + warms its own colorization net once,
+    # so no job pays for model parsing (with COLORIZE_SHARED_WEIGHTS=fork
+    # it already holds the fork server's warm net, and this is cheap).
+    from app.model_registry import warm_up
+
+    progress_queue.put((WORKER_READY, (os.getpid(), warm_up())))
+
+
+def _noop():
+    pass
+
+
+def _worker_context():
+    """
+    multiprocessing context for the worker pool. With
+    COLORIZE_SHARED_WEIGHTS=fork (see app.inference_backends): a fork
+    server that warms one net as it starts (app.fork_preload) and forks
+    every worker from it, so they share its weights. The server is a fresh
+    single-threaded process; the API process is not (progress, storage and
+    review threads could hold a lock at the moment of a fork). Otherwise
+    None (the default context).
+    """
+    from app.inference_backends import COLORIZE_BACKEND, shared_weights_mode
+
+    if shared_weights_mode() != "fork":
+        return None
+    if "forkserver" not in multiprocessing.get_all_start_methods():
+        logger.warning("COLORIZE_SHARED_WEIGHTS=fork is not supported here; workers load their own weights")
+        return None
+    if COLORIZE_BACKEND != "opencv":
+        # ONNX Runtime's thread pools do not survive fork
+        logger.warning("COLORIZE_SHARED_WEIGHTS=fork needs the opencv backend (use mmap for onnx)")
+        return None
+
+    context = multiprocessing.get_context("forkserver")
+    context.set_forkserver_preload(["app.fork_preload"])
+    return context
+
+
+# smaps_rollup fields (kB) reported by process_memory, as MB
+_MEMORY_FIELDS = {
+    "rss_mb": ("Rss",),
+    "pss_mb": ("Pss",),
+    "shared_mb": ("Shared_Clean", "Shared_Dirty"),
+    "private_mb": ("Private_Clean", "Private_Dirty"),
+}
+
+
+def process_memory(pid: int) -> dict | None:
+    """
+    Resident memory of a process in MB: rss, pss (shared pages divided
+    between their users), and shared / private pages. None where
+    /proc/<pid>/smaps_rollup is unavailable (non-Linux, process gone).
+    """
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            lines = f.readlines()
+    except OSError:
+        return None
+
+    kb = {}
+    for line in lines[1:]:
+        key, _, value = line.partition(":")
+        kb[key] = int(value.split()[0])
+    return {
+        name: round(sum(kb.get(key, 0) for key in keys) / 1024, 1)
+        for name, keys in _MEMORY_FIELDS.items()
+    }
+
+
+def _run_timed(fn, submitted_at: float, *args, **kwargs):
+    """Reports the job's queue wait, then runs fn (picklable wrapper)."""
+    if _progress_queue is not None:
+        _progress_queue.put((QUEUE_WAIT, time.time() - submitted_at))
+    return fn(*args, **kwargs)
+
+
+class _ProgressReporter:
+    """Picklable progress callback passed into jobs as progress=..."""
+
+    def __init__(self, token: str):
+        self.token = token
+
+    def __call__(self, stage: str):
+        if _progress_queue is not None:
+            _progress_queue.put((self.token, stage))
+
+
+class JobExecutor:
+    """
+    Bounded executor for CPU-heavy image jobs.
+
+    Jobs run in a process pool so they never block the event loop (or each
+    other through the GIL). At most workers + queue_depth jobs are admitted
+    at once; beyond that run() raises QueueFull immediately. A job that is
+    still queued when its timeout expires is cancelled; one that is already
+    running keeps its slot until it actually finishes, so timeouts cannot be
+    used to overfill the pool.
+    """
+
+    def __init__(
+        self,
+        workers: int = JOB_WORKERS,
+        queue_depth: int = JOB_QUEUE_DEPTH,
+        timeout: float = JOB_TIMEOUT_S,
+    ):
+        self.workers = workers
+        self.concurrency = workers or _DEFAULT_WORKERS
+        self.max_pending = self.concurrency + queue_depth
+        self.timeout = timeout
+        self._pool: Executor | None = None
+        self._pending = 0
+        self._lock = threading.Lock()
+        self._progress_queue = None
+        self._listeners = {}
+        self._warm_workers = {}
+
+    @property
+    def uses_processes(self) -> bool:
+        return self.workers > 0
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    @property
+    def warm_workers(self) -> int:
+        """Worker processes whose colorization net warmed up successfully."""
+        return sum(self._warm_workers.values())
+
+    def worker_memory(self) -> dict:
+        """process_memory() of the API process and of each started worker."""
+        from app.inference_backends import COLORIZE_SHARED_WEIGHTS
+
+        return {
+            "shared_weights": COLORIZE_SHARED_WEIGHTS,
+            "api": process_memory(os.getpid()),
+            "workers": {pid: process_memory(pid) for pid in list(self._warm_workers)},
+        }
+
+    def start(self):
+        global _progress_queue
+        if self._pool is not None:
+            return
+
+        mp_context = _worker_context() if self.uses_processes else None
+        if self._progress_queue is None:
+            self._progress_queue = (mp_context or multiprocessing).Queue() if self.uses_processes else queue.Queue()
+            threading.Thread(
+                target=self._dispatch_progress,
+                name="image-job-progress",
+                daemon=True,
+            ).start()
+
+        if self.uses_processes:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=mp_context,
+                initializer=_init_worker,
+                initargs=(self._progress_queue, self.workers),
+            )
+            if mp_context is not None:
+                # Launching a worker waits for the fork server's warm-up:
+                # do it here (off the event loop at startup), not in the
+                # first request's submit
+                self._pool.submit(_noop)
+        else:
+            _progress_queue = self._progress_queue
+            self._pool = ThreadPoolExecutor(
+                max_workers=self.concurrency,
+                thread_name_prefix="image-job",
+            )
+
+    def prestart(self):
+        """
+        Starts every worker process now instead of on demand and waits until
+        each has finished its warm-up. No-op for thread mode.
+        """
+        self.start()
+        if self.uses_processes:
+            wait([self._pool.submit(_noop) for _ in range(self.workers)])
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _dispatch_progress(self):
+        while True:
+            token, stage = self._progress_queue.get()
+            if token == WORKER_READY:
+                pid, warm = stage
+                self._warm_workers[pid] = warm
+                logger.info("Job worker %d ready (model warm: %s, memory: %s)", pid, warm, process_memory(pid))
+                continue
+            if token == QUEUE_WAIT:
+                metrics.QUEUE_WAIT_SECONDS.observe(stage)
+                continue
+            callback = self._listeners.get(token)
+            if callback is not None:
+                callback(stage)
+
+    def _release(self, _future):
+        with self._lock:
+            self._pending -= 1
+
+    def _submit(self, fn, *args, **kwargs):
+        self.start()
+        try:
+            return self._pool.submit(fn, *args, **kwargs)
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); replace the pool.
+            self._pool = None
+            self._warm_workers.clear()
+            self.start()
+            return self._pool.submit(fn, *args, **kwargs)
+
+    def submit(self, fn, *args, progress=None, **kwargs) -> Future:
+        """
+        Admits fn(*args, **kwargs) to the pool or raises QueueFull. fn and
+        its arguments must be picklable. If progress is given, fn is called with a picklable
+        progress=... callback whose stage reports are forwarded to progress
+        in the API process (on a background thread).
+        """
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise QueueFull()
+            self._pending += 1
+
+        if progress is not None:
+            token = uuid.uuid4().hex
+            self._listeners[token] = progress
+            kwargs["progress"] = _ProgressReporter(token)
+
+        if metrics.METRICS_ENABLED:
+            # Wall clock: the wait is measured across processes
+            fn, args = _run_timed, (fn, time.time(), *args)
+
+        try:
+            future = self._submit(fn, *args, **kwargs)
+        except Exception:
+            self._release(None)
+            if progress is not None:
+                self._listeners.pop(token, None)
+            raise
+
+        future.add_done_callback(self._release)
+        if progress is not None:
+            future.add_done_callback(lambda _f: self._listeners.pop(token, None))
+        return future
+
+    async def wait(self, future: Future, timeout: float | None = None):
+        """Awaits a submitted job without blocking the event loop."""
+        limit = self.timeout if timeout is None else timeout
+
+        try:
+            return await asyncio.wait_for(
+                asyncio.shield(asyncio.wrap_future(future)),
+                limit,
+            )
+        except asyncio.TimeoutError:
+            future.cancel()
+            raise JobTimeout(f"Job did not finish within {limit:g}s")
+
+    async def run(self, fn, *args, progress=None, timeout: float | None = None, **kwargs):
+        """submit() + wait() in one call."""
+        return await self.wait(self.submit(fn, *args, progress=progress, **kwargs), timeout)
+
+
+_executor = JobExecutor()
+
+
+def get_executor() -> JobExecutor:
+    return _executor
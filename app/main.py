@@ -29,26 +29,102 @@ from fastapi import (
 )
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import Response
+from fastapi.responses import Response, StreamingResponse, JSONResponse
 
 # -----------------------------
 # Standard library imports
 # -----------------------------
 from pathlib import Path
 from datetime import datetime
+from contextlib import asynccontextmanager, contextmanager
+import asyncio
+import io
+import logging
+import mimetypes
 import uuid
 import json
 import os
+import sys
+import time
+import zipfile
 
 # -----------------------------
 # Internal application modules
 # -----------------------------
-from app.storage import UPLOAD_DIR, OUTPUT_DIR, clear_storage
-from app.pipeline import process_image
-from app.feedback_nlp import analyze_feedback
+from app import metrics
+from app.metrics import METRICS_ENABLED, get_registry, observe_pipeline, timed
+from app.storage import UPLOAD_DIR, OUTPUT_DIR, clear_storage, get_storage, storage_url
+from app.result_cache import get_result_cache, content_hash, cache_key
+from app.output_writer import OutputWriter, OUTPUT_FORMATS, QUALITY_PRESETS
+from app.jobs import get_executor, QueueFull, JobTimeout
+from app.job_store import get_job_store, FINISHED
+from app.feedback_nlp import analyze_feedback, get_feedback_scorer
+from app.feedback_nlp import is_warm as nlp_is_warm, warm_up as warm_up_nlp
+from app.review_store import get_review_store
+from app.render_cache import get_render_cache, etag_for
 from app.review_analytics import generate_satisfaction_pie
 from app.dev_analytics import analyze_reviews, generate_dev_report_png
 
+logger = logging.getLogger(__name__)
+
+# =============================================================================
+# STARTUP (MODEL WARM-UP)
+# =============================================================================
+WARMUP_MODELS = os.getenv("COLORIZE_WARMUP", "1") != "0"
+
+# Start-up progress reported by /api/ready
+_startup = {"started": False, "warm_up": "skipped"}
+
+
+def _warm_up_models(executor):
+    """
+    Loads the colorization net(s) and NLP models. Runs in the background
+    after start-up, so the server accepts requests while models load.
+    """
+    if executor.uses_processes:
+        # Each worker process warms its own net as it starts
+        executor.prestart()
+    else:
+        from app.model_registry import warm_up
+
+        warm_up()
+
+    warm_up_nlp()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    executor = get_executor()
+    # Off the event loop: with COLORIZE_SHARED_WEIGHTS=fork this waits for
+    # the fork server to load and warm the shared net
+    await asyncio.to_thread(executor.start)
+
+    # Rescans uploads/outputs and enforces the storage quota / TTL
+    storage = get_storage()
+    storage.start()
+
+    # Rebuild review aggregates from the checkpoint + unindexed log tail
+    reviews = get_review_store()
+    reviews.load()
+
+    warm_up_task = None
+    if WARMUP_MODELS:
+        _startup["warm_up"] = "running"
+        warm_up_task = asyncio.create_task(asyncio.to_thread(_warm_up_models, executor))
+        warm_up_task.add_done_callback(lambda _t: _startup.update(warm_up="done"))
+    _startup["started"] = True
+
+    yield
+
+    _startup["started"] = False
+    if warm_up_task is not None:
+        warm_up_task.cancel()
+    executor.shutdown()
+    # Reviews still waiting for sentiment are scored and written first
+    get_feedback_scorer().close()
+    reviews.close()
+    storage.close()
+
 
 # =============================================================================
 # FastAPI application initialization
@@ -57,6 +133,7 @@ app = FastAPI(
     title="AI Image Colorizer API",
     description="Backend API for image enhancement, colorization, and user feedback analytics",
     version="1.2.0",
+    lifespan=lifespan,
 )
 
 # =============================================================================
@@ -78,10 +155,39 @@ app.add_middleware(
 # =============================================================================
 # STATIC FILE SERVING
 # =============================================================================
+# Not every platform's mimetypes table knows the newer image formats
+mimetypes.add_type("image/webp", ".webp")
+mimetypes.add_type("image/avif", ".avif")
+
 app.mount("/uploads", StaticFiles(directory=UPLOAD_DIR), name="uploads")
 app.mount("/outputs", StaticFiles(directory=OUTPUT_DIR), name="outputs")
 
 
+@app.middleware("http")
+async def track_storage_access(request, call_next):
+    # Served files count as a use of their job for LRU eviction
+    response = await call_next(request)
+    path = request.url.path
+    if response.status_code in (200, 304) and path.startswith(("/uploads/", "/outputs/")):
+        get_storage().touch(path.rsplit("/", 1)[-1])
+    return response
+
+
+if METRICS_ENABLED:
+
+    @app.middleware("http")
+    async def record_request_metrics(request, call_next):
+        start = time.perf_counter()
+        response = await call_next(request)
+        # Route template (/api/jobs/{job_id}), not the raw path, so label
+        # values stay bounded
+        route = getattr(request.scope.get("route"), "path", "unmatched")
+        metrics.HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - start, request.method, route, response.status_code
+        )
+        return response
+
+
 # =============================================================================
 # DEV TOKEN SECURITY (LIGHTWEIGHT, NO ACCOUNTS)
 # =============================================================================
@@ -113,9 +219,195 @@ def root():
     }
 
 
+@app.get("/api/ready")
+def readiness():
+    """
+    Readiness probe. 200 once start-up has finished and model warm-up is
+    done (or disabled), 503 before that. Reports which models are warm;
+    a model that failed to warm up (e.g. missing files) reports false
+    without holding readiness back.
+    """
+    # Probing must not import OpenCV; if it is not loaded, nothing is warm
+    model_registry = sys.modules.get("app.model_registry")
+    executor = get_executor()
+
+    if executor.uses_processes:
+        colorization = {
+            "warm": executor.warm_workers == executor.workers,
+            "workers": executor.workers,
+            "warm_workers": executor.warm_workers,
+        }
+    else:
+        colorization = {"warm": bool(model_registry and model_registry.is_warm())}
+
+    ready = _startup["started"] and _startup["warm_up"] != "running"
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "ready": ready,
+            "warm_up": _startup["warm_up"],
+            "models": {
+                "colorization": colorization,
+                "nlp": {"warm": nlp_is_warm()},
+            },
+        },
+    )
+
+
 # =============================================================================
 # IMAGE UPLOAD + PROCESSING
 # =============================================================================
+ALLOWED_EXTENSIONS = [".png", ".jpg", ".jpeg", ".webp"]
+UNSUPPORTED_TYPE = "Unsupported file type. Use png, jpg, jpeg, or webp."
+
+# Largest accepted upload; bodies are read in UPLOAD_CHUNK_BYTES chunks.
+# The default fits a 24 MP 8-bit PNG that barely compresses (~72 MB); the
+# decoded size is limited separately by COLORIZE_MAX_MEMORY_MB.
+MAX_UPLOAD_MB = float(os.getenv("MAX_UPLOAD_MB", "80"))
+MAX_UPLOAD_BYTES = int(MAX_UPLOAD_MB * 1024 * 1024)
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+
+# Room for multipart boundaries/headers on top of the file itself
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+UPLOAD_PATHS = ("/api/upload", "/api/jobs")
+
+# Latency budget (seconds) for preview=true renders
+PREVIEW_TIMEOUT_S = float(os.getenv("PREVIEW_TIMEOUT_S", "15"))
+
+# Batch uploads: images processed at once across all batch requests
+# (0 = one per job worker), images per batch (ZIP members included) and
+# largest batch request
+BATCH_PATH = "/api/batch"
+BATCH_CONCURRENCY = max(0, int(os.getenv("BATCH_CONCURRENCY", "0")))
+BATCH_MAX_FILES = max(1, int(os.getenv("BATCH_MAX_FILES", "50")))
+BATCH_MAX_MB = float(os.getenv("BATCH_MAX_MB", "200"))
+BATCH_MAX_BYTES = int(BATCH_MAX_MB * 1024 * 1024)
+
+
+def _busy_error(e: QueueFull) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail="Server busy, please retry shortly.",
+        headers={"Retry-After": str(e.retry_after)},
+    )
+
+
+def _too_large_error(max_mb: float = MAX_UPLOAD_MB) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"File too large. Max upload size is {max_mb:g} MB.",
+    )
+
+
+@app.middleware("http")
+async def limit_upload_size(request, call_next):
+    # Reject oversized uploads from Content-Length, before the body is parsed
+    path = request.url.path
+    if request.method == "POST" and (path in UPLOAD_PATHS or path == BATCH_PATH):
+        max_mb, max_bytes = (BATCH_MAX_MB, BATCH_MAX_BYTES) if path == BATCH_PATH else (MAX_UPLOAD_MB, MAX_UPLOAD_BYTES)
+        length = request.headers.get("content-length")
+        if length and length.isdigit() and int(length) > max_bytes + MULTIPART_OVERHEAD_BYTES:
+            error = _too_large_error(max_mb)
+            return JSONResponse({"detail": error.detail}, status_code=error.status_code)
+    return await call_next(request)
+
+
+async def _read_upload(
+    file: UploadFile,
+    extensions: list[str] = ALLOWED_EXTENSIONS,
+    max_mb: float = MAX_UPLOAD_MB,
+) -> tuple[str, bytes] | None:
+    """
+    Returns (extension, bytes); None if the type is unsupported.
+    Reads in chunks and stops with 413 as soon as max_mb is exceeded.
+    """
+    ext = Path(file.filename or "").suffix.lower()
+    if ext not in extensions:
+        return None
+
+    max_bytes = int(max_mb * 1024 * 1024)
+    contents = bytearray()
+    while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+        contents += chunk
+        if len(contents) > max_bytes:
+            raise _too_large_error(max_mb)
+
+    if METRICS_ENABLED:
+        metrics.UPLOAD_BYTES.observe(len(contents))
+    return ext, bytes(contents)
+
+
+def _save_upload(ext: str, contents: bytes) -> tuple[Path, asyncio.Task]:
+    """
+    Picks a fresh name for the upload and writes it in the background.
+    Processing works from the in-memory bytes, so it does not wait for
+    the disk; await the returned task before relying on the file.
+    """
+    unique_name = f"{uuid.uuid4().hex}{ext}"
+    save_path = get_storage().upload_path(unique_name)
+    saved = asyncio.create_task(asyncio.to_thread(_write_upload, save_path, contents))
+    return save_path, saved
+
+
+def _write_upload(path: Path, contents: bytes):
+    path.write_bytes(contents)
+    get_storage().add(path)
+
+
+async def _discard_upload(save_path: Path, saved: asyncio.Task):
+    """Removes the saved upload of a request that failed."""
+    try:
+        # Let the write finish first so it cannot recreate the file
+        await saved
+    except Exception:
+        pass
+    get_storage().remove(save_path)
+
+
+def _pipeline():
+    """
+    app.pipeline, imported with the first image request: it pulls in
+    OpenCV, which API start-up and the non-image endpoints do not need.
+    """
+    from app import pipeline
+
+    return pipeline
+
+
+def _encoding(output_format: str, quality: str) -> dict:
+    """Validates the requested output encoding; kwargs for process_image."""
+    try:
+        writer = OutputWriter(output_format, quality)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"output_format": writer.format, "quality": writer.quality}
+
+
+def _result_key(contents: bytes, mode: str, encoding: dict) -> str:
+    mode = mode.lower().strip()
+    return cache_key(content_hash(contents), mode, _pipeline().pipeline_params(mode, **encoding))
+
+
+FORMAT_QUERY = Query(
+    "jpg",
+    alias="format",
+    description=f"Output format: {' | '.join(OUTPUT_FORMATS)}",
+)
+QUALITY_QUERY = Query(
+    "default",
+    description=f"Quality preset: {' | '.join(QUALITY_PRESETS)}",
+)
+
+
+def _job_links(job: dict) -> dict:
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "status_url": f"/api/jobs/{job['id']}",
+        "events_url": f"/api/jobs/{job['id']}/events",
+    }
+
+
 @app.post("/api/upload")
 async def upload_image(
     file: UploadFile = File(...),
@@ -123,36 +415,480 @@ async def upload_image(
         "enhance",
         description="Processing mode: enhance | colorize | both",
     ),
+    preview: bool = Query(
+        False,
+        description="Return low-resolution variants right away and render full resolution in the background",
+    ),
+    output_format: str = FORMAT_QUERY,
+    quality: str = QUALITY_QUERY,
 ):
-    ext = Path(file.filename).suffix.lower()
-    if ext not in [".png", ".jpg", ".jpeg", ".webp"]:
+    upload = await _read_upload(file)
+    if upload is None:
         return {
-            "error": "Unsupported file type. Use png, jpg, jpeg, or webp."
+            "error": UNSUPPORTED_TYPE
         }
+    ext, contents = upload
+    encoding = _encoding(output_format, quality)
 
-    unique_name = f"{uuid.uuid4().hex}{ext}"
-    save_path = UPLOAD_DIR / unique_name
+    # Same bytes + mode + parameters already processed: reuse the files
+    key = _result_key(contents, mode, encoding)
+    cached = _cached_upload(key)
+    if cached is not None:
+        return {"message": "Upload successful", "mode": mode, **cached}
+
+    if preview:
+        save_path, saved = _save_upload(ext, contents)
+        return await _upload_preview(contents, save_path, saved, mode, key, encoding)
+
+    processed = await _process_and_cache(ext, contents, mode, key, encoding)
+    return {"message": "Upload successful", "mode": mode, **processed}
+
+
+def _cached_upload(key: str) -> dict | None:
+    """Result fields of an upload served from the result cache, if any."""
+    cached = get_result_cache().get(key)
+    if cached is None:
+        return None
+    get_storage().touch(cached["original"].name)
+    return {
+        "original": storage_url(cached["original"]),
+        "variants": [storage_url(p) for p in cached["variants"]],
+        "cached": True,
+        "encode": None,
+    }
+
+
+async def _process_and_cache(ext: str, contents: bytes, mode: str, key: str, encoding: dict) -> dict:
+    """Saves and processes an upload, caches it; its result fields."""
+    save_path, saved = _save_upload(ext, contents)
+    try:
+        with get_storage().hold(save_path.stem):
+            result = await _process_upload(contents, save_path, saved, mode, encoding)
+    except Exception:
+        await _discard_upload(save_path, saved)
+        raise
+    get_result_cache().put(key, save_path, result.variants)
+    return {
+        "original": storage_url(save_path),
+        "variants": [storage_url(p) for p in result.variants],
+        "cached": False,
+        "encode": result.encode,
+    }
+
+
+@contextmanager
+def _job_errors(timeout_detail: str = "Image processing timed out."):
+    """
+    Maps failures of an image job to HTTP errors; shared by every path that
+    waits for process_image so they answer bad input the same way.
+    """
+    try:
+        yield
+    except QueueFull as e:
+        raise _busy_error(e)
+    except JobTimeout:
+        raise HTTPException(
+            status_code=504,
+            detail=timeout_detail,
+        )
+    except _pipeline().ImageTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        # Undecodable image or unknown mode
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+async def _process_upload(contents: bytes, save_path: Path, saved: asyncio.Task, mode: str, encoding: dict):
+    """Processes an upload on the job pool; HTTP errors for failures."""
+    storage = get_storage()
+
+    # CPU-heavy: run in the job pool so the event loop stays responsive.
+    # The worker decodes the upload bytes once; no disk round trip.
+    with _job_errors():
+        result = await get_executor().run(
+            _pipeline().process_image,
+            contents,
+            storage.output_dir(save_path.stem),
+            mode,
+            stem=save_path.stem,
+            **encoding,
+        )
+
+    await saved
+    storage.add(*result.variants)
+    observe_pipeline(mode.lower().strip(), result.profile, result.encode["bytes"])
+    return result
+
+
+# =============================================================================
+# ASYNCHRONOUS JOBS (SUBMIT + POLL / SERVER-SENT EVENTS)
+# =============================================================================
+# Strong references so pending job tasks are not garbage-collected
+_job_tasks = set()
+
+
+async def _run_job(job_id: str, future, key: str, mode: str, save_path: Path, saved: asyncio.Task):
+    store = get_job_store()
+    storage = get_storage()
+    try:
+        with storage.hold(save_path.stem):
+            result = await get_executor().wait(future)
+            await saved
+            storage.add(*result.variants)
+    except JobTimeout:
+        store.update(job_id, status="error", error="Image processing timed out.")
+        await _discard_upload(save_path, saved)
+    except Exception as e:
+        store.update(job_id, status="error", error=str(e) or type(e).__name__)
+        await _discard_upload(save_path, saved)
+    else:
+        observe_pipeline(mode.lower().strip(), result.profile, result.encode["bytes"])
+        get_result_cache().put(key, save_path, result.variants)
+        store.update(
+            job_id,
+            status="done",
+            stage=None,
+            variants=[storage_url(p) for p in result.variants],
+            encode=result.encode,
+        )
+
+
+def _start_job(
+    contents: bytes,
+    save_path: Path,
+    saved: asyncio.Task,
+    mode: str,
+    key: str,
+    encoding: dict,
+) -> dict:
+    """
+    Submits an upload as a background job tracked in the job store.
+    Raises QueueFull (after marking the job as failed) when the pool is full.
+    """
+    store = get_job_store()
+    job = store.create(mode, storage_url(save_path))
+    job_id = job["id"]
+
+    def on_progress(stage: str):
+        store.update(job_id, status="running", stage=stage)
 
-    contents = await file.read()
-    save_path.write_bytes(contents)
+    try:
+        future = get_executor().submit(
+            _pipeline().process_image,
+            contents,
+            get_storage().output_dir(save_path.stem),
+            mode,
+            progress=on_progress,
+            stem=save_path.stem,
+            **encoding,
+        )
+    except QueueFull:
+        store.update(job_id, status="error", error="Server busy")
+        raise
+
+    task = asyncio.create_task(_run_job(job_id, future, key, mode, save_path, saved))
+    _job_tasks.add(task)
+    task.add_done_callback(_job_tasks.discard)
+    return job
+
+
+async def _upload_preview(
+    contents: bytes,
+    save_path: Path,
+    saved: asyncio.Task,
+    mode: str,
+    key: str,
+    encoding: dict,
+) -> dict:
+    """
+    Renders low-resolution variants within PREVIEW_TIMEOUT_S and queues the
+    full-resolution render as an async job the client can poll.
+    """
+    executor = get_executor()
+    storage = get_storage()
+    try:
+        with _job_errors("Preview rendering timed out."), storage.hold(save_path.stem):
+            preview = await executor.run(
+                _pipeline().process_image,
+                contents,
+                storage.output_dir(save_path.stem),
+                mode,
+                timeout=PREVIEW_TIMEOUT_S,
+                preview=True,
+                stem=save_path.stem,
+                **encoding,
+            )
+    except HTTPException:
+        await _discard_upload(save_path, saved)
+        raise
+    storage.add(*preview.variants)
+    observe_pipeline(f"{mode.lower().strip()}_preview", preview.profile, preview.encode["bytes"])
 
-    variant_paths = process_image(save_path, OUTPUT_DIR, mode)
-    variants = [f"/outputs/{p.name}" for p in variant_paths]
+    try:
+        full_job = _job_links(_start_job(contents, save_path, saved, mode, key, encoding))
+    except QueueFull:
+        # Preview is still useful; the client can retry for full resolution
+        full_job = None
+
+    await saved
 
     return {
         "message": "Upload successful",
         "mode": mode,
-        "original": f"/uploads/{save_path.name}",
-        "variants": variants,
+        "original": storage_url(save_path),
+        "variants": [storage_url(p) for p in preview.variants],
+        "cached": False,
+        "encode": preview.encode,
+        "preview": True,
+        "full_job": full_job,
     }
 
 
+@app.post("/api/jobs", status_code=202)
+async def create_job(
+    file: UploadFile = File(...),
+    mode: str = Query(
+        "enhance",
+        description="Processing mode: enhance | colorize | both",
+    ),
+    output_format: str = FORMAT_QUERY,
+    quality: str = QUALITY_QUERY,
+):
+    """
+    Queues an image for processing and returns immediately.
+    Poll GET /api/jobs/{id} or stream GET /api/jobs/{id}/events.
+    """
+    upload = await _read_upload(file)
+    if upload is None:
+        raise HTTPException(
+            status_code=400,
+            detail=UNSUPPORTED_TYPE,
+        )
+    ext, contents = upload
+    encoding = _encoding(output_format, quality)
+    store = get_job_store()
+
+    # Cached result: the job is born finished
+    key = _result_key(contents, mode, encoding)
+    cached = get_result_cache().get(key)
+    if cached is not None:
+        get_storage().touch(cached["original"].name)
+        job = store.create(mode, storage_url(cached["original"]))
+        job = store.update(
+            job["id"],
+            status="done",
+            variants=[storage_url(p) for p in cached["variants"]],
+        )
+        return _job_links(job)
+
+    save_path, saved = _save_upload(ext, contents)
+    try:
+        job = _start_job(contents, save_path, saved, mode, key, encoding)
+    except QueueFull as e:
+        await _discard_upload(save_path, saved)
+        raise _busy_error(e)
+
+    return _job_links(job)
+
+
+@app.get("/api/jobs/{job_id}")
+def get_job(job_id: str):
+    job = get_job_store().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@app.get("/api/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """
+    Server-sent events: a "progress" event per stage change and a final
+    "done" (with variant URLs) or "error" event, then the stream closes.
+    """
+    store = get_job_store()
+    if store.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def stream():
+        q = store.subscribe(job_id)
+        try:
+            # Re-read after subscribing so no update can fall in between
+            job = store.get(job_id)
+            while job is not None:
+                event = job["status"] if job["status"] in FINISHED else "progress"
+                yield f"event: {event}\ndata: {json.dumps(job)}\n\n"
+                if event != "progress":
+                    break
+                job = await q.get()
+        finally:
+            store.unsubscribe(job_id, q)
+
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache"},
+    )
+
+
+# =============================================================================
+# BATCH UPLOADS (MULTIPLE FILES / ZIP, STREAMED RESULTS)
+# =============================================================================
+_batch_slots = None
+
+
+def _batch_limiter() -> asyncio.Semaphore:
+    """
+    Shared by every batch request, so batch images queue here instead of
+    overflowing the job pool (which would answer 429).
+    """
+    global _batch_slots
+    if _batch_slots is None:
+        _batch_slots = asyncio.Semaphore(BATCH_CONCURRENCY or get_executor().concurrency)
+    return _batch_slots
+
+
+def _zip_items(archive: zipfile.ZipFile) -> list[dict]:
+    """Batch items for the images in a ZIP (read later, one at a time)."""
+    items = []
+    for info in archive.infolist():
+        name = Path(info.filename)
+        if info.is_dir() or name.name.startswith(".") or "__MACOSX" in name.parts:
+            continue
+        item = {"filename": info.filename}
+        if name.suffix.lower() not in ALLOWED_EXTENSIONS:
+            item.update(status=400, error=UNSUPPORTED_TYPE)
+        elif info.file_size > MAX_UPLOAD_BYTES:
+            item.update(status=413, error=_too_large_error().detail)
+        else:
+            item.update(ext=name.suffix.lower(), archive=archive, member=info)
+        items.append(item)
+    return items
+
+
+def _read_member(archive: zipfile.ZipFile, info: zipfile.ZipInfo) -> bytes:
+    # Sizes in ZIP headers are not trusted: stop reading past the limit
+    with archive.open(info) as f:
+        contents = f.read(MAX_UPLOAD_BYTES + 1)
+    if len(contents) > MAX_UPLOAD_BYTES:
+        raise _too_large_error()
+    return contents
+
+
+async def _batch_result(item: dict, mode: str, encoding: dict) -> dict:
+    """Processes one batch item; its result (or error) entry."""
+    entry = {"index": item["index"], "filename": item["filename"]}
+    if "error" in item:
+        return {**entry, "status": item["status"], "error": item["error"]}
+
+    try:
+        async with _batch_limiter():
+            contents = item.get("contents")
+            if contents is None:
+                contents = await asyncio.to_thread(_read_member, item["archive"], item["member"])
+            key = _result_key(contents, mode, encoding)
+            fields = _cached_upload(key) or await _process_and_cache(item["ext"], contents, mode, key, encoding)
+    except HTTPException as e:
+        return {**entry, "status": e.status_code, "error": e.detail}
+    except zipfile.BadZipFile as e:
+        return {**entry, "status": 400, "error": str(e)}
+    except Exception as e:
+        # One failed image (missing model, broken worker pool, corrupt zip
+        # member) must not end the stream for the rest of the batch
+        logger.exception("Batch item %d (%s) failed", item["index"], item["filename"])
+        return {**entry, "status": 500, "error": str(e) or type(e).__name__}
+    return {**entry, "status": 200, **fields}
+
+
+async def _stream_batch(items: list[dict], mode: str, encoding: dict, stream: str):
+    def event(name: str, data: dict) -> str:
+        if stream == "sse":
+            return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+        return json.dumps(data) + "\n"
+
+    tasks = [asyncio.create_task(_batch_result(item, mode, encoding)) for item in items]
+    failed = 0
+    try:
+        for next_result in asyncio.as_completed(tasks):
+            result = await next_result
+            failed += "error" in result
+            yield event("error" if "error" in result else "result", result)
+        yield event("done", {"done": True, "images": len(items), "failed": failed})
+    finally:
+        # Client went away: drop the images that have not started yet
+        for task in tasks:
+            task.cancel()
+
+
+@app.post(BATCH_PATH)
+async def upload_batch(
+    files: list[UploadFile] = File(..., description="Images and/or ZIP archives of images"),
+    mode: str = Query(
+        "enhance",
+        description="Processing mode: enhance | colorize | both",
+    ),
+    stream: str = Query("ndjson", description="Result stream: ndjson | sse"),
+    output_format: str = FORMAT_QUERY,
+    quality: str = QUALITY_QUERY,
+):
+    """
+    Processes several images (or ZIP archives of images) concurrently and
+    streams one result per image, in completion order, as each finishes;
+    a final "done" entry ends the stream.
+    """
+    if stream not in ("ndjson", "sse"):
+        raise HTTPException(status_code=400, detail="stream must be ndjson or sse.")
+    if mode.lower().strip() not in ("enhance", "colorize", "both"):
+        raise HTTPException(status_code=400, detail="Invalid mode. Use enhance, colorize, or both.")
+    encoding = _encoding(output_format, quality)
+
+    # Read everything now: uploaded files are closed once this returns
+    items = []
+    for file in files:
+        if Path(file.filename or "").suffix.lower() == ".zip":
+            _, data = await _read_upload(file, [".zip"], BATCH_MAX_MB)
+            try:
+                items += _zip_items(zipfile.ZipFile(io.BytesIO(data)))
+            except zipfile.BadZipFile:
+                raise HTTPException(status_code=400, detail=f"{file.filename} is not a valid ZIP archive.")
+        else:
+            item = {"filename": file.filename}
+            try:
+                upload = await _read_upload(file)
+            except HTTPException as e:
+                upload = None
+                item.update(status=e.status_code, error=e.detail)
+            if upload is not None:
+                item.update(ext=upload[0], contents=upload[1])
+            elif "error" not in item:
+                item.update(status=400, error=UNSUPPORTED_TYPE)
+            items.append(item)
+
+        if len(items) > BATCH_MAX_FILES:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Too many images. Max {BATCH_MAX_FILES} per batch.",
+            )
+
+    for index, item in enumerate(items):
+        item["index"] = index
+
+    return StreamingResponse(
+        _stream_batch(items, mode, encoding, stream),
+        media_type="text/event-stream" if stream == "sse" else "application/x-ndjson",
+        headers={"Cache-Control": "no-cache"},
+    )
+
+
 # =============================================================================
 # STORAGE CLEANUP
 # =============================================================================
 @app.delete("/api/delete_all")
-def delete_all():
+def delete_all(_: None = Depends(verify_dev_token)):
+    """
+    Deletes all uploads and outputs (jobs still being processed are kept).
+    """
     clear_storage()
+    get_result_cache().clear()
     return {
         "message": "All uploads and outputs deleted."
     }
@@ -161,6 +897,12 @@ def delete_all():
 # =============================================================================
 # SLIDER-BASED USER REVIEW SUBMISSION
 # =============================================================================
+
+# Score comment sentiment off the request path. The response then carries
+# no sentiment and returns before the review is written ("durable": false):
+# a crash before the write loses reviews that were already acknowledged.
+REVIEW_SENTIMENT_ASYNC = os.getenv("REVIEW_SENTIMENT_ASYNC", "1") != "0"
+
 @app.post("/api/reviews")
 async def submit_review(payload: dict = Body(...)):
     """
@@ -173,73 +915,173 @@ async def submit_review(payload: dict = Body(...)):
     }
     """
 
-    reviews_dir = Path("Reviews")
-    reviews_dir.mkdir(exist_ok=True)
-    reviews_file = reviews_dir / "reviews.jsonl"
-
+    received = time.perf_counter()
     score = max(0, min(100, int(payload.get("score", 0))))
     label = payload.get("label", "Unknown")
     comment = payload.get("comment", "")
-
-    sentiment = analyze_feedback(comment)
+    if not isinstance(label, str) or not label:
+        raise HTTPException(status_code=400, detail="label must be a non-empty string")
 
     record = {
         "label": label,
         "score": score,
-        "sentiment": sentiment,
+        "sentiment": None,
         "timestamp": datetime.utcnow().isoformat(),
     }
 
-    with open(reviews_file, "a", encoding="utf-8") as f:
-        f.write(json.dumps(record) + "\n")
+    if REVIEW_SENTIMENT_ASYNC:
+        # Scored and written in the background; the response does not wait
+        get_feedback_scorer().score(comment).add_done_callback(
+            lambda future: _store_scored_review(record, future, received)
+        )
+        return {
+            "message": "Review accepted",
+            "sentiment": None,
+            "durable": False,
+        }
+
+    sentiment = await asyncio.to_thread(analyze_feedback, comment)
+    record["sentiment"] = sentiment
+
+    # Resolves once the review's group commit is on disk
+    await asyncio.wrap_future(get_review_store().append(record))
+    if METRICS_ENABLED:
+        metrics.REVIEW_INGEST_SECONDS.observe(time.perf_counter() - received)
 
     return {
         "message": "Review recorded",
         "sentiment": sentiment,
+        "durable": True,
     }
 
 
+def _store_scored_review(record: dict, future, received: float):
+    try:
+        sentiment = future.result()
+    except Exception:
+        # Keep the score even if the comment could not be analysed
+        logger.exception("Sentiment analysis failed; storing review without it")
+        sentiment = analyze_feedback("")
+    written = get_review_store().append(dict(record, sentiment=sentiment))
+    if METRICS_ENABLED:
+        written.add_done_callback(
+            lambda _f: metrics.REVIEW_INGEST_SECONDS.observe(time.perf_counter() - received)
+        )
+
+
 # =============================================================================
 # USER SATISFACTION ANALYTICS (PUBLIC)
 # =============================================================================
-@app.get("/api/reviews/summary")
-def review_summary():
-    image_bytes = generate_satisfaction_pie()
+def _cached_png(name: str, render, if_none_match: str | None) -> Response:
+    """
+    Serves a review chart from the render cache. Charts are re-rendered
+    only after new reviews arrive; clients revalidating with the current
+    ETag get 304 without any rendering.
+    """
+    key = get_review_store().position()
+    etag = etag_for(name, key)
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+
+    if if_none_match:
+        tags = [t.strip().removeprefix("W/") for t in if_none_match.split(",")]
+        if etag in tags or "*" in tags:
+            return Response(status_code=304, headers=headers)
+
+    image_bytes, _ = get_render_cache().get(name, key, render)
     return Response(
         content=image_bytes,
         media_type="image/png",
+        headers=headers,
     )
 
 
+@app.get("/api/reviews/summary")
+def review_summary(if_none_match: str | None = Header(None)):
+    return _cached_png("satisfaction_pie", generate_satisfaction_pie, if_none_match)
+
+
 # =============================================================================
 # DEVELOPER ANALYTICS (TOKEN-PROTECTED)
 # =============================================================================
 @app.get("/api/dev/analytics")
-def dev_analytics(_: None = Depends(verify_dev_token)):
+def dev_analytics(
+    days: float | None = Query(None, gt=0, description="Only include reviews from the last N days"),
+    _: None = Depends(verify_dev_token),
+):
     """
     Returns structured NLP + score analytics for developer inspection.
     """
-    return analyze_reviews()
+    with timed(metrics.ANALYTICS_SECONDS, "dev_analytics"):
+        return analyze_reviews(window_days=days)
+
+
+@app.get("/api/dev/cache")
+def dev_cache_stats(_: None = Depends(verify_dev_token)):
+    """
+    Returns hit/miss counters and size of the upload result cache.
+    """
+    return get_result_cache().stats()
+
+
+@app.get("/api/dev/storage")
+def dev_storage_stats(_: None = Depends(verify_dev_token)):
+    """
+    Returns usage, quota and eviction counters of uploads/ + outputs/.
+    """
+    return get_storage().stats()
+
+
+@app.get("/api/dev/workers")
+def dev_worker_memory(_: None = Depends(verify_dev_token)):
+    """
+    Returns the shared-weights mode and the resident memory (RSS, PSS,
+    shared / private MB) of the API process and each job worker.
+    """
+    return get_executor().worker_memory()
 
 
 @app.get("/api/dev/report")
-def dev_report(_: None = Depends(verify_dev_token)):
+def dev_report(
+    if_none_match: str | None = Header(None),
+    _: None = Depends(verify_dev_token),
+):
     """
     Returns a PNG report summarizing review analytics.
     """
-    image_bytes = generate_dev_report_png()
-    return Response(
-        content=image_bytes,
-        media_type="image/png",
-    )
+    return _cached_png("dev_report", generate_dev_report_png, if_none_match)
+
+
+# =============================================================================
+# METRICS (PROMETHEUS TEXT FORMAT)
+# =============================================================================
+_registry = get_registry()
+_registry.gauge("jobs_pending", "Image jobs queued or running.", lambda: get_executor().pending)
+_registry.gauge("warm_workers", "Job worker processes with a loaded net.", lambda: get_executor().warm_workers)
+_registry.gauge("storage_bytes", "Bytes in uploads/ + outputs/.", lambda: get_storage().stats()["bytes"])
+_registry.gauge("result_cache_entries", "Entries in the upload result cache.", lambda: get_result_cache().stats()["entries"])
+
+
+@app.get("/metrics", include_in_schema=False)
+def metrics_endpoint():
+    """
+    Histograms and gauges of this API process (job stages are recorded
+    here when their results come back from the workers).
+    """
+    if not METRICS_ENABLED:
+        raise HTTPException(status_code=404, detail="Metrics are disabled")
+    return Response(_registry.render(), media_type="text/plain; version=0.0.4")
 
 
 # =============================================================================
 # DIRECT EXECUTION (FOR EXE BUILDS)
 # =============================================================================
 if __name__ == "__main__":
+    import multiprocessing
     import uvicorn
 
+    # Required for the job process pool in frozen (EXE) builds
+    multiprocessing.freeze_support()
+
     uvicorn.run(
         "app.main:app",
         host="127.0.0.1",
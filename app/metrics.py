@@ -0,0 +1,239 @@
+"""
+In-process metrics exported in the Prometheus text format (GET /metrics).
+
+Histograms and gauges live in a module-level registry. Pipeline stages run
+in job worker processes, so process_image collects its stage timings in a
+StageTimes dict and returns them with the result; the API process observes
+them here once the job is done.
+
+With METRICS_ENABLED=0 nothing is recorded: stage() returns a shared no-op
+context manager, process_image collects nothing and the observe helpers
+return immediately.
+"""
+
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar, copy_context
+from typing import Callable
+import bisect
+import os
+import threading
+import time
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+
+# Bucket upper bounds
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+MEGAPIXEL_BUCKETS = (0.1, 0.3, 0.5, 1, 2, 5, 12, 24, 50)
+BYTES_BUCKETS = (1e4, 1e5, 5e5, 1e6, 2.5e6, 5e6, 1e7, 2.5e7, 5e7)
+
+PREFIX = "colorizer_"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: tuple[str, ...], values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels."""
+
+    def __init__(self, name: str, help: str, buckets: tuple = SECONDS_BUCKETS, labels: tuple[str, ...] = ()):
+        self.name = PREFIX + name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        self.labels = labels
+        # label values -> [bucket counts..., +Inf count], sum
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = sorted((k, list(v[0]), v[1]) for k, v in self._series.items())
+        for values, counts, total in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = _format_labels(self.labels, values, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            labels = _format_labels(self.labels, values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """A value read from a callback at scrape time."""
+
+    def __init__(self, name: str, help: str, read: Callable[[], float]):
+        self.name = PREFIX + name
+        self.help = help
+        self.read = read
+
+    def render(self) -> list[str]:
+        try:
+            value = self.read()
+        except Exception:
+            return []
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} gauge", f"{self.name} {_format_value(value)}"]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+
+    def histogram(self, name: str, help: str, buckets: tuple = SECONDS_BUCKETS, labels: tuple[str, ...] = ()) -> Histogram:
+        return self._metrics.setdefault(name, Histogram(name, help, buckets, labels))
+
+    def gauge(self, name: str, help: str, read: Callable[[], float]) -> Gauge:
+        self._metrics[name] = Gauge(name, help, read)
+        return self._metrics[name]
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+_registry = Registry()
+
+
+def get_registry() -> Registry:
+    return _registry
+
+
+# =============================================================================
+# Metrics
+# =============================================================================
+STAGE_SECONDS = _registry.histogram(
+    "stage_seconds", "Time per image in each pipeline stage.", labels=("mode", "stage")
+)
+PIPELINE_SECONDS = _registry.histogram(
+    "pipeline_seconds", "process_image time per image (in the worker).", labels=("mode",)
+)
+QUEUE_WAIT_SECONDS = _registry.histogram(
+    "job_queue_wait_seconds", "Time image jobs wait for a free worker."
+)
+IMAGE_MEGAPIXELS = _registry.histogram(
+    "image_megapixels", "Size of processed images.", MEGAPIXEL_BUCKETS, labels=("mode",)
+)
+UPLOAD_BYTES = _registry.histogram(
+    "upload_bytes", "Size of accepted uploads.", BYTES_BUCKETS
+)
+OUTPUT_BYTES = _registry.histogram(
+    "output_bytes", "Bytes of encoded variants written per image.", BYTES_BUCKETS, labels=("mode",)
+)
+REVIEW_INGEST_SECONDS = _registry.histogram(
+    "review_ingest_seconds", "Time from review submission until it is written (including sentiment)."
+)
+ANALYTICS_SECONDS = _registry.histogram(
+    "analytics_seconds", "Time to compute an analytics response or render a chart.", labels=("name",)
+)
+HTTP_REQUEST_SECONDS = _registry.histogram(
+    "http_request_seconds", "API request latency by route.", labels=("method", "route", "status")
+)
+
+
+def observe_pipeline(mode: str, profile: dict | None, output_bytes: int):
+    """Records the profile returned by process_image for one image."""
+    if not METRICS_ENABLED or profile is None:
+        return
+    for stage_name, seconds in profile["stages"].items():
+        STAGE_SECONDS.observe(seconds, mode, stage_name)
+    PIPELINE_SECONDS.observe(profile["seconds"], mode)
+    IMAGE_MEGAPIXELS.observe(profile["megapixels"], mode)
+    OUTPUT_BYTES.observe(output_bytes, mode)
+
+
+@contextmanager
+def timed(histogram: Histogram, *label_values):
+    """Observes the duration of the block (when metrics are enabled)."""
+    if not METRICS_ENABLED:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        histogram.observe(time.perf_counter() - start, *label_values)
+
+
+# =============================================================================
+# Pipeline stage timing
+# =============================================================================
+class StageTimes(dict):
+    """Seconds per stage name, summed over every call (threads included)."""
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+
+    def add(self, name: str, seconds: float):
+        with self._lock:
+            self[name] = self.get(name, 0.0) + seconds
+
+
+_stage_times: ContextVar[StageTimes | None] = ContextVar("stage_times", default=None)
+_NO_STAGE = nullcontext()
+
+
+@contextmanager
+def collect_stages():
+    """Collects stage() timings of the block (and bound threads) into a StageTimes."""
+    times = StageTimes()
+    token = _stage_times.set(times)
+    try:
+        yield times
+    finally:
+        _stage_times.reset(token)
+
+
+@contextmanager
+def _timed_stage(times: StageTimes, name: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        times.add(name, time.perf_counter() - start)
+
+
+def stage(name: str):
+    """Times a block as pipeline stage name; a no-op unless collecting."""
+    times = _stage_times.get()
+    if times is None:
+        return _NO_STAGE
+    return _timed_stage(times, name)
+
+
+def bind(fn: Callable) -> Callable:
+    """
+    fn running in a copy of the caller's context, so stage() calls made
+    on a pool thread are still collected. Bind once per task: a bound
+    function must not run on two threads at the same time.
+    """
+    if _stage_times.get() is None:
+        return fn
+    ctx = copy_context()
+    return lambda *args, **kwargs: ctx.run(fn, *args, **kwargs)
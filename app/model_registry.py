@@ -0,0 +1,181 @@
+from pathlib import Path
+from contextlib import contextmanager
+import logging
+import os
+import queue
+import threading
+
+import cv2
+import numpy as np
+
+from app import metrics
+
+logger = logging.getLogger(__name__)
+
+# Local paths (models will be stored here, ignored by git)
+MODELS_DIR = Path(__file__).resolve().parent.parent / "models" / "colorization"
+
+PROTO_PATH = MODELS_DIR / "colorization_deploy_v2.prototxt"
+MODEL_PATH = MODELS_DIR / "colorization_release_v2.caffemodel"
+PTS_PATH = MODELS_DIR / "pts_in_hull.npy"
+
+# Maximum number of loaded nets per process. A cv2.dnn.Net is not safe to
+# share between threads mid-forward, so each concurrent request checks out
+# its own net (inference backend instance); requests beyond this limit wait
+# for one to be returned.
+NET_POOL_SIZE = max(1, int(os.getenv("COLORIZE_NET_POOL_SIZE", "2")))
+
+# Input size expected by the Zhang colorization model
+NET_INPUT_SIZE = 224
+
+
+# =============================================================================
+# Model loading
+# =============================================================================
+
+def model_files_present() -> bool:
+    return PROTO_PATH.exists() and MODEL_PATH.exists() and PTS_PATH.exists()
+
+
+def _require_model_files():
+    if not model_files_present():
+        raise FileNotFoundError(
+            "Colorization model files not found in /models/colorization. "
+            "Make sure prototxt, caffemodel, pts_in_hull.npy exist in that folder."
+        )
+
+
+_pts_lock = threading.Lock()
+_pts_blob = None
+
+
+def _cluster_centers() -> np.ndarray:
+    """
+    Loads pts_in_hull.npy once per process, already reshaped into the
+    2x313x1x1 kernel expected by the class8_ab layer.
+    """
+    global _pts_blob
+    if _pts_blob is None:
+        with _pts_lock:
+            if _pts_blob is None:
+                pts = np.load(str(PTS_PATH))
+                _pts_blob = pts.transpose().reshape(2, 313, 1, 1).astype("float32")
+    return _pts_blob
+
+
+def load_colorization_net(model_path: Path = MODEL_PATH) -> cv2.dnn.Net:
+    """
+    Reads the Caffe net from disk and patches in the cluster centers.
+    Expensive (parses the ~125 MB caffemodel); use the pool instead.
+    """
+    _require_model_files()
+
+    net = cv2.dnn.readNetFromCaffe(str(PROTO_PATH), str(model_path))
+
+    # Add cluster centers as 1x1 convolution kernel to the model
+    class8_ab = net.getLayerId("class8_ab")
+    conv8_313_rh = net.getLayerId("conv8_313_rh")
+
+    net.getLayer(class8_ab).blobs = [_cluster_centers()]
+    net.getLayer(conv8_313_rh).blobs = [np.full([1, 313], 2.606, dtype="float32")]
+
+    return net
+
+
+# =============================================================================
+# Net pool
+# =============================================================================
+
+class NetPool:
+    """
+    Bounded pool of colorization nets (app.inference_backends instances).
+
+    Nets are created lazily (up to max_size) and handed out one per caller,
+    so concurrent requests never run forward() on the same net.
+    """
+
+    def __init__(self, max_size: int = NET_POOL_SIZE):
+        self.max_size = max_size
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    @property
+    def created(self) -> int:
+        return self._created
+
+    def _checkout(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            create = self._created < self.max_size
+            if create:
+                self._created += 1
+
+        if not create:
+            return self._idle.get()
+
+        try:
+            from app.inference_backends import create_backend
+
+            with metrics.stage("model_load"):
+                return create_backend()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    @contextmanager
+    def acquire(self):
+        net = self._checkout()
+        try:
+            yield net
+        finally:
+            self._idle.put(net)
+
+
+_pool = NetPool()
+
+
+def colorization_net():
+    """
+    Context manager yielding a ready-to-use colorization net:
+
+        with colorization_net() as net:
+            ab = net.forward(blob)
+    """
+    return _pool.acquire()
+
+
+# =============================================================================
+# Warm-up
+# =============================================================================
+
+_warm = threading.Event()
+
+
+def is_warm() -> bool:
+    return _warm.is_set()
+
+
+def warm_up() -> bool:
+    """
+    Loads one net and runs a dummy forward pass so the first real request
+    does not pay for model parsing and layer allocation.
+
+    Returns False (and logs) when the model is unavailable, so deployments
+    that only use "enhance" mode still start.
+    """
+    try:
+        with colorization_net() as net:
+            dummy = np.zeros((NET_INPUT_SIZE, NET_INPUT_SIZE), dtype="float32")
+            net.forward(cv2.dnn.blobFromImage(dummy))
+    except (FileNotFoundError, ValueError, RuntimeError, cv2.error) as e:
+        logger.warning("Colorization model warm-up skipped: %s", e)
+        return False
+
+    _warm.set()
+    return True
@@ -0,0 +1,126 @@
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+import os
+import threading
+import time
+
+import numpy as np
+
+from app import metrics
+
+# format -> (file extension, name of the cv2 quality flag)
+# "pjpg" is a progressive, Huffman-optimized JPEG (renders coarse-to-fine
+# in browsers and is usually a few percent smaller). Flags are looked up by
+# name so this table can be imported without loading OpenCV.
+OUTPUT_FORMATS = {
+    "jpg": (".jpg", "IMWRITE_JPEG_QUALITY"),
+    "pjpg": (".jpg", "IMWRITE_JPEG_QUALITY"),
+    "webp": (".webp", "IMWRITE_WEBP_QUALITY"),
+    "avif": (".avif", "IMWRITE_AVIF_QUALITY"),
+}
+
+# preset -> quality per format. "default" keeps OpenCV's own JPEG default,
+# so existing outputs are unchanged unless a client asks for something else.
+QUALITY_PRESETS = {
+    "default": {"jpg": None, "pjpg": None, "webp": 80, "avif": 60},
+    "high": {"jpg": 92, "pjpg": 92, "webp": 90, "avif": 80},
+    "balanced": {"jpg": 85, "pjpg": 85, "webp": 80, "avif": 60},
+    "small": {"jpg": 70, "pjpg": 70, "webp": 65, "avif": 45},
+}
+
+# Threads per process used to encode variants concurrently
+ENCODE_THREADS = max(1, int(os.getenv("ENCODE_THREADS", str(min(4, os.cpu_count() or 1)))))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def _encode_pool() -> ThreadPoolExecutor:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ThreadPoolExecutor(max_workers=ENCODE_THREADS, thread_name_prefix="encode")
+    return _pool
+
+
+class OutputWriter:
+    """
+    Encodes and writes variant images in one output format.
+
+    write_all() encodes a batch concurrently (cv2.imencode releases the GIL)
+    and accumulates bytes written and encode time in stats().
+    """
+
+    def __init__(self, output_format: str = "jpg", quality: str = "default", parallel: bool = True):
+        import cv2
+
+        output_format = output_format.lower().strip()
+        quality = quality.lower().strip()
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(f"Unsupported output format. Use one of: {', '.join(OUTPUT_FORMATS)}.")
+        if quality not in QUALITY_PRESETS:
+            raise ValueError(f"Unknown quality preset. Use one of: {', '.join(QUALITY_PRESETS)}.")
+
+        self.format = output_format
+        self.quality = quality
+        self.parallel = parallel
+        self.extension, quality_flag = OUTPUT_FORMATS[output_format]
+
+        if not cv2.haveImageWriter(self.extension):
+            raise ValueError(f"{output_format} encoding is not supported by this OpenCV build.")
+
+        self._params = []
+        value = QUALITY_PRESETS[quality][output_format]
+        if value is not None:
+            self._params += [getattr(cv2, quality_flag), value]
+        if output_format == "pjpg":
+            self._params += [cv2.IMWRITE_JPEG_PROGRESSIVE, 1, cv2.IMWRITE_JPEG_OPTIMIZE, 1]
+
+        self._lock = threading.Lock()
+        self._files = 0
+        self._bytes = 0
+        self._seconds = 0.0
+
+    @classmethod
+    def for_path(cls, path: Path) -> "OutputWriter":
+        """Writer whose format matches path's extension (jpg for unknown ones)."""
+        suffix = Path(path).suffix.lower().lstrip(".")
+        return cls("jpg" if suffix in ("jpg", "jpeg") or suffix not in OUTPUT_FORMATS else suffix)
+
+    def path(self, output_dir: Path, name: str) -> Path:
+        return output_dir / f"{name}{self.extension}"
+
+    def write(self, path: Path, img: np.ndarray) -> Path:
+        import cv2
+
+        start = time.perf_counter()
+        ok, buf = cv2.imencode(self.extension, img, self._params)
+        if not ok:
+            raise ValueError(f"Failed to encode {path.name}.")
+        elapsed = time.perf_counter() - start
+
+        path.write_bytes(buf)
+
+        with self._lock:
+            self._files += 1
+            self._bytes += buf.nbytes
+            self._seconds += elapsed
+        return path
+
+    def write_all(self, items: list[tuple[Path, np.ndarray]]) -> list[Path]:
+        """Writes (path, image) pairs; returns paths in the same order."""
+        with metrics.stage("encode"):
+            if self.parallel and len(items) > 1:
+                return list(_encode_pool().map(lambda item: self.write(*item), items))
+            return [self.write(path, img) for path, img in items]
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "format": self.format,
+                "quality": self.quality,
+                "files": self._files,
+                "bytes": self._bytes,
+                "encode_ms": round(self._seconds * 1000, 2),
+            }
@@ -1,37 +1,149 @@
 from pathlib import Path
-from app.enhance import enhance_variants
-from app.colorize import colorize_image
+from typing import Callable, NamedTuple
+from contextlib import nullcontext
+import os
+import time
+import cv2
+from app import metrics
+from app.enhance import DENOISE_STRATEGY, enhance_images, enhance_variants
+from app.colorize import ColorizeSpec, ImageTooLarge, colorize_variants  # noqa: F401 (re-exported)
+from app.image_io import ImageSource, read_image
+from app.output_writer import OutputWriter
 
+# Progress stages reported by process_image, in order
+STAGES = ["decode", "enhance", "infer", "post-process", "encode"]
 
-def process_image(input_path: Path, output_dir: Path, mode: str) -> list[Path]:
+# Long edge (px) of preview renders
+PREVIEW_LONG_EDGE = int(os.getenv("PREVIEW_LONG_EDGE", "512"))
+
+# (name, blend, saturation) for the three colorized styles
+COLORIZE_STYLES = [
+    ("natural", 0.85, 1.00),
+    ("soft", 0.65, 0.90),
+    ("vivid", 0.92, 1.25),
+]
+
+
+class ProcessResult(NamedTuple):
+    variants: list[Path]
+    # Output writer stats: format, quality, files, bytes, encode_ms
+    encode: dict
+    # With METRICS_ENABLED: seconds per stage, total seconds and megapixels
+    profile: dict | None = None
+
+
+def pipeline_params(mode: str, output_format: str = "jpg", quality: str = "default") -> dict:
+    """
+    Parameters that determine the outputs of a mode (used in result cache
+    keys, so changing a style invalidates previously cached results).
+    """
     mode = mode.lower().strip()
+    params = {"format": output_format, "quality": quality}
+    if mode in ("enhance", "both"):
+        params["denoise"] = DENOISE_STRATEGY
+    if mode in ("colorize", "both"):
+        params["styles"] = COLORIZE_STYLES
+    return params
+
+
+def _downscale_for_preview(img):
+    """Returns img downscaled so its long edge is at most PREVIEW_LONG_EDGE."""
+    height, width = img.shape[:2]
+    scale = PREVIEW_LONG_EDGE / max(height, width)
+    if scale >= 1.0:
+        return img
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    return cv2.resize(img, size, interpolation=cv2.INTER_AREA)
 
-    if mode == "enhance":
-        return enhance_variants(input_path, output_dir)
 
-    if mode == "colorize":
-        out1 = output_dir / f"{input_path.stem}_colorize1_natural.jpg"
-        out2 = output_dir / f"{input_path.stem}_colorize2_soft.jpg"
-        out3 = output_dir / f"{input_path.stem}_colorize3_vivid.jpg"
+def _colorize_specs(
+    output_dir: Path,
+    stem: str,
+    prefix: str,
+    writer: OutputWriter,
+) -> list[ColorizeSpec]:
+    return [
+        ColorizeSpec(
+            writer.path(output_dir, f"{stem}_{prefix}{i}_{name}"),
+            blend=blend,
+            saturation=saturation,
+            edge_smooth=True,
+        )
+        for i, (name, blend, saturation) in enumerate(COLORIZE_STYLES, start=1)
+    ]
+
+
+def process_image(
+    source: ImageSource,
+    output_dir: Path,
+    mode: str,
+    progress: Callable[[str], None] | None = None,
+    preview: bool = False,
+    stem: str | None = None,
+    output_format: str = "jpg",
+    quality: str = "default",
+) -> ProcessResult:
+    """
+    Runs the processing pipeline for one uploaded image.
+
+    source may be a path, the encoded upload bytes or a decoded array; it
+    is decoded exactly once and the array is shared by every stage. stem
+    names the outputs (defaults to the file stem when source is a path).
+
+    progress, if given, is called with each entry of STAGES that the
+    selected mode goes through, as that stage starts.
+
+    preview=True renders from a copy downscaled to PREVIEW_LONG_EDGE
+    (outputs are named <stem>_preview_...), for fast first results.
+
+    output_format (jpg, pjpg, webp, avif) and quality (an
+    output_writer.QUALITY_PRESETS name) control how variants are encoded.
+    Returns the variant paths plus bytes written and encode time (and,
+    with METRICS_ENABLED, a timing profile for app.metrics).
+    """
+    mode = mode.lower().strip()
+    report = progress or (lambda stage: None)
 
-        colorize_image(input_path, out1, blend=0.85, saturation=1.00, edge_smooth=True)
-        colorize_image(input_path, out2, blend=0.65, saturation=0.90, edge_smooth=True)
-        colorize_image(input_path, out3, blend=0.92, saturation=1.25, edge_smooth=True)
+    if mode not in ("enhance", "colorize", "both"):
+        raise ValueError("Invalid mode. Use enhance, colorize, or both.")
+    writer = OutputWriter(output_format, quality)
+    if stem is None:
+        stem = Path(source).stem
 
-        return [out1, out2, out3]
+    start = time.perf_counter()
+    with metrics.collect_stages() if metrics.METRICS_ENABLED else nullcontext() as stage_times:
+        report("decode")
+        with metrics.stage("decode"):
+            img = read_image(source)
+        megapixels = img.shape[0] * img.shape[1] / 1e6
+        if preview:
+            img = _downscale_for_preview(img)
+            stem = f"{stem}_preview"
 
-    if mode == "both":
-        # Enhance first (pick the best enhanced variant), then colorize it into 3 styles
-        enhanced = enhance_variants(input_path, output_dir)[0]
+        if mode == "enhance":
+            report("enhance")
+            variants = enhance_variants(img, output_dir, stem, writer=writer)
 
-        out1 = output_dir / f"{input_path.stem}_both1_natural.jpg"
-        out2 = output_dir / f"{input_path.stem}_both2_soft.jpg"
-        out3 = output_dir / f"{input_path.stem}_both3_vivid.jpg"
+        elif mode == "colorize":
+            # One forward pass, three post-processed styles
+            specs = _colorize_specs(output_dir, stem, "colorize", writer)
+            variants = colorize_variants(img, specs, progress=progress, writer=writer)
 
-        colorize_image(enhanced, out1, blend=0.85, saturation=1.00, edge_smooth=True)
-        colorize_image(enhanced, out2, blend=0.65, saturation=0.90, edge_smooth=True)
-        colorize_image(enhanced, out3, blend=0.92, saturation=1.25, edge_smooth=True)
+        else:
+            # mode == "both":
+            # Enhance first (pick the best enhanced variant), then colorize it into 3 styles
+            report("enhance")
+            # Only the denoised variant is colorized, so skip computing the others
+            enhanced = enhance_images(img, which=[0])[0]
 
-        return [out1, out2, out3]
+            specs = _colorize_specs(output_dir, stem, "both", writer)
+            variants = colorize_variants(enhanced, specs, progress=progress, writer=writer)
 
-    raise ValueError("Invalid mode. Use enhance, colorize, or both.")
+    profile = None
+    if stage_times is not None:
+        profile = {
+            "stages": dict(stage_times),
+            "seconds": time.perf_counter() - start,
+            "megapixels": megapixels,
+        }
+    return ProcessResult(variants, writer.stats(), profile)
@@ -0,0 +1,108 @@
+"""
+Fused post-processing kernels shared by the enhance and colorize variants.
+
+- Colorization applies blend and saturation as one chroma scale in LAB
+  (ab * blend * saturation) and converts to BGR once, instead of
+  converting to BGR, then to HSV and back.
+- Tone curves (contrast, warm tone) are single saturating passes written
+  in place into arrays the caller owns, instead of copy + channel add.
+  They are affine, which convertScaleAbs / a per-channel scalar cv2.add
+  evaluate faster than a 256-entry cv2.LUT (see
+  benchmarks/bench_postprocess.py).
+- The float32 scratch frames of a render come from a small pool of
+  preallocated buffers, reused across calls and images.
+"""
+
+from contextlib import contextmanager
+import os
+import threading
+
+import cv2
+import numpy as np
+
+# Free float32 scratch buffers kept for reuse. A colorization render holds
+# 2 (so 6 for 3 variants in parallel); 0 allocates them per call.
+POSTPROCESS_BUFFERS = max(0, int(os.getenv("POSTPROCESS_BUFFERS", "6")))
+
+
+# =============================================================================
+# Tone curves
+# =============================================================================
+def contrast(img: np.ndarray, alpha: float, beta: float, inplace: bool = False) -> np.ndarray:
+    """
+    saturate(|alpha * img + beta|) per channel; inplace=True writes into
+    img (only for arrays the caller owns, never a shared input).
+    """
+    return cv2.convertScaleAbs(img, dst=img if inplace else None, alpha=alpha, beta=beta)
+
+
+def warm(img: np.ndarray, red_offset: int, inplace: bool = False) -> np.ndarray:
+    """BGR img with the red channel raised by red_offset (saturating)."""
+    return cv2.add(img, (0, 0, red_offset, 0), dst=img if inplace else None)
+
+
+# =============================================================================
+# Scratch buffers
+# =============================================================================
+class BufferPool:
+    """
+    Reusable flat float32 buffers. take() hands out a view of a free
+    buffer at least as large as the request (allocating only when none
+    fits), so a run of same-sized images allocates its scratch once.
+    """
+
+    def __init__(self, max_free: int = POSTPROCESS_BUFFERS):
+        self.max_free = max_free
+        self._free: list[np.ndarray] = []
+        self._lock = threading.Lock()
+        self.allocations = 0
+
+    @contextmanager
+    def take(self, shape: tuple[int, ...]):
+        size = int(np.prod(shape))
+        with self._lock:
+            fits = [i for i, buf in enumerate(self._free) if buf.size >= size]
+            buf = self._free.pop(min(fits, key=lambda i: self._free[i].size)) if fits else None
+            if buf is None:
+                self.allocations += 1
+        if buf is None:
+            buf = np.empty(size, dtype=np.float32)
+        try:
+            yield buf[:size].reshape(shape)
+        finally:
+            with self._lock:
+                self._free.append(buf)
+                if len(self._free) > self.max_free:
+                    # Keep the largest buffers: they serve every smaller request
+                    self._free.sort(key=lambda b: b.size)
+                    del self._free[0]
+
+    def clear(self):
+        with self._lock:
+            self._free.clear()
+
+
+_buffers = BufferPool()
+
+
+def get_buffer_pool() -> BufferPool:
+    return _buffers
+
+
+# =============================================================================
+# Colorization
+# =============================================================================
+def render_chroma(L: np.ndarray, ab: np.ndarray, chroma_scale: float) -> np.ndarray:
+    """
+    BGR uint8 image from float32 L (0..100) and ab, with ab scaled by
+    chroma_scale (blend * saturation) in LAB. Only the returned image is
+    allocated; the LAB and BGR float frames are pooled scratch buffers.
+    """
+    height, width = L.shape[:2]
+    with _buffers.take((height, width, 3)) as lab, _buffers.take((height, width, 3)) as bgr:
+        lab[:, :, 0] = L
+        np.multiply(ab, chroma_scale, out=lab[:, :, 1:])
+        cv2.cvtColor(lab, cv2.COLOR_LAB2BGR, dst=bgr)
+        np.clip(bgr, 0.0, 1.0, out=bgr)
+        # Non-negative after the clip, so the "abs" is a plain scale + round
+        return cv2.convertScaleAbs(bgr, alpha=255.0)
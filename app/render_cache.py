@@ -0,0 +1,80 @@
+import hashlib
+import threading
+from typing import Callable, Hashable
+
+from app.metrics import ANALYTICS_SECONDS, timed
+
+# matplotlib's pyplot state is process-global, so renders never overlap.
+_render_lock = threading.Lock()
+
+
+def pyplot():
+    """
+    matplotlib.pyplot with the Agg backend, imported on first use: it
+    takes most of a second to import and only chart endpoints need it.
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    return plt
+
+
+def etag_for(name: str, key: Hashable) -> str:
+    digest = hashlib.blake2b(f"{name}:{key!r}".encode(), digest_size=12).hexdigest()
+    return f'"{digest}"'
+
+
+class RenderCache:
+    """
+    Latest rendering of each named artifact (e.g. a chart PNG), keyed on
+    the state it was rendered from.
+
+    get() re-renders only when the key changed since the last render and
+    returns the bytes together with an ETag derived from name and key, so
+    unchanged artifacts can also be answered with 304 Not Modified.
+    """
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.renders = 0
+
+    def get(self, name: str, key: Hashable, render: Callable[[], bytes]) -> tuple[bytes, str]:
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None and entry[0] == key:
+                self.hits += 1
+                return entry[1], entry[2]
+
+        with _render_lock:
+            # Someone else may have rendered this key while we waited
+            with self._lock:
+                entry = self._entries.get(name)
+                if entry is not None and entry[0] == key:
+                    self.hits += 1
+                    return entry[1], entry[2]
+
+            with timed(ANALYTICS_SECONDS, name):
+                content = render()
+            etag = etag_for(name, key)
+            with self._lock:
+                self._entries[name] = (key, content, etag)
+                self.renders += 1
+        return content, etag
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "renders": self.renders,
+            }
+
+
+_cache = RenderCache()
+
+
+def get_render_cache() -> RenderCache:
+    return _cache
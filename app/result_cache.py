@@ -0,0 +1,107 @@
+from collections import OrderedDict
+from pathlib import Path
+import hashlib
+import json
+import os
+import threading
+
+# Total size of cached output files (MB) before least-recently-used
+# entries are forgotten. The files themselves belong to the storage
+# manager (app.storage), which deletes them under its own quota / TTL.
+RESULT_CACHE_MAX_MB = float(os.getenv("RESULT_CACHE_MAX_MB", "512"))
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def cache_key(digest: str, mode: str, params: dict) -> str:
+    """Key for one processing result: image bytes + mode + variant parameters."""
+    return f"{digest}:{mode}:{json.dumps(params, sort_keys=True)}"
+
+
+class ResultCache:
+    """
+    Content-addressed LRU cache of processed results.
+
+    Maps cache_key(...) to the upload and output files already on disk, so a
+    repeated upload of the same bytes with the same mode and parameters can
+    be answered without writing or processing anything. Entries whose files
+    have disappeared are treated as misses.
+    """
+
+    def __init__(self, max_bytes: int = int(RESULT_CACHE_MAX_MB * 1024 * 1024)):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> dict | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and not all(p.exists() for p in entry["files"]):
+                self._drop(key)
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, original: Path, variants: list[Path]) -> dict:
+        files = [original, *variants]
+        size = sum(p.stat().st_size for p in files if p.exists())
+        entry = {
+            "original": original,
+            "variants": list(variants),
+            "files": files,
+            "bytes": size,
+        }
+
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = entry
+            self._bytes += size
+
+            while self._bytes > self.max_bytes and len(self._entries) > 1:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+        return entry
+
+    def _drop(self, key: str) -> dict:
+        entry = self._entries.pop(key)
+        self._bytes -= entry["bytes"]
+        return entry
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "evictions": self.evictions,
+            }
+
+
+_cache = ResultCache()
+
+
+def get_result_cache() -> ResultCache:
+    return _cache
@@ -1,20 +1,18 @@
-from pathlib import Path
-import json
-import matplotlib.pyplot as plt
 import io
-from collections import defaultdict
 import random
 
-import matplotlib
-matplotlib.use("Agg")
+from app.review_store import get_review_store
+from app.render_cache import pyplot
 
 # =============================================================================
 # Configuration
 # =============================================================================
 
-REVIEWS_FILE = Path("Reviews") / "reviews.jsonl"
 VARIANTS = ["Natural", "Vivid", "Warm"]
 
+# Fixed seed: demo charts are identical on every render, so they can be cached
+DEMO_SEED = 42
+
 # Muted, UI-friendly colors (blue, orange, green)
 PIE_COLORS = ["#4C78A8", "#F58518", "#54A24B"]
 
@@ -26,23 +24,16 @@ TITLE_COLOR = "#EAEAF1"
 # Helpers
 # =============================================================================
 
-def _load_reviews():
-    if not REVIEWS_FILE.exists():
-        return []
-
-    with open(REVIEWS_FILE, "r", encoding="utf-8") as f:
-        return [json.loads(line) for line in f if line.strip()]
-
-
 def _demo_scores():
     """
     Generates synthetic demo data when no real reviews exist.
     This keeps the UI alive and visually consistent.
     """
+    rng = random.Random(DEMO_SEED)
     return {
-        "Natural": [random.randint(70, 85) for _ in range(10)],
-        "Vivid": [random.randint(55, 75) for _ in range(10)],
-        "Warm": [random.randint(80, 92) for _ in range(10)],
+        "Natural": [rng.randint(70, 85) for _ in range(10)],
+        "Vivid": [rng.randint(55, 75) for _ in range(10)],
+        "Warm": [rng.randint(80, 92) for _ in range(10)],
     }
 
 
@@ -59,31 +50,24 @@ def generate_satisfaction_pie() -> bytes:
     - Designed to visually integrate with dark/glass UI
     - Returns raw PNG bytes (no filesystem writes)
     """
-    reviews = _load_reviews()
+    aggregates = get_review_store().aggregates(top_keywords=0)
     demo = False
 
-    scores_by_label = defaultdict(list)
+    labels = []
+    averages = []
 
     # ---------------------------------------------------------
-    # Load real data or fallback to demo
+    # Per-label averages from the review store, or demo data
     # ---------------------------------------------------------
-    if not reviews:
+    if not aggregates:
         demo = True
-        scores_by_label = _demo_scores()
-    else:
-        for r in reviews:
-            label = r.get("label")
-            score = r.get("score")
-            if label and isinstance(score, (int, float)):
-                scores_by_label[label].append(score)
-
-    labels = []
-    averages = []
-
-    for label, scores in scores_by_label.items():
-        if scores:
+        for label, scores in _demo_scores().items():
             labels.append(label)
             averages.append(sum(scores) / len(scores))
+    else:
+        for label, stats in aggregates.items():
+            labels.append(label)
+            averages.append(stats["avg_score"])
 
     # Absolute fallback (should never happen, but safe)
     if not averages:
@@ -94,6 +78,7 @@ def generate_satisfaction_pie() -> bytes:
     # ---------------------------------------------------------
     # Plot (dark / transparent theme)
     # ---------------------------------------------------------
+    plt = pyplot()
     fig, ax = plt.subplots(
         figsize=(6, 6),
         facecolor="none"
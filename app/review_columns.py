@@ -0,0 +1,277 @@
+from pathlib import Path
+from collections import Counter
+from datetime import datetime, timezone
+import io
+import json
+import os
+import shutil
+
+import numpy as np
+
+# Compacted (columnar) form of a sealed review segment: one directory per
+# segment under Reviews/columns/ holding a .npy file per column plus
+# meta.json with the label and keyword dictionaries.
+COLUMNS_DIR = "columns"
+# Version 2 keeps scores and sentiment in float64 (the values the JSONL
+# held); version 1 segments (float32) are still read.
+COLUMNS_VERSION = 2
+READABLE_VERSIONS = (1, COLUMNS_VERSION)
+
+# Column name -> dtype. kw_offsets has one more entry than there are rows:
+# the keyword ids of row i are kw_ids[kw_offsets[i]:kw_offsets[i + 1]].
+# end is the byte offset just past each row's line in the source segment.
+COLUMNS = {
+    "score": np.float64,
+    "polarity": np.float64,
+    "subjectivity": np.float64,
+    "timestamp": "datetime64[ms]",
+    "label": np.uint16,
+    "end": np.int64,
+    "kw_offsets": np.int64,
+    "kw_ids": np.int32,
+}
+
+_NAT = np.iinfo(np.int64).min
+
+
+def columns_dir(directory: Path, seq: int) -> Path:
+    return directory / COLUMNS_DIR / f"reviews-{seq:06d}"
+
+
+def compacted_segments(directory: Path) -> list[tuple[int, Path]]:
+    """Compacted segments as (seq, path), oldest first."""
+    segments = []
+    for path in (directory / COLUMNS_DIR).glob("reviews-*"):
+        if not (path / "meta.json").exists():
+            continue
+        try:
+            segments.append((int(path.name.split("-", 1)[1]), path))
+        except ValueError:
+            continue
+    return sorted(segments)
+
+
+def review_fields(record) -> tuple[str, float, dict] | None:
+    """
+    (label, score, sentiment) of a review record the aggregates count, or
+    None for records they skip: no string label, a non-numeric score or a
+    malformed sentiment (records come from user input and the log on disk).
+    """
+    if not isinstance(record, dict):
+        return None
+    label = record.get("label")
+    score = record.get("score")
+    sentiment = record.get("sentiment") or {}
+    if not isinstance(label, str) or not label or not isinstance(score, (int, float)):
+        return None
+    if not isinstance(sentiment, dict):
+        return None
+    keywords = sentiment.get("keywords", ())
+    if not isinstance(sentiment.get("polarity", 0.0), (int, float)) or not isinstance(
+        sentiment.get("subjectivity", 0.0), (int, float)
+    ):
+        return None
+    if not isinstance(keywords, (list, tuple)) or not all(isinstance(k, str) for k in keywords):
+        return None
+    return label, score, sentiment
+
+
+def _timestamp_ms(value) -> int:
+    if not isinstance(value, str):
+        return _NAT
+    try:
+        ts = datetime.fromisoformat(value)
+    except ValueError:
+        return _NAT
+    # Reviews are stamped with naive UTC times
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return int(ts.timestamp() * 1000)
+
+
+class SegmentColumns:
+    """
+    Column arrays for the reviews of one segment, either parsed from JSONL
+    or memory-mapped from a compacted segment directory.
+
+    Rows are the records the review store indexes (a label and a numeric
+    score); other lines are skipped. Labels and keywords are dictionary
+    encoded against the labels and keywords lists.
+    """
+
+    def __init__(self, arrays: dict[str, np.ndarray], labels: list[str], keywords: list[str]):
+        self.arrays = arrays
+        self.labels = labels
+        self.keywords = keywords
+
+    def __getattr__(self, name):
+        try:
+            return self.__dict__["arrays"][name]
+        except KeyError:
+            raise AttributeError(name) from None
+
+    def __len__(self) -> int:
+        return len(self.arrays["score"])
+
+    # -------------------------------------------------------------------------
+    # Building
+    # -------------------------------------------------------------------------
+    @classmethod
+    def from_jsonl(cls, source: Path | bytes, start: int = 0, stop: int | None = None) -> tuple["SegmentColumns", int]:
+        """
+        Parses complete lines of a JSONL segment (a file or its contents)
+        from byte offset start, up to stop. Returns the columns and the
+        offset just past the last complete line.
+        """
+        labels, keywords = {}, {}
+        cols = {name: [] for name in COLUMNS}
+        cols["kw_offsets"].append(0)
+        offset = start
+
+        with (io.BytesIO(source) if isinstance(source, bytes) else open(source, "rb")) as f:
+            f.seek(start)
+            for line in f:
+                if not line.endswith(b"\n") or (stop is not None and offset + len(line) > stop):
+                    break
+                offset += len(line)
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+
+                fields = review_fields(record)
+                if fields is None:
+                    continue
+                label, score, sentiment = fields
+
+                cols["score"].append(score)
+                cols["polarity"].append(sentiment.get("polarity", 0.0))
+                cols["subjectivity"].append(sentiment.get("subjectivity", 0.0))
+                cols["timestamp"].append(_timestamp_ms(record.get("timestamp")))
+                cols["label"].append(labels.setdefault(label, len(labels)))
+                cols["end"].append(offset)
+                for k in sentiment.get("keywords", ()):
+                    cols["kw_ids"].append(keywords.setdefault(k, len(keywords)))
+                cols["kw_offsets"].append(len(cols["kw_ids"]))
+
+        arrays = {}
+        for name, dtype in COLUMNS.items():
+            if name == "timestamp":
+                arrays[name] = np.array(cols[name], dtype=np.int64).view(dtype)
+            elif name == "label" and len(labels) > np.iinfo(dtype).max + 1:
+                # More distinct labels than the compact id type holds
+                arrays[name] = np.array(cols[name], dtype=np.uint32)
+            else:
+                arrays[name] = np.array(cols[name], dtype=dtype)
+        return cls(arrays, list(labels), list(keywords)), offset
+
+    def save(self, dest: Path, source_bytes: int):
+        """Writes the columns to dest atomically (via a temporary sibling)."""
+        tmp = dest.with_name(f"{dest.name}.{os.getpid()}.tmp")
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+
+        for name in COLUMNS:
+            np.save(tmp / f"{name}.npy", self.arrays[name])
+        (tmp / "meta.json").write_text(
+            json.dumps({
+                "version": COLUMNS_VERSION,
+                "rows": len(self),
+                "source_bytes": source_bytes,
+                "labels": self.labels,
+                "keywords": self.keywords,
+            }),
+            encoding="utf-8",
+        )
+        os.replace(tmp, dest)
+
+    @classmethod
+    def load(cls, path: Path) -> "SegmentColumns":
+        """Memory-maps a compacted segment."""
+        meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+        if meta.get("version") not in READABLE_VERSIONS:
+            raise ValueError(f"Unsupported review columns version in {path}")
+
+        arrays = {name: np.load(path / f"{name}.npy", mmap_mode="r") for name in COLUMNS}
+        return cls(arrays, meta["labels"], meta["keywords"])
+
+    @classmethod
+    def matches(cls, path: Path, rows: int, source_bytes: int) -> bool:
+        """
+        Whether path holds a complete compaction of rows rows from a
+        source_bytes JSONL segment (every column present and sized).
+        """
+        try:
+            meta = json.loads((path / "meta.json").read_text(encoding="utf-8"))
+            columns = cls.load(path)
+        except (OSError, ValueError, KeyError):
+            return False
+        if meta.get("rows") != rows or meta.get("source_bytes") != source_bytes:
+            return False
+        per_row = [name for name in COLUMNS if not name.startswith("kw_")]
+        if any(len(columns.arrays[name]) != rows for name in per_row):
+            return False
+        offsets = columns.kw_offsets
+        return len(offsets) == rows + 1 and len(columns.kw_ids) == int(offsets[-1])
+
+    # -------------------------------------------------------------------------
+    # Queries
+    # -------------------------------------------------------------------------
+    def first_row_after(self, offset: int) -> int:
+        """Index of the first row whose line starts at or after byte offset."""
+        return int(np.searchsorted(self.end, offset, side="right"))
+
+    def label_stats(self, rows: slice | np.ndarray = slice(None)) -> dict[str, dict]:
+        """
+        Per-label aggregates over the selected rows (a slice or boolean
+        mask), in first-seen label order. Values use the review store's
+        LabelStats.to_dict() layout so they can be merged into it.
+        """
+        codes = np.asarray(self.label[rows], dtype=np.intp)
+        if codes.size == 0:
+            return {}
+
+        scores = np.asarray(self.score[rows], dtype=np.float64)
+        counts = np.bincount(codes, minlength=len(self.labels))
+        sums = np.bincount(codes, weights=scores, minlength=len(self.labels))
+        means = np.divide(sums, counts, out=np.zeros_like(sums), where=counts > 0)
+        m2 = np.bincount(codes, weights=(scores - means[codes]) ** 2, minlength=len(self.labels))
+        polarity = np.bincount(codes, weights=self.polarity[rows], minlength=len(self.labels))
+        subjectivity = np.bincount(codes, weights=self.subjectivity[rows], minlength=len(self.labels))
+
+        # Keyword ids and the label of the row each one belongs to
+        lengths = np.diff(self.kw_offsets)
+        row_mask = np.zeros(len(self), dtype=bool)
+        row_mask[rows] = True
+        kw_mask = np.repeat(row_mask, lengths)
+        kw_ids = np.asarray(self.kw_ids)[kw_mask]
+        kw_labels = np.repeat(np.asarray(self.label, dtype=np.intp), lengths)[kw_mask]
+
+        _, first = np.unique(codes, return_index=True)
+        order = codes[np.sort(first)]
+
+        stats = {}
+        for code in order:
+            ids = kw_ids[kw_labels == code]
+            uniq, first_seen, n = np.unique(ids, return_index=True, return_counts=True)
+            seen = np.argsort(first_seen, kind="stable")
+            stats[self.labels[code]] = {
+                "count": int(counts[code]),
+                "score_sum": float(sums[code]),
+                "mean": float(means[code]),
+                "m2": float(m2[code]),
+                "polarity_sum": float(polarity[code]),
+                "subjectivity_sum": float(subjectivity[code]),
+                "keywords": Counter({self.keywords[uniq[i]]: int(n[i]) for i in seen}),
+            }
+        return stats
+
+    def in_window(self, since: datetime | None, until: datetime | None) -> np.ndarray:
+        """Boolean row mask for reviews timestamped in [since, until)."""
+        ts = np.asarray(self.timestamp).view(np.int64)
+        mask = ts != _NAT
+        if since is not None:
+            mask &= ts >= _timestamp_ms(since.isoformat())
+        if until is not None:
+            mask &= ts < _timestamp_ms(until.isoformat())
+        return mask
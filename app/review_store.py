@@ -0,0 +1,681 @@
+from pathlib import Path
+from collections import Counter
+from concurrent.futures import Future
+from datetime import datetime
+import json
+import logging
+import os
+import queue
+import shutil
+import threading
+import time
+
+from app.file_lock import FileLock
+from app.review_columns import SegmentColumns, columns_dir, compacted_segments, review_fields
+
+logger = logging.getLogger(__name__)
+
+# The review log is a series of JSONL segments: reviews.jsonl is the active
+# segment; once it grows past REVIEW_SEGMENT_MB it is sealed (renamed to
+# reviews-<seq>.jsonl) and a new active segment is started.
+REVIEWS_DIR = Path("Reviews")
+ACTIVE_SEGMENT = "reviews.jsonl"
+
+# Aggregates checkpoint: per-label stats plus the segment and byte offset
+# they cover. Only the log after that point is re-read on startup.
+CHECKPOINT_NAME = "reviews.index.json"
+CHECKPOINT_VERSION = 2
+
+# Held while writing, reading the tail of, or rotating segments, so several
+# API processes can share one review log.
+LOCK_NAME = "reviews.lock"
+
+# Appends between checkpoint writes (a checkpoint is also written on shutdown).
+REVIEW_CHECKPOINT_EVERY = max(1, int(os.getenv("REVIEW_CHECKPOINT_EVERY", "100")))
+
+# Group commit: everything queued while the writer is busy goes out in one
+# write. A non-zero interval additionally holds the first review of a batch
+# this long to gather more (up to REVIEW_FLUSH_BATCH reviews).
+REVIEW_FLUSH_INTERVAL_MS = max(0.0, float(os.getenv("REVIEW_FLUSH_INTERVAL_MS", "0")))
+REVIEW_FLUSH_BATCH = max(1, int(os.getenv("REVIEW_FLUSH_BATCH", "256")))
+
+# "batch": fsync after every group commit; "off": leave it to the OS.
+FSYNC_POLICIES = ("batch", "off")
+REVIEW_FSYNC = os.getenv("REVIEW_FSYNC", "batch").lower()
+
+# Active segment size that triggers rotation.
+REVIEW_SEGMENT_MB = float(os.getenv("REVIEW_SEGMENT_MB", "16"))
+
+# Convert sealed segments to the columnar format (review_columns) as soon
+# as they are sealed. Compaction can also be run by hand:
+#   python -m app.review_store --compact
+REVIEW_COMPACT = os.getenv("REVIEW_COMPACT", "1").lower() not in ("0", "false", "no")
+
+
+def sealed_segment_path(directory: Path, seq: int) -> Path:
+    return directory / f"reviews-{seq:06d}.jsonl"
+
+
+def sealed_segments(directory: Path = REVIEWS_DIR) -> list[tuple[int, Path]]:
+    """Sealed (read-only) segments as (seq, path), oldest first."""
+    segments = []
+    for path in directory.glob("reviews-*.jsonl"):
+        try:
+            segments.append((int(path.stem.split("-", 1)[1]), path))
+        except ValueError:
+            continue
+    return sorted(segments)
+
+
+class LabelStats:
+    """
+    Running aggregates for one review label.
+
+    Score variance uses Welford's online algorithm, so mean and variance
+    stay numerically stable without keeping the individual scores.
+    """
+
+    __slots__ = ("count", "score_sum", "mean", "m2", "polarity_sum", "subjectivity_sum", "keywords")
+
+    def __init__(self):
+        self.count = 0
+        self.score_sum = 0.0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.polarity_sum = 0.0
+        self.subjectivity_sum = 0.0
+        self.keywords = Counter()
+
+    def add(self, score: float, sentiment: dict):
+        self.count += 1
+        self.score_sum += score
+        delta = score - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (score - self.mean)
+
+        self.polarity_sum += sentiment.get("polarity", 0.0)
+        self.subjectivity_sum += sentiment.get("subjectivity", 0.0)
+        self.keywords.update(sentiment.get("keywords", ()))
+
+    def merge(self, other: "LabelStats"):
+        """Folds in aggregates of other reviews (Chan et al. parallel variance)."""
+        if other.count == 0:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.score_sum += other.score_sum
+        self.polarity_sum += other.polarity_sum
+        self.subjectivity_sum += other.subjectivity_sum
+        self.keywords.update(other.keywords)
+
+    @property
+    def variance(self) -> float:
+        """Sample variance (same as statistics.variance); 0 below two reviews."""
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def avg_polarity(self) -> float:
+        return self.polarity_sum / self.count if self.count else 0.0
+
+    @property
+    def avg_subjectivity(self) -> float:
+        return self.subjectivity_sum / self.count if self.count else 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "score_sum": self.score_sum,
+            "mean": self.mean,
+            "m2": self.m2,
+            "polarity_sum": self.polarity_sum,
+            "subjectivity_sum": self.subjectivity_sum,
+            "keywords": dict(self.keywords),
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "LabelStats":
+        stats = cls()
+        stats.count = data["count"]
+        stats.score_sum = data["score_sum"]
+        stats.mean = data["mean"]
+        stats.m2 = data["m2"]
+        stats.polarity_sum = data["polarity_sum"]
+        stats.subjectivity_sum = data["subjectivity_sum"]
+        stats.keywords = Counter(data["keywords"])
+        return stats
+
+
+class ReviewStore:
+    """
+    Segmented, append-only review log with per-label aggregates kept up to
+    date on every commit.
+
+    append() only queues a record; a background writer commits queued
+    records in one write (group commit) under a cross-process file lock,
+    fsyncs according to the fsync policy and rotates the active segment by
+    size. Before each commit, and before aggregates are read, records
+    written by other processes are folded in from the log, so every process
+    sees the same aggregates.
+
+    Analytics read aggregates() instead of re-parsing the log, so their cost
+    depends on the number of labels, not the number of reviews. version
+    changes whenever new reviews are indexed and can be used to key derived
+    results.
+    """
+
+    def __init__(
+        self,
+        directory: Path = REVIEWS_DIR,
+        flush_interval_ms: float = REVIEW_FLUSH_INTERVAL_MS,
+        flush_batch: int = REVIEW_FLUSH_BATCH,
+        fsync: str = REVIEW_FSYNC,
+        segment_mb: float = REVIEW_SEGMENT_MB,
+    ):
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError(f"Unknown fsync policy {fsync!r}. Use one of: {', '.join(FSYNC_POLICIES)}.")
+
+        self.directory = Path(directory)
+        self.active_file = self.directory / ACTIVE_SEGMENT
+        self.checkpoint_file = self.directory / CHECKPOINT_NAME
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.flush_batch = flush_batch
+        self.fsync = fsync
+        self.segment_bytes = int(segment_mb * 1024 * 1024)
+
+        self._labels = {}
+        self._segment = 0
+        self._offset = 0
+        self._torn_tail = False
+        self._since_checkpoint = 0
+        self._loaded = False
+        self.version = 0
+
+        self._lock = threading.Lock()
+        self._file_lock = FileLock(self.directory / LOCK_NAME)
+        self._queue = queue.Queue()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        self._compact_lock = threading.Lock()
+
+        # Parsed active segment for window_aggregates, keyed by (segment, offset)
+        self._tail_columns = (None, None)
+
+    # -------------------------------------------------------------------------
+    # Loading
+    # -------------------------------------------------------------------------
+    def load(self):
+        """Rebuilds aggregates from the checkpoint plus the unindexed log."""
+        with self._lock, self._file_lock:
+            self._reset()
+            self._load_checkpoint()
+            count = self._catch_up()
+            self._loaded = True
+            self.version += 1
+            self._since_checkpoint = count
+
+        if count:
+            logger.info("Indexed %d reviews not covered by the checkpoint", count)
+
+    def _ensure_loaded(self):
+        if not self._loaded:
+            self.load()
+
+    def _reset(self):
+        seqs = [seq for seq, _ in sealed_segments(self.directory) + compacted_segments(self.directory)]
+        self._labels = {}
+        self._segment = min(seqs) if seqs else 0
+        self._offset = 0
+        self._torn_tail = False
+
+    def _segment_path(self, seq: int) -> Path:
+        sealed = sealed_segment_path(self.directory, seq)
+        return sealed if sealed.exists() else self.active_file
+
+    def _load_checkpoint(self):
+        try:
+            data = json.loads(self.checkpoint_file.read_text(encoding="utf-8"))
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable review checkpoint: %s", e)
+            return
+
+        segment = data.get("segment", 0)
+        offset = data.get("offset", 0)
+        if data.get("version") != CHECKPOINT_VERSION or not self._offset_valid(segment, offset):
+            # Log was truncated, replaced or rewritten: start over.
+            logger.info("Review checkpoint is stale; rebuilding from the log")
+            return
+
+        try:
+            self._labels = {
+                label: LabelStats.from_dict(stats)
+                for label, stats in data["labels"].items()
+            }
+        except (KeyError, TypeError) as e:
+            logger.warning("Ignoring malformed review checkpoint: %s", e)
+            self._labels = {}
+            return
+        self._segment = segment
+        self._offset = offset
+
+    def _offset_valid(self, segment: int, offset: int) -> bool:
+        """offset must end on a line boundary inside the segment."""
+        if offset == 0:
+            return True
+        compacted = columns_dir(self.directory, segment)
+        if not sealed_segment_path(self.directory, segment).exists() and compacted.exists():
+            try:
+                ends = SegmentColumns.load(compacted).end
+            except (OSError, ValueError):
+                return False
+            i = int(ends.searchsorted(offset))
+            return i < len(ends) and ends[i] == offset
+        try:
+            path = self._segment_path(segment)
+            if path.stat().st_size < offset:
+                return False
+            with open(path, "rb") as f:
+                f.seek(offset - 1)
+                return f.read(1) == b"\n"
+        except OSError:
+            return False
+
+    def _catch_up(self) -> int:
+        """
+        Indexes everything written after (segment, offset), following
+        rotations. Caller holds both locks.
+        """
+        count = 0
+        while True:
+            sealed = sealed_segment_path(self.directory, self._segment)
+            if sealed.exists():
+                count += self._read_from(sealed)
+                self._next_segment()
+                continue
+
+            compacted = columns_dir(self.directory, self._segment)
+            if compacted.exists():
+                count += self._fold_columns(compacted)
+                self._next_segment()
+                continue
+
+            size = self.active_file.stat().st_size if self.active_file.exists() else 0
+            if size < self._offset:
+                logger.warning("Review log shrank unexpectedly; rebuilding aggregates")
+                self._reset()
+                continue
+
+            if size > self._offset:
+                count += self._read_from(self.active_file)
+            break
+
+        if count:
+            self.version += 1
+        return count
+
+    def _next_segment(self):
+        self._segment += 1
+        self._offset = 0
+        self._torn_tail = False
+
+    def _fold_columns(self, path: Path) -> int:
+        """Merges rows of a compacted segment past the current offset."""
+        columns = SegmentColumns.load(path)
+        rows = slice(columns.first_row_after(self._offset), None)
+        count = 0
+        for label, data in columns.label_stats(rows).items():
+            stats = self._labels.get(label)
+            if stats is None:
+                stats = self._labels[label] = LabelStats()
+            stats.merge(LabelStats.from_dict(data))
+            count += data["count"]
+        return count
+
+    def _read_from(self, path: Path) -> int:
+        count = 0
+        with open(path, "rb") as f:
+            f.seek(self._offset)
+            for line in f:
+                # Torn final line from a crash mid-write: the next commit
+                # starts a fresh line after it and it is skipped as malformed
+                if not line.endswith(b"\n"):
+                    self._torn_tail = True
+                    break
+                self._offset += len(line)
+                if line.strip():
+                    try:
+                        indexed = self._index(json.loads(line))
+                    except ValueError:
+                        indexed = False
+                    if not indexed:
+                        logger.warning("Skipping malformed review line in %s", path.name)
+                        continue
+                    count += 1
+        return count
+
+    def _sync(self):
+        """Folds in reviews committed by other processes, if there are any."""
+        self._ensure_loaded()
+        try:
+            size = self.active_file.stat().st_size
+        except FileNotFoundError:
+            size = 0
+        if size == self._offset and not sealed_segment_path(self.directory, self._segment).exists():
+            return
+        with self._lock, self._file_lock:
+            self._catch_up()
+
+    # -------------------------------------------------------------------------
+    # Writing
+    # -------------------------------------------------------------------------
+    def _index(self, record: dict) -> bool:
+        """Adds record to the aggregates; False if it is not a valid review."""
+        fields = review_fields(record)
+        if fields is None:
+            return False
+        label, score, sentiment = fields
+        stats = self._labels.get(label)
+        if stats is None:
+            stats = self._labels[label] = LabelStats()
+        stats.add(score, sentiment)
+        return True
+
+    def append(self, record: dict) -> Future:
+        """
+        Queues one review for the next group commit. The returned future
+        resolves once the review is written (and fsynced, if enabled) and
+        included in the aggregates, or fails with ValueError (and nothing
+        is written) when the record is not a valid review.
+        """
+        line = (json.dumps(record) + "\n").encode("utf-8")
+        self._ensure_loaded()
+        self._ensure_writer()
+
+        future = Future()
+        self._queue.put((line, record, future))
+        return future
+
+    def _ensure_writer(self):
+        if self._thread is not None:
+            return
+        with self._thread_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run,
+                    name="review-writer",
+                    daemon=True,
+                )
+                self._thread.start()
+
+    def _collect(self) -> tuple[list, bool]:
+        """Next batch of queued reviews, and whether close() was requested."""
+        item = self._queue.get()
+        if item is None:
+            return [], True
+
+        batch = [item]
+        deadline = time.monotonic() + self.flush_interval
+
+        while len(batch) < self.flush_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+
+        return batch, False
+
+    def _run(self):
+        while True:
+            batch, stop = self._collect()
+            if batch:
+                self._commit(batch)
+            if stop:
+                return
+
+    def _commit(self, batch: list):
+        # Invalid records fail on their own instead of failing the batch
+        # after it is already on disk
+        valid = []
+        for item in batch:
+            if review_fields(item[1]) is None:
+                item[2].set_exception(ValueError("Not a valid review record"))
+            else:
+                valid.append(item)
+        batch = valid
+        if not batch:
+            return
+        data = b"".join(line for line, _, _ in batch)
+
+        try:
+            with self._lock, self._file_lock:
+                self._catch_up()
+
+                self.directory.mkdir(exist_ok=True)
+                with open(self.active_file, "ab") as f:
+                    if self._torn_tail:
+                        f.write(b"\n")
+                        self._torn_tail = False
+                    f.write(data)
+                    f.flush()
+                    if self.fsync == "batch":
+                        os.fsync(f.fileno())
+                    self._offset = f.tell()
+
+                for _, record, _ in batch:
+                    self._index(record)
+                self.version += 1
+                self._since_checkpoint += len(batch)
+
+                rotated = self._offset >= self.segment_bytes
+                if rotated:
+                    self._rotate()
+                due = self._since_checkpoint >= REVIEW_CHECKPOINT_EVERY
+        except Exception as e:
+            logger.exception("Failed to commit %d reviews", len(batch))
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+
+        for _, _, future in batch:
+            future.set_result(None)
+
+        if due:
+            self.checkpoint()
+        if rotated and REVIEW_COMPACT:
+            threading.Thread(target=self.compact, name="review-compact", daemon=True).start()
+
+    def _rotate(self):
+        """Seals the active segment. Caller holds both locks."""
+        sealed = sealed_segment_path(self.directory, self._segment)
+        os.replace(self.active_file, sealed)
+        self._segment += 1
+        self._offset = 0
+        logger.info("Sealed review segment %s", sealed.name)
+
+    def compact(self) -> int:
+        """
+        Converts sealed JSONL segments to columns and removes the JSONL.
+        Sealed segments never change, so they are converted without holding
+        the lock; only the swap happens under it. The JSONL is only removed
+        once the columns on disk hold every one of its rows. Returns the
+        number of segments compacted.
+        """
+        compacted = 0
+        with self._compact_lock:
+            for seq, path in sealed_segments(self.directory):
+                dest = columns_dir(self.directory, seq)
+                columns, _ = SegmentColumns.from_jsonl(path)
+                source_bytes = path.stat().st_size
+                if not SegmentColumns.matches(dest, len(columns), source_bytes):
+                    # Missing, or left incomplete by an interrupted run
+                    shutil.rmtree(dest, ignore_errors=True)
+                    columns.save(dest, source_bytes)
+                    if not SegmentColumns.matches(dest, len(columns), source_bytes):
+                        logger.warning("Compacted %s does not match its rows; keeping the JSONL", path.name)
+                        continue
+
+                with self._file_lock:
+                    if path.exists():
+                        path.unlink()
+                        compacted += 1
+                        logger.info("Compacted review segment %s", path.name)
+        return compacted
+
+    def close(self):
+        """Commits everything still queued, stops the writer and checkpoints."""
+        with self._thread_lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+        self.checkpoint()
+
+    def checkpoint(self):
+        """Writes the aggregates and the log position they cover (atomically)."""
+        with self._lock:
+            if not self._loaded:
+                return
+            data = {
+                "version": CHECKPOINT_VERSION,
+                "segment": self._segment,
+                "offset": self._offset,
+                "labels": {label: s.to_dict() for label, s in self._labels.items()},
+            }
+
+            # Per-process temp name: other API processes checkpoint too
+            tmp = self.checkpoint_file.with_name(f"{CHECKPOINT_NAME}.{os.getpid()}.tmp")
+            try:
+                self.directory.mkdir(exist_ok=True)
+                tmp.write_text(json.dumps(data), encoding="utf-8")
+                os.replace(tmp, self.checkpoint_file)
+            except OSError as e:
+                logger.warning("Could not write review checkpoint: %s", e)
+                return
+            self._since_checkpoint = 0
+
+    # -------------------------------------------------------------------------
+    # Reading
+    # -------------------------------------------------------------------------
+    def aggregates(self, top_keywords: int = 6) -> dict[str, dict]:
+        """
+        Per-label summary in first-seen label order: review count, mean
+        score, sample variance, average polarity/subjectivity and the most
+        common keywords.
+        """
+        self._sync()
+        with self._lock:
+            return _summarize(self._labels, top_keywords)
+
+    def window_aggregates(
+        self,
+        since: datetime | None = None,
+        until: datetime | None = None,
+        top_keywords: int = 6,
+    ) -> dict[str, dict]:
+        """
+        Same summary as aggregates(), restricted to reviews timestamped in
+        [since, until) (naive datetimes are UTC). Compacted segments are
+        scanned as memory-mapped columns; the few segments still in JSONL
+        form are parsed into columns on the fly.
+        """
+        self._sync()
+        with self._lock, self._file_lock:
+            segment, offset = self._segment, self._offset
+            compacted = compacted_segments(self.directory)
+            sealed = sealed_segments(self.directory)
+
+            key, tail = self._tail_columns
+            if key != (segment, offset):
+                tail = None
+                if offset:
+                    # Only copy the bytes under the lock; parse outside it
+                    with open(self.active_file, "rb") as f:
+                        tail = f.read(offset)
+
+        if isinstance(tail, bytes):
+            tail, _ = SegmentColumns.from_jsonl(tail)
+            self._tail_columns = ((segment, offset), tail)
+
+        sources = {seq: path for seq, path in compacted}
+        sources.update({seq: path for seq, path in sealed if seq not in sources})
+
+        labels = {}
+        for seq in sorted(sources):
+            if seq >= segment:
+                continue
+            path = sources[seq]
+            try:
+                columns = SegmentColumns.load(path) if path.is_dir() else SegmentColumns.from_jsonl(path)[0]
+            except FileNotFoundError:
+                # Compacted since the listing above
+                columns = SegmentColumns.load(columns_dir(self.directory, seq))
+            _merge_window(labels, columns, since, until)
+        if tail is not None:
+            _merge_window(labels, tail, since, until)
+
+        return _summarize(labels, top_keywords)
+
+    def position(self) -> tuple[int, int]:
+        """
+        (segment, byte offset) of the log the aggregates cover. Unlike
+        version it is the same in every process reading the same log, so it
+        can key artifacts shared with clients (e.g. ETags).
+        """
+        self._sync()
+        with self._lock:
+            return self._segment, self._offset
+
+    def __len__(self) -> int:
+        self._sync()
+        with self._lock:
+            return sum(s.count for s in self._labels.values())
+
+
+def _merge_window(labels: dict, columns: SegmentColumns, since, until):
+    for label, data in columns.label_stats(columns.in_window(since, until)).items():
+        stats = labels.get(label)
+        if stats is None:
+            stats = labels[label] = LabelStats()
+        stats.merge(LabelStats.from_dict(data))
+
+
+def _summarize(labels: dict[str, LabelStats], top_keywords: int) -> dict[str, dict]:
+    return {
+        label: {
+            "reviews": s.count,
+            "avg_score": s.mean,
+            "variance": s.variance,
+            "avg_polarity": s.avg_polarity,
+            "avg_subjectivity": s.avg_subjectivity,
+            "top_keywords": s.keywords.most_common(top_keywords),
+        }
+        for label, s in labels.items()
+    }
+
+
+_store = ReviewStore()
+
+
+def get_review_store() -> ReviewStore:
+    return _store
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Review log maintenance")
+    parser.add_argument("--compact", action="store_true", help="convert sealed segments to columns")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.compact:
+        print(f"Compacted {get_review_store().compact()} segment(s)")
+
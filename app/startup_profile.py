@@ -0,0 +1,72 @@
+"""
+Start-up import profile of the API process.
+
+Runs `python -X importtime -c "import app.main"` in a fresh interpreter and
+summarises it: total import time, time per top-level package, the slowest
+individual modules, and which heavy optional dependencies were loaded
+(they should only load when an endpoint first needs them).
+
+Usage (from the repo root):
+    python -m app.startup_profile
+    python -m app.startup_profile --module app.pipeline --top 20
+"""
+
+from collections import defaultdict
+import argparse
+import subprocess
+import sys
+
+# Dependencies that API start-up should not import
+HEAVY_MODULES = ["cv2", "matplotlib", "nltk", "textblob"]
+
+
+def profile_imports(module: str = "app.main") -> list[tuple[str, int, int]]:
+    """(module, self us, cumulative us) for every import, in import order."""
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise SystemExit(proc.stderr)
+
+    imports = []
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        imports.append((name.strip(), int(self_us), int(cumulative_us)))
+    return imports
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="app.main", help="module to import")
+    parser.add_argument("--top", type=int, default=15, help="rows per table")
+    args = parser.parse_args()
+
+    imports = profile_imports(args.module)
+    names = {name for name, _, _ in imports}
+    total = next((cum for name, _, cum in imports if name == args.module), 0)
+
+    by_package = defaultdict(int)
+    for name, self_us, _ in imports:
+        by_package[name.split(".")[0]] += self_us
+
+    print(f"import {args.module}: {total / 1000:.0f} ms, {len(imports)} modules\n")
+
+    print(f"  {'package':<28}{'ms':>8}")
+    for package, us in sorted(by_package.items(), key=lambda kv: -kv[1])[: args.top]:
+        print(f"  {package:<28}{us / 1000:>8.1f}")
+
+    print(f"\n  {'slowest modules (self)':<40}{'ms':>8}")
+    for name, self_us, _ in sorted(imports, key=lambda i: -i[1])[: args.top]:
+        print(f"  {name:<40}{self_us / 1000:>8.1f}")
+
+    print("\nHeavy dependencies imported at start-up:")
+    for module in HEAVY_MODULES:
+        print(f"  {module:<12}{'yes' if module in names else 'no (deferred)'}")
+
+
+if __name__ == "__main__":
+    main()
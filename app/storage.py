@@ -1,17 +1,351 @@
+from contextlib import contextmanager
 from pathlib import Path
+import hashlib
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 
-UPLOAD_DIR = BASE_DIR / "uploads"
-OUTPUT_DIR = BASE_DIR / "outputs"
+# Directory holding uploads/ and outputs/ (the repo root by default).
+STORAGE_DIR = Path(os.getenv("STORAGE_DIR", str(BASE_DIR)))
+
+UPLOAD_DIR = STORAGE_DIR / "uploads"
+OUTPUT_DIR = STORAGE_DIR / "outputs"
+
+UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
+
+# Total size (MB) of uploads + outputs before least-recently-used jobs are
+# evicted (0 = no quota).
+STORAGE_MAX_MB = float(os.getenv("STORAGE_MAX_MB", "2048"))
+
+# Seconds a job's files are kept after they were last written or served
+# (0 = no expiry).
+STORAGE_TTL_S = float(os.getenv("STORAGE_TTL_S", "0"))
+
+# Seconds between background sweeps (rescan + TTL / quota eviction).
+STORAGE_SWEEP_S = max(1.0, float(os.getenv("STORAGE_SWEEP_S", "60")))
+
+# Accesses within this many seconds of the recorded one are not written
+# back to the file's mtime.
+TOUCH_RESOLUTION_S = 60
+
+
+def job_key(name: str) -> str:
+    """
+    Job a stored file belongs to: the upload stem. Outputs are named
+    <upload stem>_<variant>, so an upload and its outputs share the key.
+    """
+    return Path(name).name.split(".", 1)[0].split("_", 1)[0]
+
+
+def shard(key: str) -> str:
+    """Two-hex-digit shard for a job: spreads files over 256 directories."""
+    return hashlib.blake2b(key.encode(), digest_size=1).hexdigest()
+
+
+def storage_url(path: Path) -> str:
+    """Public URL of a stored file, e.g. /outputs/3f/<name>."""
+    path = Path(path)
+    for prefix, root in (("/uploads", UPLOAD_DIR), ("/outputs", OUTPUT_DIR)):
+        try:
+            return f"{prefix}/{path.relative_to(root).as_posix()}"
+        except ValueError:
+            continue
+    raise ValueError(f"{path} is not in uploads/ or outputs/")
+
+
+class StorageManager:
+    """
+    Tracks uploads and outputs per job and keeps their total size under a
+    byte quota.
+
+    Files live in hash-prefix shards (uploads/<shard>/<name>, same for
+    outputs) so no directory grows past a few hundred entries. Each job's
+    last access is kept in memory and written back to its files' mtime, so
+    other API processes and restarts see it too. A background thread
+    rescans the shards every STORAGE_SWEEP_S, deletes jobs idle for longer
+    than the TTL, then evicts least-recently-used jobs until the total fits
+    the quota. A job (its upload and every output) is always evicted as a
+    whole; jobs held by an in-flight request are skipped.
+    """
+
+    def __init__(
+        self,
+        roots: tuple[Path, ...] = (UPLOAD_DIR, OUTPUT_DIR),
+        max_bytes: int = int(STORAGE_MAX_MB * 1024 * 1024),
+        ttl_s: float = STORAGE_TTL_S,
+        sweep_s: float = STORAGE_SWEEP_S,
+    ):
+        self.roots = tuple(Path(r) for r in roots)
+        self.max_bytes = max_bytes
+        self.ttl_s = ttl_s
+        self.sweep_s = sweep_s
+
+        # job key -> {"files": {path: size}, "bytes": int, "last_access": ts,
+        #             "synced": ts last written back to the files' mtime}
+        self._jobs = {}
+        self._bytes = 0
+        self._held = {}
+        self._lock = threading.Lock()
+
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+
+        self.evicted_jobs = 0
+        self.evicted_bytes = 0
+        self.last_sweep = None
+
+    # -------------------------------------------------------------------------
+    # Paths
+    # -------------------------------------------------------------------------
+    def shard_dir(self, root: Path, key: str) -> Path:
+        directory = root / shard(key)
+        directory.mkdir(exist_ok=True)
+        return directory
+
+    def upload_path(self, name: str) -> Path:
+        return self.shard_dir(self.roots[0], job_key(name)) / name
+
+    def output_dir(self, key: str) -> Path:
+        return self.shard_dir(self.roots[1], key)
+
+    # -------------------------------------------------------------------------
+    # Tracking
+    # -------------------------------------------------------------------------
+    def add(self, *paths: Path):
+        """Records newly written files under their job."""
+        now = time.time()
+        with self._lock:
+            for path in paths:
+                try:
+                    size = path.stat().st_size
+                except OSError:
+                    continue
+                job = self._job(job_key(path.name), now)
+                self._bytes += size - job["files"].get(path, 0)
+                job["bytes"] += size - job["files"].get(path, 0)
+                job["files"][path] = size
+                job["last_access"] = job["synced"] = now
+            over = self.max_bytes and self._bytes > self.max_bytes
+
+        if over:
+            self._wake.set()
+
+    def remove(self, *paths: Path):
+        """Deletes files of a failed request and stops tracking them."""
+        with self._lock:
+            for path in paths:
+                key = job_key(path.name)
+                job = self._jobs.get(key)
+                size = job["files"].pop(path, None) if job is not None else None
+                if size is None:
+                    continue
+                job["bytes"] -= size
+                self._bytes -= size
+                if not job["files"]:
+                    del self._jobs[key]
+        for path in paths:
+            path.unlink(missing_ok=True)
+
+    def touch(self, name: str):
+        """Marks the job a file belongs to as used (e.g. it was served)."""
+        key = job_key(name)
+        now = time.time()
+        with self._lock:
+            job = self._jobs.get(key)
+            if job is None:
+                return
+            job["last_access"] = now
+            if now - job["synced"] < TOUCH_RESOLUTION_S:
+                return
+            job["synced"] = now
+            files = list(job["files"])
+
+        for path in files:
+            try:
+                os.utime(path, (now, now))
+            except OSError:
+                pass
+
+    @contextmanager
+    def hold(self, key: str):
+        """Keeps a job from being evicted while a request works on it."""
+        with self._lock:
+            self._held[key] = self._held.get(key, 0) + 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                if self._held[key] == 1:
+                    del self._held[key]
+                else:
+                    self._held[key] -= 1
+
+    def _job(self, key: str, now: float) -> dict:
+        job = self._jobs.get(key)
+        if job is None:
+            job = self._jobs[key] = {"files": {}, "bytes": 0, "last_access": now, "synced": now}
+        return job
+
+    # -------------------------------------------------------------------------
+    # Eviction
+    # -------------------------------------------------------------------------
+    def _scan(self) -> dict:
+        """Jobs on disk (all processes' files), from the shards and roots."""
+        jobs = {}
+        for root in self.roots:
+            # Sharded files plus any flat files from before sharding
+            for directory in [root, *(d for d in root.iterdir() if d.is_dir())]:
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        if not entry.is_file() or entry.name.startswith("."):
+                            continue
+                        try:
+                            st = entry.stat()
+                        except OSError:
+                            continue
+                        job = jobs.setdefault(
+                            job_key(entry.name),
+                            {"files": {}, "bytes": 0, "last_access": 0.0},
+                        )
+                        job["files"][Path(entry.path)] = st.st_size
+                        job["bytes"] += st.st_size
+                        job["last_access"] = max(job["last_access"], st.st_mtime)
+
+        for job in jobs.values():
+            job["synced"] = job["last_access"]
+        return jobs
+
+    def sweep(self) -> dict:
+        """
+        Rescans storage and evicts expired, then least-recently-used, jobs.
+        Returns {"jobs": n, "bytes": n} evicted.
+        """
+        started = time.time()
+        scanned = self._scan()
+        now = time.time()
+
+        with self._lock:
+            for key, known in self._jobs.items():
+                job = scanned.get(key)
+                if job is not None:
+                    job["last_access"] = max(job["last_access"], known["last_access"])
+                    job["synced"] = max(job["synced"], known["synced"])
+                elif known["last_access"] >= started:
+                    # Added while the scan was running
+                    scanned[key] = known
+            self._jobs = scanned
+            self._bytes = sum(job["bytes"] for job in scanned.values())
+
+            victims = []
+            total = self._bytes
+            oldest_first = sorted(scanned.items(), key=lambda kv: kv[1]["last_access"])
+            newest = oldest_first[-1][0] if oldest_first else None
+            for key, job in oldest_first:
+                if key in self._held:
+                    continue
+                expired = self.ttl_s and now - job["last_access"] > self.ttl_s
+                # The most recent job is kept even if it alone exceeds the quota
+                over = self.max_bytes and total > self.max_bytes and key != newest
+                if not (expired or over):
+                    # Oldest first: nothing later is expired either
+                    break
+                victims.append(key)
+                total -= job["bytes"]
+
+            evicted = [(key, self._jobs.pop(key)) for key in victims]
+            self._bytes = total
+
+        freed = 0
+        for key, job in evicted:
+            for path in job["files"]:
+                path.unlink(missing_ok=True)
+            freed += job["bytes"]
+
+        self.evicted_jobs += len(evicted)
+        self.evicted_bytes += freed
+        self.last_sweep = now
+        if evicted:
+            logger.info("Evicted %d stored jobs (%.1f MB)", len(evicted), freed / 1e6)
+        return {"jobs": len(evicted), "bytes": freed}
+
+    def start(self):
+        """Starts the background sweeper (the first sweep runs right away)."""
+        if self._thread is not None:
+            return
+        with self._thread_lock:
+            if self._thread is None:
+                self._stop.clear()
+                self._thread = threading.Thread(
+                    target=self._run,
+                    name="storage-sweeper",
+                    daemon=True,
+                )
+                self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.sweep()
+            except Exception:
+                logger.exception("Storage sweep failed")
+            # Woken early when add() pushes usage over the quota
+            self._wake.wait(self.sweep_s)
+            self._wake.clear()
+
+    def close(self):
+        with self._thread_lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stop.set()
+            self._wake.set()
+            thread.join()
+
+    # -------------------------------------------------------------------------
+    # Maintenance
+    # -------------------------------------------------------------------------
+    def clear(self):
+        """
+        Deletes every stored upload and output, except those of jobs held
+        by an in-flight request.
+        """
+        with self._lock:
+            held = set(self._held)
+            self._jobs = {key: job for key, job in self._jobs.items() if key in held}
+            self._bytes = sum(job["bytes"] for job in self._jobs.values())
+        for root in self.roots:
+            for file in root.rglob("*"):
+                if file.is_file() and not file.name.startswith(".") and job_key(file.name) not in held:
+                    file.unlink(missing_ok=True)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "jobs": len(self._jobs),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_s": self.ttl_s,
+                "held_jobs": len(self._held),
+                "evicted_jobs": self.evicted_jobs,
+                "evicted_bytes": self.evicted_bytes,
+                "last_sweep": self.last_sweep,
+            }
+
+
+_storage = StorageManager()
+
 
-UPLOAD_DIR.mkdir(exist_ok=True)
-OUTPUT_DIR.mkdir(exist_ok=True)
+def get_storage() -> StorageManager:
+    return _storage
 
 
 def clear_storage():
     """Delete all uploaded + output images."""
-    for folder in [UPLOAD_DIR, OUTPUT_DIR]:
-        for file in folder.glob("*"):
-            if file.is_file():
-                file.unlink()
\ No newline at end of file
+    _storage.clear()
@@ -1,8 +1,15 @@
 from pathlib import Path
 import cv2
 
+from app.output_writer import OutputWriter
+from app.postprocess import warm
 
-def generate_dummy_variants(input_path: Path, output_dir: Path) -> list[Path]:
+
+def generate_dummy_variants(
+    input_path: Path,
+    output_dir: Path,
+    writer: OutputWriter | None = None,
+) -> list[Path]:
     """
     Creates 3 dummy variants:
     1) contrast enhanced
@@ -13,27 +20,24 @@ def generate_dummy_variants(input_path: Path, output_dir: Path) -> list[Path]:
     if img is None:
         raise ValueError("Failed to read image (invalid image file).")
 
+    writer = writer or OutputWriter()
     variants = []
 
     # Variant 1: Contrast boost
     contrast = cv2.convertScaleAbs(img, alpha=1.3, beta=10)
-    out1 = output_dir / f"{input_path.stem}_variant1_contrast.jpg"
-    cv2.imwrite(str(out1), contrast)
-    variants.append(out1)
+    out1 = writer.path(output_dir, f"{input_path.stem}_variant1_contrast")
+    variants.append((out1, contrast))
 
     # Variant 2: Sharpen
     kernel = cv2.getGaussianKernel(9, 2)
     blur = cv2.filter2D(img, -1, kernel @ kernel.T)
     sharp = cv2.addWeighted(img, 1.5, blur, -0.5, 0)
-    out2 = output_dir / f"{input_path.stem}_variant2_sharp.jpg"
-    cv2.imwrite(str(out2), sharp)
-    variants.append(out2)
+    out2 = writer.path(output_dir, f"{input_path.stem}_variant2_sharp")
+    variants.append((out2, sharp))
 
     # Variant 3: Warm tone (increase red channel)
-    warm = img.copy()
-    warm[:, :, 2] = cv2.add(warm[:, :, 2], 25)  # add to red channel
-    out3 = output_dir / f"{input_path.stem}_variant3_warm.jpg"
-    cv2.imwrite(str(out3), warm)
-    variants.append(out3)
+    warmed = warm(img, 25)  # add to red channel
+    out3 = writer.path(output_dir, f"{input_path.stem}_variant3_warm")
+    variants.append((out3, warmed))
 
-    return variants
\ No newline at end of file
+    return writer.write_all(variants)
\ No newline at end of file
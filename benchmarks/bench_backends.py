@@ -0,0 +1,135 @@
+"""
+Colorization throughput per inference backend, precision and thread split.
+
+For every backend x precision, tries each split of the host's cores into
+worker processes x threads per worker (e.g. 8 cores: 1x8, 2x4, 4x2, 8x1).
+Each worker loads its own net and runs single-image forward passes for
+--seconds; the table shows total forward passes/s, mean latency and the
+largest ab difference from the first fp32 output on a probe input.
+Ends with the environment settings of the fastest configuration.
+
+Configurations whose weights are missing (e.g. no exported ONNX model, or
+fp16 not prepared) are listed as skipped.
+
+Usage (from the repo root, model files required):
+    python -m benchmarks.bench_backends
+    python -m benchmarks.bench_backends --backends opencv onnx --precisions fp32 int8 --seconds 10
+"""
+
+import argparse
+import multiprocessing
+import os
+import time
+
+import numpy as np
+
+from app.inference_backends import BACKENDS, PRECISIONS, configure_threads, create_backend
+from app.model_registry import NET_INPUT_SIZE
+
+
+def _splits(cores: int) -> list[tuple[int, int]]:
+    """(workers, threads) pairs that use every core once."""
+    return [(cores // threads, threads) for threads in range(cores, 0, -1) if cores % threads == 0]
+
+
+def _inputs() -> tuple[np.ndarray, np.ndarray]:
+    rng = np.random.default_rng(0)
+    blob = rng.uniform(-50, 50, (1, 1, NET_INPUT_SIZE, NET_INPUT_SIZE)).astype("float32")
+    probe = rng.uniform(-50, 50, (1, 1, NET_INPUT_SIZE, NET_INPUT_SIZE)).astype("float32")
+    return blob, probe
+
+
+def _worker(backend: str, precision: str, threads: int, seconds: float, barrier, results):
+    try:
+        configure_threads(threads=threads)
+        net = create_backend(backend, precision)
+        blob, probe = _inputs()
+        probe_ab = net.forward(probe)
+    except Exception as e:
+        barrier.abort()
+        message = str(e).strip().splitlines() or [""]
+        results.put(("error", f"{type(e).__name__}: {message[-1][:120]}"))
+        return
+
+    try:
+        barrier.wait()
+    except Exception:
+        # Another worker failed to load
+        results.put(("error", None))
+        return
+
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        net.forward(blob)
+        count += 1
+    results.put(("ok", (count, time.perf_counter() - start, probe_ab)))
+
+
+def _run(backend: str, precision: str, workers: int, threads: int, seconds: float) -> dict:
+    barrier = multiprocessing.Barrier(workers)
+    results = multiprocessing.Queue()
+    procs = [
+        multiprocessing.Process(target=_worker, args=(backend, precision, threads, seconds, barrier, results))
+        for _ in range(workers)
+    ]
+    for p in procs:
+        p.start()
+    outcomes = [results.get() for _ in procs]
+    for p in procs:
+        p.join()
+
+    errors = [detail for status, detail in outcomes if status == "error" and detail]
+    if errors:
+        return {"error": errors[0]}
+
+    runs = [detail for _, detail in outcomes]
+    return {
+        "per_s": sum(count / elapsed for count, elapsed, _ in runs),
+        "latency_ms": 1000 * sum(elapsed for _, elapsed, _ in runs) / sum(count for count, _, _ in runs),
+        "probe_ab": runs[0][2],
+    }
+
+
+def main():
+    cores = os.cpu_count() or 1
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--precisions", nargs="+", choices=PRECISIONS, default=list(PRECISIONS))
+    parser.add_argument("--cores", type=int, default=cores, help="cores to split between workers")
+    parser.add_argument("--seconds", type=float, default=5.0, help="timed forward passes per configuration")
+    args = parser.parse_args()
+
+    print(f"{args.cores} cores, {args.seconds:g}s per configuration\n")
+    print(f"  {'backend':<8}{'precision':<10}{'workers':>8}{'threads':>8}{'passes/s':>10}{'ms/pass':>9}{'max ab diff':>12}")
+
+    reference = None
+    best = None
+    for backend in args.backends:
+        for precision in args.precisions:
+            for workers, threads in _splits(args.cores):
+                result = _run(backend, precision, workers, threads, args.seconds)
+                label = f"  {backend:<8}{precision:<10}{workers:>8}{threads:>8}"
+                if "error" in result:
+                    print(f"{label}  skipped: {result['error']}")
+                    break
+
+                if reference is None and precision == "fp32":
+                    reference = result["probe_ab"]
+                diff = "" if reference is None else f"{np.abs(result['probe_ab'] - reference).max():.2f}"
+                print(f"{label}{result['per_s']:>10.2f}{result['latency_ms']:>9.1f}{diff:>12}")
+
+                if best is None or result["per_s"] > best[0]:
+                    best = (result["per_s"], backend, precision, workers, threads)
+
+    if best is None:
+        raise SystemExit("\nNo configuration could load the model; see README 'Model Setup'.")
+
+    _, backend, precision, workers, threads = best
+    print("\nFastest configuration:")
+    print(f"  COLORIZE_BACKEND={backend} COLORIZE_PRECISION={precision} "
+          f"JOB_WORKERS={workers} COLORIZE_THREADS={threads}")
+
+
+if __name__ == "__main__":
+    main()
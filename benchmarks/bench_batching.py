@@ -0,0 +1,60 @@
+"""
+Throughput of the colorization net vs. micro-batch size.
+
+Simulates N concurrent uploads, each submitting one 224x224 L input to an
+InferenceBatcher, and reports requests/sec for each batch size.
+
+Usage (from the repo root, model files required):
+    python -m benchmarks.bench_batching --clients 8 --requests 16 --sizes 1 2 4 8
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import time
+
+import numpy as np
+
+from app.inference_batcher import InferenceBatcher
+from app.model_registry import NET_INPUT_SIZE, warm_up
+
+
+def _run(batcher: InferenceBatcher, clients: int, requests: int) -> float:
+    rng = np.random.default_rng(0)
+    inputs = [
+        rng.uniform(-50, 50, (NET_INPUT_SIZE, NET_INPUT_SIZE)).astype("float32")
+        for _ in range(clients)
+    ]
+
+    def client(i: int):
+        for _ in range(requests):
+            batcher.predict(inputs[i])
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(client, range(clients)))
+    elapsed = time.perf_counter() - start
+
+    return clients * requests / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--clients", type=int, default=8, help="concurrent callers")
+    parser.add_argument("--requests", type=int, default=16, help="forward passes per caller")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 2, 4, 8], help="max batch sizes to try")
+    parser.add_argument("--wait-ms", type=float, default=10.0, help="max batch wait")
+    args = parser.parse_args()
+
+    if not warm_up():
+        raise SystemExit("Colorization model not available; see README 'Model Setup'.")
+
+    print(f"{'batch':>5}  {'req/s':>8}  {'speedup':>7}")
+    baseline = None
+    for size in args.sizes:
+        rps = _run(InferenceBatcher(size, args.wait_ms), args.clients, args.requests)
+        baseline = baseline or rps
+        print(f"{size:>5}  {rps:>8.2f}  {rps / baseline:>6.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+"""
+Quality and speed of the enhancement denoise strategies.
+
+Builds a synthetic photo-like image, adds Gaussian noise, and reports for
+each strategy in app.enhance.DENOISE_STRATEGIES the wall time and PSNR
+against the clean image. Also times enhance_images() with and without
+parallel variants.
+
+Usage (from the repo root):
+    python -m benchmarks.bench_denoise --sizes 0.3 2 12 --noise 12
+"""
+
+import argparse
+import time
+
+import cv2
+import numpy as np
+
+from app.enhance import DENOISE_STRATEGIES, denoise, enhance_images
+from benchmarks.synthetic import synthetic_image
+
+
+def _timed(fn, repeat: int) -> tuple[float, object]:
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, out
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=float, nargs="+", default=[0.3, 2.0], help="megapixels")
+    parser.add_argument("--noise", type=float, default=12.0, help="Gaussian noise sigma")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for mp in args.sizes:
+        clean = synthetic_image(mp)
+        noise = np.random.default_rng(1).normal(0, args.noise, clean.shape)
+        noisy = np.clip(clean + noise, 0, 255).astype("uint8")
+
+        print(f"\n{clean.shape[1]}x{clean.shape[0]} ({mp:g} MP), noisy PSNR {cv2.PSNR(clean, noisy):.2f} dB")
+        print(f"  {'strategy':<16}{'seconds':>9}{'PSNR dB':>9}")
+        for strategy in DENOISE_STRATEGIES:
+            seconds, out = _timed(lambda: denoise(noisy, strategy), args.repeat)
+            print(f"  {strategy:<16}{seconds:>9.3f}{cv2.PSNR(clean, out):>9.2f}")
+
+        serial, _ = _timed(lambda: enhance_images(noisy, parallel=False), args.repeat)
+        parallel, _ = _timed(lambda: enhance_images(noisy, parallel=True), args.repeat)
+        print(f"  enhance_images: serial {serial:.3f}s, parallel {parallel:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Fused post-processing kernels (app.postprocess) against the multi-pass
+versions they replaced and against 256-entry cv2.LUT tone curves.
+
+For each size, reports wall time per megapixel and bytes of new arrays
+allocated per megapixel (peak traced by tracemalloc, which sees NumPy and
+OpenCV output arrays) for:
+- colorize render: blend + saturation of one variant from (L, ab)
+- contrast: the enhance variant 1 contrast curve (on an owned array)
+- warm tone: the enhance variant 3 red lift (on an owned array)
+
+Usage (from the repo root):
+    python -m benchmarks.bench_postprocess --sizes 0.3 2 12
+"""
+
+import argparse
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+from app.postprocess import contrast, render_chroma, warm
+from benchmarks.synthetic import synthetic_image
+
+
+# =============================================================================
+# Alternatives
+# =============================================================================
+def _render_multipass(L: np.ndarray, ab: np.ndarray, blend: float, saturation: float) -> np.ndarray:
+    lab = np.concatenate((L[:, :, np.newaxis], ab * blend), axis=2)
+    bgr = (255 * np.clip(cv2.cvtColor(lab, cv2.COLOR_LAB2BGR), 0, 1)).astype("uint8")
+    hsv = cv2.cvtColor(bgr, cv2.COLOR_BGR2HSV).astype("float32")
+    hsv[:, :, 1] *= saturation
+    hsv[:, :, 1] = np.clip(hsv[:, :, 1], 0, 255)
+    return cv2.cvtColor(hsv.astype("uint8"), cv2.COLOR_HSV2BGR)
+
+
+def _warm_multipass(img: np.ndarray) -> np.ndarray:
+    out = img.copy()
+    out[:, :, 2] = cv2.add(out[:, :, 2], 15)
+    return out
+
+
+_CONTRAST_LUT = cv2.convertScaleAbs(np.arange(256, dtype=np.uint8), alpha=1.15, beta=5)
+_WARM_LUT = np.stack([np.arange(256)] * 2 + [np.minimum(np.arange(256) + 15, 255)], axis=-1)
+_WARM_LUT = _WARM_LUT.astype(np.uint8).reshape(1, 256, 3)
+
+
+# =============================================================================
+# Measurement
+# =============================================================================
+def _seconds(fn, repeat: int) -> float:
+    fn()  # warm caches and the buffer pool
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _allocated_bytes(fn) -> int:
+    fn()
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def _inputs(megapixels: float) -> dict:
+    img = synthetic_image(megapixels)
+    lab = cv2.cvtColor(img.astype("float32") / 255.0, cv2.COLOR_BGR2LAB)
+    return {"img": img, "L": np.ascontiguousarray(lab[:, :, 0]), "ab": np.ascontiguousarray(lab[:, :, 1:])}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=float, nargs="+", default=[0.3, 2.0], help="megapixels")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for mp in args.sizes:
+        data = _inputs(mp)
+        img, L, ab = data["img"], data["L"], data["ab"]
+        mpx = img.shape[0] * img.shape[1] / 1e6
+
+        owned = img.copy()
+        cases = {
+            "colorize render": {
+                "multi-pass": lambda: _render_multipass(L, ab, 0.92, 1.25),
+                "fused": lambda: render_chroma(L, ab, 0.92 * 1.25),
+            },
+            "contrast": {
+                "multi-pass": lambda: cv2.convertScaleAbs(owned, alpha=1.15, beta=5),
+                "LUT": lambda: cv2.LUT(owned, _CONTRAST_LUT, dst=owned),
+                "fused": lambda: contrast(owned, 1.15, 5, inplace=True),
+            },
+            "warm tone": {
+                "multi-pass": lambda: _warm_multipass(owned),
+                "LUT": lambda: cv2.LUT(owned, _WARM_LUT, dst=owned),
+                "fused": lambda: warm(owned, 15, inplace=True),
+            },
+        }
+
+        print(f"\n{img.shape[1]}x{img.shape[0]} ({mpx:.2f} MP)")
+        print(f"  {'kernel':<17}{'version':<12}{'ms/MP':>8}{'alloc MB/MP':>13}")
+        for name, versions in cases.items():
+            for version, fn in versions.items():
+                ms = _seconds(fn, args.repeat) * 1000 / mpx
+                mb = _allocated_bytes(fn) / 1e6 / mpx
+                print(f"  {name:<17}{version:<12}{ms:>8.2f}{mb:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
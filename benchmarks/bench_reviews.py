@@ -0,0 +1,160 @@
+"""
+Review ingestion throughput and analytics query time of the review store.
+
+Ingestion: several writer processes (standing in for uvicorn workers) each
+submit reviews from a few threads into one temporary review directory.
+Reports reviews/s for each flush interval and fsync policy, then verifies
+that every review landed intact and that the aggregates add up.
+
+History: writes --history synthetic reviews as sealed segments, compacts
+them to columns and times a full aggregate rebuild and a 7-day window
+query against parsing the same reviews as JSON lines.
+
+Usage (from the repo root):
+    python -m benchmarks.bench_reviews --processes 2 --threads 8 --reviews 2000
+    python -m benchmarks.bench_reviews --reviews 0 --history 2000000
+"""
+
+import argparse
+import json
+import multiprocessing
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+
+from app.review_store import FSYNC_POLICIES, ReviewStore, sealed_segment_path, sealed_segments
+
+LABELS = ["Natural", "Vivid", "Warm"]
+
+
+def _record(i: int) -> dict:
+    return {
+        "label": LABELS[i % len(LABELS)],
+        "score": i % 101,
+        "sentiment": {
+            "polarity": 0.1,
+            "subjectivity": 0.5,
+            # Long-ish records make interleaved writes easy to spot
+            "keywords": ["colors", "sky", "skin"] * 20,
+        },
+        "timestamp": "2024-01-01T00:00:00",
+    }
+
+
+def _writer(directory: str, offset: int, count: int, threads: int, interval: float, fsync: str, segment_mb: float):
+    store = ReviewStore(Path(directory), flush_interval_ms=interval, fsync=fsync, segment_mb=segment_mb)
+    with ThreadPoolExecutor(threads) as pool:
+        # Each thread waits for its review to commit, like a request handler
+        list(pool.map(lambda i: store.append(_record(i)).result(), range(offset, offset + count)))
+    store.close()
+
+
+def _run(args, interval: float, fsync: str) -> tuple[float, int]:
+    with tempfile.TemporaryDirectory() as directory:
+        per_process = args.reviews // args.processes
+        procs = [
+            multiprocessing.Process(
+                target=_writer,
+                args=(directory, p * per_process, per_process, args.threads, interval, fsync, args.segment_mb),
+            )
+            for p in range(args.processes)
+        ]
+        start = time.perf_counter()
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+        seconds = time.perf_counter() - start
+
+        # Every line must parse: no interleaved or lost writes
+        paths = [path for _, path in sealed_segments(Path(directory))] + [Path(directory) / "reviews.jsonl"]
+        lines = 0
+        for path in paths:
+            if path.exists():
+                with open(path, encoding="utf-8") as f:
+                    for line in f:
+                        json.loads(line)
+                        lines += 1
+
+        total = per_process * args.processes
+        if lines != total:
+            raise SystemExit(f"expected {total} reviews on disk, found {lines}")
+        fresh = ReviewStore(Path(directory))
+        if len(fresh) != total:
+            raise SystemExit(f"aggregates cover {len(fresh)} reviews, expected {total}")
+
+        return seconds, len(paths)
+
+
+def _history(count: int, segment_reviews: int = 100_000):
+    rng = np.random.default_rng(0)
+    now = datetime.utcnow()
+
+    with tempfile.TemporaryDirectory() as directory:
+        directory = Path(directory)
+        start = time.perf_counter()
+        for seq, first in enumerate(range(0, count, segment_reviews)):
+            n = min(segment_reviews, count - first)
+            ages = rng.uniform(0, 180, n)
+            with open(sealed_segment_path(directory, seq), "w", encoding="utf-8") as f:
+                for i in range(n):
+                    record = _record(first + i)
+                    record["sentiment"]["keywords"] = ["colors", "sky", "skin"][: i % 4]
+                    record["timestamp"] = (now - timedelta(days=float(ages[i]))).isoformat()
+                    f.write(json.dumps(record) + "\n")
+        print(f"\n{count} reviews of history written in {time.perf_counter() - start:.1f}s")
+
+        def json_scan():
+            for _, path in sealed_segments(directory):
+                with open(path, encoding="utf-8") as f:
+                    for line in f:
+                        json.loads(line)
+
+        start = time.perf_counter()
+        json_scan()
+        print(f"  parse all JSON lines:          {time.perf_counter() - start:8.3f}s")
+
+        store = ReviewStore(directory)
+        start = time.perf_counter()
+        store.compact()
+        print(f"  compact to columns:            {time.perf_counter() - start:8.3f}s")
+
+        store = ReviewStore(directory)
+        start = time.perf_counter()
+        store.load()
+        print(f"  rebuild aggregates (columns):  {time.perf_counter() - start:8.3f}s")
+
+        start = time.perf_counter()
+        window = store.window_aggregates(since=now - timedelta(days=7))
+        print(f"  7-day window query:            {time.perf_counter() - start:8.3f}s "
+              f"({sum(s['reviews'] for s in window.values())} reviews)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--processes", type=int, default=2)
+    parser.add_argument("--threads", type=int, default=8, help="concurrent submitters per process")
+    parser.add_argument("--reviews", type=int, default=2000, help="total reviews per run")
+    parser.add_argument("--intervals", type=float, nargs="+", default=[0, 10], help="flush intervals (ms)")
+    parser.add_argument("--segment-mb", type=float, default=0.25)
+    parser.add_argument("--history", type=int, default=200_000, help="reviews for the analytics benchmark (0 skips it)")
+    args = parser.parse_args()
+
+    if args.reviews:
+        print(f"{args.reviews} reviews, {args.processes} processes x {args.threads} threads")
+        print(f"  {'interval ms':>11}  {'fsync':<6}{'seconds':>9}{'reviews/s':>11}{'segments':>10}")
+        for fsync in FSYNC_POLICIES:
+            for interval in args.intervals:
+                seconds, segments = _run(args, interval, fsync)
+                print(f"  {interval:>11g}  {fsync:<6}{seconds:>9.2f}{args.reviews / seconds:>11.0f}{segments:>10}")
+
+    if args.history:
+        _history(args.history)
+
+
+if __name__ == "__main__":
+    main()
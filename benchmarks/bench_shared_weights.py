@@ -0,0 +1,90 @@
+"""
+Per-worker memory of the job worker pool under each
+COLORIZE_SHARED_WEIGHTS mode (off, fork, mmap).
+
+Each mode runs in a fresh process with that mode set: it starts the
+worker processes, waits until each has warmed its colorization net and
+then reads their memory from /proc (Linux only). RSS counts shared pages
+in full for every process, so compare PSS (shared pages divided between
+the processes using them): with shared weights the total PSS of the pool
+grows by roughly one copy of the weights, not one per worker.
+
+mmap needs the onnx backend and its shared copy of the model
+(`python -m app.inference_backends --prepare shared --backend onnx`);
+fork needs the opencv backend. Modes that do not fit the backend are
+skipped.
+
+Usage (from the repo root):
+    python -m benchmarks.bench_shared_weights --workers 4
+    COLORIZE_BACKEND=onnx python -m benchmarks.bench_shared_weights --modes off mmap
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+MODE_BACKENDS = {"off": ("opencv", "onnx"), "fork": ("opencv",), "mmap": ("onnx",)}
+
+
+def _child():
+    from app.jobs import get_executor
+
+    executor = get_executor()
+    executor.prestart()
+    # The ready messages reach the API process through the progress queue
+    deadline = time.monotonic() + 30
+    while len(executor.worker_memory()["workers"]) < executor.workers and time.monotonic() < deadline:
+        time.sleep(0.1)
+    print(json.dumps(executor.worker_memory()))
+    executor.shutdown()
+
+
+def _measure(mode: str, workers: int) -> dict:
+    env = dict(os.environ, COLORIZE_SHARED_WEIGHTS=mode, JOB_WORKERS=str(workers))
+    out = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_shared_weights", "--child"],
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", nargs="+", choices=list(MODE_BACKENDS), default=list(MODE_BACKENDS))
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        _child()
+        return
+
+    backend = os.getenv("COLORIZE_BACKEND", "opencv").lower()
+    print(f"backend {backend}, {args.workers} workers")
+    print(f"  {'mode':<6}{'process':<14}{'RSS MB':>9}{'PSS MB':>9}{'shared MB':>11}{'private MB':>12}")
+    for mode in args.modes:
+        if backend not in MODE_BACKENDS[mode]:
+            print(f"  {mode:<6}skipped (needs COLORIZE_BACKEND={' or '.join(MODE_BACKENDS[mode])})")
+            continue
+        result = _measure(mode, args.workers)
+        rows = [("api", result["api"])] + [(f"worker {pid}", mem) for pid, mem in result["workers"].items()]
+        for name, mem in rows:
+            if mem is None:
+                print(f"  {mode:<6}{name:<14}{'n/a':>9}")
+                continue
+            print(
+                f"  {mode:<6}{name:<14}{mem['rss_mb']:>9.1f}{mem['pss_mb']:>9.1f}"
+                f"{mem['shared_mb']:>11.1f}{mem['private_mb']:>12.1f}"
+            )
+        total = sum(mem["pss_mb"] for _, mem in rows if mem is not None)
+        print(f"  {mode:<6}{'total PSS':<14}{'':>9}{total:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,421 @@
+"""
+Reproducible benchmark suite for the image pipeline and the API.
+
+Pipeline: for synthetic grayscale and color images of each size
+(default 0.3, 2, 12 and 24 MP) it times the pipeline stages on their own
+(decode, denoise, CLAHE, sharpen + warm, encode; forward pass once per
+run) and every mode end to end through process_image, with a per-stage
+breakdown taken from its progress callback. Each case runs in a fresh
+process so its peak RSS can be reported.
+
+API: starts the app in-process (its own temporary storage and review
+directories) and load-tests /api/upload, /api/reviews and the analytics
+endpoints with concurrent requests, reporting latency percentiles and
+throughput.
+
+Results are written as JSON (--out). With --baseline they are compared
+against a stored result file and changes beyond --threshold are listed;
+--save-baseline stores this run as the new baseline.
+
+Colorization needs the model files (see README 'Model Setup'); without
+them the colorize / both modes and the forward pass are reported as
+skipped.
+
+Usage (from the repo root):
+    python -m benchmarks.bench_suite
+    python -m benchmarks.bench_suite --sizes 0.3 2 --repeat 3 --out bench.json
+    python -m benchmarks.bench_suite --baseline benchmarks/baseline.json
+    python -m benchmarks.bench_suite --skip-pipeline --api-requests 200 --concurrency 16
+"""
+
+from datetime import datetime, timezone
+from pathlib import Path
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import traceback
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+MODES = ["enhance", "colorize", "both"]
+KINDS = ["gray", "color"]
+
+# Result keys compared against the baseline, and whether higher is better
+METRIC_SUFFIXES = {"_ms": False, "_mb": False, "per_s": True}
+
+
+# =============================================================================
+# Helpers
+# =============================================================================
+def _peak_rss_mb() -> float | None:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, KiB elsewhere
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def _median_ms(fn, repeat: int) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return round(statistics.median(times) * 1000, 2)
+
+
+def _call(results, fn, args):
+    try:
+        results.put((True, fn(*args)))
+    except BaseException:
+        results.put((False, traceback.format_exc()))
+
+
+def _in_fresh_process(fn, *args):
+    """
+    Runs fn(*args) in a newly spawned interpreter (clean peak RSS). Not a
+    pool worker: the API case starts job worker processes of its own.
+    """
+    ctx = multiprocessing.get_context("spawn")
+    results = ctx.Queue()
+    proc = ctx.Process(target=_call, args=(results, fn, args))
+    proc.start()
+    ok, value = results.get()
+    proc.join()
+    if not ok:
+        raise RuntimeError(f"{fn.__name__} failed:\n{value}")
+    return value
+
+
+def _colorization_available() -> str | None:
+    """None if the colorization net loads, otherwise why not."""
+    from app.model_registry import model_files_present, warm_up
+
+    if not model_files_present():
+        return "model files missing"
+    if not warm_up():
+        return "model failed to load"
+    return None
+
+
+# =============================================================================
+# Pipeline
+# =============================================================================
+def _stage_case(kind: str, megapixels: float, repeat: int) -> dict:
+    """Stages timed on their own for one image."""
+    import cv2
+    from app.enhance import enhance_images
+    from app.image_io import decode_image
+    from app.output_writer import OutputWriter
+    from benchmarks.synthetic import synthetic_image
+
+    img = synthetic_image(megapixels, gray=kind == "gray")
+    png = cv2.imencode(".png", img)[1].tobytes()
+    rss_before = _peak_rss_mb()
+
+    stages = {
+        "decode_ms": _median_ms(lambda: decode_image(png), repeat),
+        "denoise_ms": _median_ms(lambda: enhance_images(img, which=[0], parallel=False), repeat),
+        "clahe_ms": _median_ms(lambda: enhance_images(img, which=[1], parallel=False), repeat),
+        "sharp_warm_ms": _median_ms(lambda: enhance_images(img, which=[2], parallel=False), repeat),
+    }
+    with tempfile.TemporaryDirectory() as directory:
+        items = [(Path(directory) / f"variant{i}.jpg", img) for i in range(3)]
+        stages["encode_ms"] = _median_ms(lambda: OutputWriter().write_all(items), repeat)
+
+    return {
+        "width": img.shape[1],
+        "height": img.shape[0],
+        "upload_bytes": len(png),
+        "stages": stages,
+        "rss_before_mb": rss_before,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def _mode_case(kind: str, megapixels: float, mode: str, repeat: int) -> dict:
+    """process_image end to end for one image and mode."""
+    import cv2
+    from app.pipeline import process_image
+    from benchmarks.synthetic import synthetic_image
+
+    if mode != "enhance":
+        reason = _colorization_available()
+        if reason:
+            return {"skipped": reason}
+
+    png = cv2.imencode(".png", synthetic_image(megapixels, gray=kind == "gray"))[1].tobytes()
+    rss_before = _peak_rss_mb()
+
+    totals, breakdowns = [], []
+    with tempfile.TemporaryDirectory() as directory:
+        for i in range(repeat):
+            marks = []
+            start = time.perf_counter()
+            result = process_image(
+                png,
+                Path(directory),
+                mode,
+                stem=f"bench{i}",
+                progress=lambda stage: marks.append((stage, time.perf_counter())),
+            )
+            end = time.perf_counter()
+            totals.append(end - start)
+
+            # A stage lasts until the next one starts. Enhance mode reports
+            # no separate encode stage: it is part of "enhance" there.
+            breakdown = {}
+            for (stage, t0), (_, t1) in zip(marks, marks[1:] + [(None, end)]):
+                breakdown[f"{stage}_ms"] = breakdown.get(f"{stage}_ms", 0.0) + (t1 - t0) * 1000
+            breakdowns.append(breakdown)
+
+    return {
+        "total_ms": round(statistics.median(totals) * 1000, 2),
+        "stages": {
+            key: round(statistics.median(b.get(key, 0.0) for b in breakdowns), 2)
+            for key in breakdowns[0]
+        },
+        "output_bytes": result.encode["bytes"],
+        "rss_before_mb": rss_before,
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def _forward_case(repeat: int) -> dict:
+    """One 224x224 forward pass of the colorization net."""
+    import numpy as np
+    from app.inference_batcher import infer_ab
+    from app.model_registry import NET_INPUT_SIZE
+
+    reason = _colorization_available()
+    if reason:
+        return {"skipped": reason}
+
+    L = np.random.default_rng(0).uniform(-50, 50, (NET_INPUT_SIZE, NET_INPUT_SIZE)).astype("float32")
+    return {"forward_ms": _median_ms(lambda: infer_ab(L), repeat)}
+
+
+def run_pipeline(args) -> dict:
+    results = {"forward": _in_fresh_process(_forward_case, args.repeat)}
+    for kind in args.kinds:
+        for mp in args.sizes:
+            name = f"{kind}-{mp:g}mp"
+            print(f"  {name}: stages", flush=True)
+            case = _in_fresh_process(_stage_case, kind, mp, args.repeat)
+            case["modes"] = {}
+            for mode in args.modes:
+                print(f"  {name}: {mode}", flush=True)
+                case["modes"][mode] = _in_fresh_process(_mode_case, kind, mp, mode, args.repeat)
+            results[name] = case
+    return results
+
+
+# =============================================================================
+# API load test
+# =============================================================================
+def _latency_summary(latencies: list[float], errors: int, seconds: float) -> dict:
+    latencies = sorted(latencies)
+
+    def pct(p: float) -> float:
+        return round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 2)
+
+    return {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "requests_per_s": round((len(latencies) + errors) / seconds, 2),
+        "p50_ms": pct(0.50) if latencies else None,
+        "p95_ms": pct(0.95) if latencies else None,
+        "p99_ms": pct(0.99) if latencies else None,
+    }
+
+
+async def _load(client, concurrency: int, requests: list) -> dict:
+    """Sends requests (kwargs for client.request) with bounded concurrency."""
+    latencies, errors = [], 0
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(kwargs):
+        nonlocal errors
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.request(**kwargs)
+            if response.status_code >= 400:
+                errors += 1
+            else:
+                latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(kwargs) for kwargs in requests))
+    return _latency_summary(latencies, errors, time.perf_counter() - start)
+
+
+async def _api_load(n: int, concurrency: int, token: str) -> dict:
+    import cv2
+    import httpx
+    from app.feedback_nlp import warm_up as warm_up_nlp
+    from app.main import app
+    from benchmarks.synthetic import synthetic_image
+
+    # Distinct images (no result-cache hits) plus one repeated image
+    uploads = [cv2.imencode(".png", synthetic_image(0.3, seed=i))[1].tobytes() for i in range(n)]
+    # Without NLTK data every comment would fail sentiment analysis
+    comment = "The colors look natural and the sky is great" if warm_up_nlp() else ""
+    dev = {"x-dev-token": token}
+
+    def upload(data: bytes) -> dict:
+        return {"method": "POST", "url": "/api/upload?mode=enhance", "files": {"file": ("bench.png", data)}}
+
+    transport = httpx.ASGITransport(app=app)
+    async with app.router.lifespan_context(app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            results = {"nlp": bool(comment)}
+            results["upload"] = await _load(client, concurrency, [upload(data) for data in uploads])
+            results["upload_cached"] = await _load(client, concurrency, [upload(uploads[0])] * n)
+            results["reviews"] = await _load(client, concurrency, [
+                {
+                    "method": "POST",
+                    "url": "/api/reviews",
+                    "json": {"label": ["Natural", "Vivid", "Warm"][i % 3], "score": i % 101, "comment": comment},
+                }
+                for i in range(n)
+            ])
+            results["reviews_summary"] = await _load(
+                client, concurrency, [{"method": "GET", "url": "/api/reviews/summary"}] * n
+            )
+            results["dev_analytics"] = await _load(
+                client, concurrency, [{"method": "GET", "url": "/api/dev/analytics", "headers": dev}] * n
+            )
+            results["dev_report"] = await _load(
+                client, concurrency, [{"method": "GET", "url": "/api/dev/report", "headers": dev}] * n
+            )
+    return results
+
+
+def _api_case(n: int, concurrency: int) -> dict:
+    token = "bench"
+    with tempfile.TemporaryDirectory() as directory:
+        # Uploads, outputs and reviews go to the temporary directory
+        os.environ["STORAGE_DIR"] = directory
+        os.environ["DEV_DASHBOARD_TOKEN"] = token
+        os.chdir(directory)
+        Path("Reviews").mkdir()
+
+        results = asyncio.run(_api_load(n, concurrency, token))
+        results["peak_rss_mb"] = _peak_rss_mb()
+        return results
+
+
+# =============================================================================
+# Results + baseline
+# =============================================================================
+def _metadata(args) -> dict:
+    import cv2
+    import numpy as np
+
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "opencv": cv2.__version__,
+        "numpy": np.__version__,
+        "args": vars(args),
+        # Settings that change what is measured
+        "env": {k: v for k, v in sorted(os.environ.items()) if k.startswith(("COLORIZE_", "ENHANCE_", "ENCODE_", "JOB_"))},
+    }
+
+
+def _metrics(results: dict, prefix: str = "") -> dict[str, float]:
+    """Flattens the comparable numbers of a result tree to dotted paths."""
+    flat = {}
+    for key, value in results.items():
+        path = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(_metrics(value, f"{path}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool) and key.endswith(tuple(METRIC_SUFFIXES)):
+            flat[path] = value
+    return flat
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list[tuple[str, float, float, float, bool]]:
+    """
+    (metric, baseline, current, change %, regression) for every metric in
+    both runs whose change exceeds threshold percent.
+    """
+    current, previous = _metrics(results), _metrics(baseline)
+    changes = []
+    for path in sorted(current.keys() & previous.keys()):
+        old, new = previous[path], current[path]
+        if not old:
+            continue
+        change = (new - old) / old * 100
+        if abs(change) < threshold:
+            continue
+        higher_is_better = next(better for suffix, better in METRIC_SUFFIXES.items() if path.endswith(suffix))
+        changes.append((path, old, new, change, (change < 0) == higher_is_better))
+    return changes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=float, nargs="+", default=[0.3, 2, 12, 24], help="megapixels")
+    parser.add_argument("--kinds", nargs="+", choices=KINDS, default=KINDS)
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=MODES)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per measurement (median reported)")
+    parser.add_argument("--api-requests", type=int, default=50, help="requests per API endpoint")
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent API requests")
+    parser.add_argument("--skip-pipeline", action="store_true")
+    parser.add_argument("--skip-api", action="store_true")
+    parser.add_argument("--out", default="bench_results.json", help="where to write the results")
+    parser.add_argument("--baseline", help="result file to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="also write the results to --baseline")
+    parser.add_argument("--threshold", type=float, default=10.0, help="percent change reported against the baseline")
+    args = parser.parse_args()
+
+    results = {"meta": _metadata(args)}
+    if not args.skip_pipeline:
+        print("Pipeline")
+        results["pipeline"] = run_pipeline(args)
+    if not args.skip_api:
+        print("API")
+        results["api"] = _in_fresh_process(_api_case, args.api_requests, args.concurrency)
+
+    Path(args.out).write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+    print(f"\nWrote {args.out}")
+
+    if args.baseline and Path(args.baseline).exists() and not args.save_baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        changes = compare(results, baseline, args.threshold)
+        print(f"\nChanges beyond {args.threshold:g}% vs {args.baseline} ({baseline['meta'].get('commit')}):")
+        for path, old, new, change, regression in changes:
+            print(f"  {'REGRESSION' if regression else 'improved':<11}{path:<60}{old:>10g} -> {new:<10g}({change:+.1f}%)")
+        if not changes:
+            print("  none")
+        if any(regression for *_, regression in changes):
+            sys.exit(1)
+    elif args.baseline and args.save_baseline:
+        Path(args.baseline).write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+        print(f"Saved baseline {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
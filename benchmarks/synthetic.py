@@ -0,0 +1,32 @@
+"""
+Deterministic synthetic test images shared by the benchmark scripts.
+"""
+
+import cv2
+import numpy as np
+
+
+def synthetic_image(megapixels: float, seed: int = 0, gray: bool = False) -> np.ndarray:
+    """
+    A 4:3 BGR uint8 image of about megapixels: smooth color fields plus
+    hard-edged shapes, so both flat areas and edges count. gray=True
+    returns the same scene with equal channels (a colorization input).
+    """
+    width = int((megapixels * 1e6 * 4 / 3) ** 0.5)
+    height = int(width * 3 / 4)
+    rng = np.random.default_rng(seed)
+
+    img = cv2.resize(
+        rng.integers(0, 256, (12, 16, 3), dtype=np.uint8),
+        (width, height),
+        interpolation=cv2.INTER_CUBIC,
+    )
+    for _ in range(20):
+        center = (int(rng.integers(0, width)), int(rng.integers(0, height)))
+        radius = int(rng.integers(height // 20, height // 5))
+        color = tuple(int(c) for c in rng.integers(0, 256, 3))
+        cv2.circle(img, center, radius, color, thickness=-1)
+
+    if gray:
+        img = cv2.cvtColor(cv2.cvtColor(img, cv2.COLOR_BGR2GRAY), cv2.COLOR_GRAY2BGR)
+    return img
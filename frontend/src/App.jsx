@@ -113,8 +113,8 @@ export default function App() {
       return;
     }
 
-    if (file.size > 10 * 1024 * 1024) {
-      setMsg("File too large. Please upload an image under 10MB.");
+    if (file.size > 80 * 1024 * 1024) {
+      setMsg("File too large. Please upload an image under 80MB.");
       return;
     }
 
@@ -166,7 +166,11 @@ export default function App() {
       setMsg("🧹 All generated images were deleted.");
     } catch (err) {
       console.error(err);
-      setMsg("❌ Delete failed.");
+      setMsg(
+        err.response?.status === 403
+          ? "❌ Deleting all images requires developer access."
+          : "❌ Delete failed.",
+      );
       setFeedbackStatus("error");
     } finally {
       setLoading(false);